@@ -2,29 +2,50 @@ import matplotlib
 matplotlib.use("Agg")
 
 import backtrader as bt
+import numpy as np
 import pandas as pd
-import hashlib
 from datetime import datetime
+from pathlib import Path
 from itertools import product
 from rich.console import Console
 from rich.progress import track
-import quantstats as qs
 
 from core import (
     load_market_data,
     generate_param_grid,
+    params_hash,
     generate_result_path,
     save_params,
     save_metrics,
+    save_metrics_table,
+    save_sweep_metrics,
     save_trades,
     save_trades_full,
     save_equity_curve,
-    save_equity_plot_png,
     save_exit_log,
     save_entry_log,
-    plot_strategy_chart,
-    apply_indicators
+    render_heavy_artifacts,
+    apply_indicators,
+    iter_vectorized,
+    search_params,
+    VectorObjective,
+    SearchPool,
+    RunCache,
+    run_key,
+    data_fingerprint,
+    robustness_report,
+    PruningRules,
+    ResultsDB,
+    DEFAULT_RESULTS_DB,
+    perf_metrics_frame,
+    periods_per_year,
+    trade_stats,
+    closed_trade_metrics,
+    ReportBundle,
+    bundle_run_id
 )
+from core.exit_engine import compile_exit_levels
+from core.indicator_engine import atr_wilder
 from core.take_profit_config import TakeProfitMode
 from strategies.rsi_atr_strategy import SuperStrategy
 
@@ -39,6 +60,59 @@ START_DATE = "2023-01-01"
 END_DATE = "2024-12-31"
 INITIAL_CASH = 100000
 
+# "backtrader" — отдельный Cerebro на комбинацию, "vector" — вся сетка за один проход
+ENGINE = "backtrader"
+
+# "grid" — полный перебор param_grid; "random" | "halving" | "hyperband" | "tpe" — адаптивный поиск
+SEARCH_METHOD = "grid"
+SEARCH_BUDGET_FRACTION = 0.1
+SEARCH_METRIC = "Final_portfolio_growth_percent"
+SEARCH_WORKERS = 4
+
+# Кэш прогонов: уже посчитанные (strategy_id, symbol, tf, окно, данные, движок) не перезапускаются
+USE_RUN_CACHE = True
+RUN_CACHE_INDEX = "results/run_index.jsonl"
+# "folders" — папка с CSV на прогон; "db" — метрики, сделки и equity в одну базу (core.results_db),
+# экспорт прогона в структуру папок: ResultsDB(RESULTS_DB).export_run(run_pk)
+RESULTS_MODE = "folders"
+RESULTS_DB = DEFAULT_RESULTS_DB
+RESULTS_DB_BATCH = 500
+# "eager" — PNG, quantstats HTML и plotly-график для каждого прогона;
+# "deferred" — только метрики и сырые ряды, артефакты по запросу: python render.py --top 20
+ARTIFACTS = "eager"
+# Общий отчёт, например "results/report" → index.html: графики — данными с одним plotly.js на все прогоны,
+# метрики — в сортируемой таблице. None — отдельный HTML графика в папке каждого прогона.
+# В отчёт попадают только прогоны с графиком; векторные — после python render.py --top N
+REPORT_BUNDLE = None
+# CAGR / Sharpe / Sortino / Calmar / просадка / exposure / tail ratio по кривой equity
+# (core.perf_metrics, одна матричная операция на блок сетки) — добавляются в metrics.csv
+PERF_METRICS = True
+# Векторный свип идёт блоками по VECTOR_CHUNK комбинаций: кривые (блок × бары) для метрик
+# держатся в памяти только внутри блока (1000 × 70k баров ≈ 1.1 ГБ на equity + позицию)
+VECTOR_CHUNK = 1000
+# В режиме "db" кривая equity каждой комбинации векторного свипа пишется в базу
+# (её читают render.py и results_query.py overfit / perf-check): каждый
+# VECTOR_EQUITY_EVERY-й бар + последний. 1 — полная кривая; 100k комбинаций × 70k баров —
+# это ~110 ГБ, для таких сеток прорежайте (доходности станут k-барными, на общей шкале времени)
+VECTOR_EQUITY_EVERY = 1
+# Потоковая запись equity / entry_log / exit_log на диск по ходу прогона (core.stream_sink):
+# память не растёт на длинных 15m-прогонах, прерванный прогон читается core.read_stream(папка).
+# None — всё в памяти до конца прогона
+STREAM_DIR = None  # например "results/streams"
+# Монте-Карло по сделкам каждого прогона (bootstrap / shuffle / block) → robustness.csv.
+# 0 — выключено: на большой сетке это заметная добавка к каждому прогону; для отобранных
+# лучших прогонов — python render.py --top 20 --robustness 10000
+ROBUSTNESS_SIMS = 0
+
+BROKER_CONFIG = {"initial_cash": INITIAL_CASH, "commission": COMMISSION_MODEL, "slippage": SLIPPAGE}
+
+# Досрочная остановка безнадёжных прогонов (core.pruning.PruningRules), None — без остановки.
+# Остановленный прогон сохраняет params / metrics (Status = pruned), тяжёлые артефакты не строятся.
+# Пример: {"max_drawdown": 0.3, "min_equity_percent": 80, "min_equity_after_bars": 200, "no_trades_after_bars": 300}
+PRUNING = None
+# Правила меняют результат — входят в ключ кэша прогонов
+RUN_CONFIG = {**BROKER_CONFIG, "pruning": PRUNING} if PRUNING else BROKER_CONFIG
+
 param_ranges = {
     "rsi_period": [14, 21],
     "atr_period": [14],
@@ -47,83 +121,50 @@ param_ranges = {
         "levels": [{"percent": 1.0, "exit_type": "atr", "params": {"mult": 4.0}}]
     }]
 }
-param_grid = generate_param_grid(param_ranges)
+# Ограничения и условные параметры сетки (см. core.param_grid.iter_param_grid)
+PARAM_CONSTRAINTS = []
+PARAM_CONDITIONAL = {}
+param_grid = generate_param_grid(param_ranges, constraints=PARAM_CONSTRAINTS, conditional=PARAM_CONDITIONAL)
 
 def extract_strategy_params(params, allowed_keys):
     return {k: v for k, v in params.items() if k in allowed_keys}
 
-def extract_trades_from_logs(entry_log, exit_log):
-    trades_list = []
-
-    for i in range(min(len(entry_log), len(exit_log))):
-        entry = entry_log[i]
-        exit = exit_log[i]
-
-        entry_price = entry.get("price")
-        exit_price = exit.get("price")
-        size = entry.get("size", 1)  # по умолчанию 1
-        commission = COMMISSION_MODEL * (entry_price + exit_price) * size
-
-        pnl = (exit_price - entry_price) * size
-        pnl_comm = pnl - commission
-
-        duration_sec = (
-            (exit.get("datetime") - entry.get("datetime")).total_seconds()
-            if entry.get("datetime") and exit.get("datetime")
-            else None
-        )
-
-        trades_list.append({
-            "entry_datetime": entry.get("datetime"),
-            "entry_price": entry_price,
-            "exit_datetime": exit.get("datetime"),
-            "exit_price": exit_price,
-            "size": size,
-            "pnl": pnl,
-            "pnl_comm": pnl_comm,
-            "entry_reason": entry.get("reason"),
-            "exit_reason": exit.get("reason"),
-            "entry_rsi": entry.get("rsi"),
-            "exit_rsi": exit.get("rsi"),
-            "entry_atr": entry.get("atr"),
-            "exit_atr": exit.get("atr"),
-            "strategy_id": entry.get("strategy_id"),
-            "symbol": entry.get("symbol"),
-            "timeframe": entry.get("timeframe"),
-            "duration_sec": duration_sec
-        })
-
-    df = pd.DataFrame(trades_list)
-
-    # Гарантируем наличие всех столбцов
-    expected_columns = [
-        "entry_datetime", "entry_price", "exit_datetime", "exit_price", "size",
-        "pnl", "pnl_comm", "entry_reason", "exit_reason", "entry_rsi", "exit_rsi",
-        "entry_atr", "exit_atr", "strategy_id", "symbol", "timeframe", "duration_sec"
-    ]
-    for col in expected_columns:
-        if col not in df.columns:
-            df[col] = None
-
-    return df
-
 def run():
     indicators_used = SuperStrategy.params.indicators
      
     market_data = load_market_data(SYMBOLS, TIMEFRAMES, start_date=START_DATE, end_date=END_DATE)
     all_combos = list(product(SYMBOLS, TIMEFRAMES, param_grid))
 
+    # Хеши считаем до прогонов: apply_indicators дописывает колонки в DataFrame
+    data_hashes = {
+        (symbol, tf): data_fingerprint(market_data.get(symbol, {}).get(tf))
+        for symbol, tf in product(SYMBOLS, TIMEFRAMES)
+    }
+    cache = RunCache(RUN_CACHE_INDEX) if USE_RUN_CACHE else None
+    results_db = ResultsDB(RESULTS_DB, batch_size=RESULTS_DB_BATCH) if RESULTS_MODE == "db" else None
+    bundle = ReportBundle(REPORT_BUNDLE) if REPORT_BUNDLE else None
+    bundle_rows = []
+    sweep_metrics = []
+    skipped = 0
+
     for symbol, tf, params in track(all_combos, description="[cyan]▶️ Общий прогон параметров[/cyan]"):
         df = market_data.get(symbol, {}).get(tf)
         if df is None or df.empty:
             console.print(f"[red]❌ Нет данных для {symbol} {tf}[/red]")
             continue
 
+        params = dict(params)  # сетка общая для всех symbol / tf — не мутируем её
         run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         strategy_param_keys = SuperStrategy.params._getkeys()
 
         strategy_only_params = {k: params[k] for k in strategy_param_keys if k in params}
-        strategy_id = hashlib.md5(str(dict(sorted(strategy_only_params.items()))).encode()).hexdigest()[:8]
+        strategy_id = params_hash(strategy_only_params)
+
+        key = run_key(strategy_id, symbol, tf, START_DATE, END_DATE, data_hashes[(symbol, tf)], "backtrader", RUN_CONFIG)
+        if cache is not None and key in cache:
+            sweep_metrics.append(cache.get(key)["metrics"])
+            skipped += 1
+            continue
 
         params.update({
             "indicators": indicators_used,
@@ -133,9 +174,17 @@ def run():
             "timeframe": tf
         })
 
-        strategy_only_params = {k: params[k] for k in strategy_param_keys}
+        strategy_only_params = {k: params[k] for k in strategy_param_keys if k in params}
         strategy_params = extract_strategy_params(params, strategy_param_keys)
         df = apply_indicators(df, strategy_params)
+        strategy_params["compiled_exits"] = compile_exit_levels(
+            params.get("take_profit"),
+            df["close"].to_numpy(),
+            atr_wilder(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), strategy_params.get("atr_period", 14))
+        )
+        strategy_params["pruning"] = PruningRules.from_config(PRUNING)
+        if STREAM_DIR:
+            strategy_params["stream_dir"] = str(Path(STREAM_DIR) / symbol / tf / f"{run_id}_{strategy_id}")
 
         cerebro = bt.Cerebro(stdstats=False)
         cerebro.addstrategy(SuperStrategy, **strategy_params)
@@ -144,11 +193,9 @@ def run():
         cerebro.broker.setcash(INITIAL_CASH)
         cerebro.broker.set_slippage_perc(perc=SLIPPAGE)
         cerebro.broker.setcommission(commission=COMMISSION_MODEL, leverage=1)
-        cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name='trade_analyzer')
 
         results = cerebro.run()
         strat = results[0]
-        trade_analysis = strat.analyzers.trade_analyzer.get_analysis()
 
         final_value = cerebro.broker.getvalue()
         growth = round((final_value - INITIAL_CASH) / INITIAL_CASH * 100, 2)
@@ -161,87 +208,308 @@ def run():
             "Initial_portfolio_value": INITIAL_CASH,
             "Final_portfolio_value": round(final_value, 2),
             "Final_portfolio_growth_percent": growth,
-            "Total_trades": trade_analysis.total.closed if trade_analysis.total else 0,
-            "Winning_trades": trade_analysis.won.total if trade_analysis.won else 0,
-            "Losing_trades": trade_analysis.lost.total if trade_analysis.lost else 0,
-            "Net_PnL": round(trade_analysis.pnl.net.total, 2) if trade_analysis.pnl else 0,
-            "Average_Win_pnl": round(trade_analysis.won.pnl.average, 2) if trade_analysis.won.pnl else 0,
-            "Average_Loss_pnl": round(trade_analysis.lost.pnl.average, 2) if trade_analysis.lost.pnl else 0
+            # По журналу закрытых сделок: у TradeAnalyzer после остановки pruning
+            # (нет сделок или позиция ещё открыта) нет closed / won / lost
+            **closed_trade_metrics(strat.trade_ledger.to_array())
         }
+        if PRUNING:
+            metrics.update({
+                "Status": "pruned" if strat.pruned else "completed",
+                "Prune_reason": strat.pruned["reason"] if strat.pruned else "",
+                "Bars_run": strat.pruned["bars"] if strat.pruned else len(df)
+            })
 
-        result_path = generate_result_path(symbol, tf, strategy_only_params)
-        save_params(result_path, {**params, "start_date": START_DATE, "end_date": END_DATE})
+        run_record = {
+            "run_key": key,
+            "run_id": run_id,
+            "strategy_id": strategy_id,
+            "symbol": symbol,
+            "timeframe": tf,
+            "engine": "backtrader",
+            "start_date": START_DATE,
+            "end_date": END_DATE,
+            "status": "pruned" if strat.pruned else "completed"
+        }
+        run_params = {**params, "start_date": START_DATE, "end_date": END_DATE}
+        if results_db is None:
+            result_path = generate_result_path(symbol, tf, strategy_only_params)
+            save_params(result_path, run_params)
+
+        if strat.pruned:
+            # Частичные метрики на момент остановки; сделки, графики и отчёты не строим
+            sweep_metrics.append(metrics)
+            if results_db is not None:
+                results_db.add_run(run_record, metrics, params=run_params)
+                stored_at = f"{RESULTS_DB}#{key}"
+            else:
+                save_metrics(result_path, metrics)
+                stored_at = str(result_path)
+            if cache is not None:
+                cache.put(key, metrics, strategy_id=strategy_id, symbol=symbol, timeframe=tf,
+                          engine="backtrader", run_id=run_id, result_path=stored_at)
+            continue
 
-        trades_df = extract_trades_from_logs(strat.entry_log, strat.exit_log)
+        # Журнал сделок собран стратегией из notify_order / notify_trade — только колонки NumPy
+        trades = strat.trade_ledger.to_array()
+        trades_df = strat.trade_ledger.to_frame(strategy_id=strategy_id, symbol=symbol, timeframe=tf)
 
-        if not trades_df.empty:
+        if trades_df.empty:
+            console.print(f"[red]❌ trades_full.csv пустой для {symbol} {tf}[/red]")
+        elif results_db is None:
             save_trades_full(result_path, trades_df)
+            if ROBUSTNESS_SIMS:
+                robustness_report(
+                    trades["pnl_comm"],
+                    n_sims=ROBUSTNESS_SIMS,
+                    initial_cash=INITIAL_CASH
+                ).to_csv(result_path / "robustness.csv", index=False)
+
+        stats = trade_stats(trades)
+        if stats is not None:
+            metrics.update({
+                "Win_rate": round(stats["win_rate"], 4),
+                "Loss_rate": round(stats["loss_rate"], 4),
+                "Profit_factor": round(stats["profit_factor"], 4),
+                "Avg_trade_size": round(stats["avg_size"], 2),
+                "Avg_pnl_comm": round(stats["avg_pnl_comm"], 2),
+                "Duration_avg_sec": round(stats["duration_avg_sec"], 2),
+                "Duration_max_sec": round(stats["duration_max_sec"], 2),
+                "Duration_min_sec": round(stats["duration_min_sec"], 2),
+                "Total_fees": round(stats["total_fees"], 2),
+                "Total_slippage": round(stats["total_slippage"], 2)
+            })
+
+            if results_db is None:
+                agg_trades = pd.DataFrame([
+                    [name, stats[name]]
+                    for name in ("total_closed", "avg_pnl", "avg_pnl_comm", "avg_size", "win_rate", "loss_rate", "profit_factor")
+                ], columns=["metric", "value"])
+                save_trades(result_path, agg_trades)
+
+        # В потоковом режиме логи и кривая читаются обратно с диска
+        entry_log, exit_log = list(strat.entry_log), list(strat.exit_log)
+        curves = strat.recorder.to_frame()
+        equity_df = curves[["equity"]]
+        if PERF_METRICS and len(curves) > 1:
+            metrics.update(perf_metrics_frame(
+                curves["equity"].to_numpy(), periods_per_year(tf), position=curves["position"].to_numpy()
+            ).iloc[0].to_dict())
+
+        sweep_metrics.append(metrics)
+        if results_db is not None:
+            # Метрики, сделки и кривая — в базу пачками
+            results_db.add_run(run_record, metrics, params=run_params, trades=trades_df, equity=equity_df["equity"])
+            stored_at = f"{RESULTS_DB}#{key}"
         else:
-            console.print(f"[red]❌ trades_full.csv пустой для {symbol} {tf}[/red]")
+            save_metrics(result_path, metrics)
+            save_equity_curve(result_path, equity_df)
+            save_entry_log(result_path, entry_log)
+            save_exit_log(result_path, exit_log)
+            stored_at = str(result_path)
+
+        if ARTIFACTS == "eager":
+            if results_db is not None:
+                result_path = generate_result_path(symbol, tf, strategy_only_params)
+            render_heavy_artifacts(
+                result_path, df, equity_df, entry_log, exit_log,
+                title=f"{symbol} {tf} | {strategy_id}",
+                timeframe=tf,
+                bundle_root=REPORT_BUNDLE
+            )
+            if bundle is not None:
+                bundle_rows.append({
+                    "id": bundle_run_id(result_path), **metrics,
+                    "chart": True, "quantstats": bundle.quantstats_link(result_path)
+                })
+
+        # В кэш — только когда записано всё, включая артефакты: прерванный прогон пересчитается
+        if cache is not None:
+            cache.put(key, metrics, strategy_id=strategy_id, symbol=symbol, timeframe=tf,
+                      engine="backtrader", run_id=run_id, result_path=stored_at)
+
+    if results_db is not None:
+        results_db.close()
+    if bundle_rows:
+        bundle.add_runs(bundle_rows)
+    if sweep_metrics:
+        save_sweep_metrics(sweep_metrics)
+    console.print(f"[cyan]♻️ Из кэша: {skipped}, посчитано заново: {len(sweep_metrics) - skipped}[/cyan]")
+
+def run_vectorized_sweep():
+    """
+    Прогон всей сетки параметров векторным движком:
+    один проход по барам на (symbol, tf) и блок из VECTOR_CHUNK комбинаций,
+    метрики всех комбинаций в одном metrics.csv.
+    """
+    strategy_param_keys = SuperStrategy.params._getkeys()
+    market_data = load_market_data(SYMBOLS, TIMEFRAMES, start_date=START_DATE, end_date=END_DATE)
+    cache = RunCache(RUN_CACHE_INDEX) if USE_RUN_CACHE else None
+    results_db = ResultsDB(RESULTS_DB, batch_size=RESULTS_DB_BATCH) if RESULTS_MODE == "db" else None
+    sweep_metrics = []
 
-        if not trades_df.empty:
-            profit_sum = trades_df[trades_df["pnl"] > 0]["pnl"].sum()
-            loss_sum = abs(trades_df[trades_df["pnl"] < 0]["pnl"].sum())
-            profit_factor = profit_sum / loss_sum if loss_sum > 0 else float("inf")
-            win_rate = (trades_df["pnl"] > 0).mean()
-            loss_rate = (trades_df["pnl"] < 0).mean()
-            avg_size = trades_df["size"].mean()
-            avg_pnl_comm = trades_df["pnl_comm"].mean()
-            duration = trades_df["duration_sec"]
+    for symbol, tf in track(list(product(SYMBOLS, TIMEFRAMES)), description="[cyan]▶️ Векторный прогон сетки[/cyan]"):
+        df = market_data.get(symbol, {}).get(tf)
+        if df is None or df.empty:
+            console.print(f"[red]❌ Нет данных для {symbol} {tf}[/red]")
+            continue
 
-            metrics.update({
-                "Win_rate": round(win_rate, 4),
-                "Loss_rate": round(loss_rate, 4),
-                "Profit_factor": round(profit_factor, 4),
-                "Avg_trade_size": round(avg_size, 2),
-                "Avg_pnl_comm": round(avg_pnl_comm, 2),
-                "Duration_avg_sec": round(duration.mean(), 2),
-                "Duration_max_sec": round(duration.max(), 2),
-                "Duration_min_sec": round(duration.min(), 2)
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        data_hash = data_fingerprint(df)
+        todo, strategy_ids, keys = [], [], []
+        for params in param_grid:
+            strategy_id = params_hash(extract_strategy_params(params, strategy_param_keys))
+            key = run_key(strategy_id, symbol, tf, START_DATE, END_DATE, data_hash, "vector", RUN_CONFIG)
+            if cache is not None and key in cache:
+                sweep_metrics.append(cache.get(key)["metrics"])
+                continue
+            todo.append(params)
+            strategy_ids.append(strategy_id)
+            keys.append(key)
+
+        if not todo:
+            console.print(f"[cyan]♻️ {symbol} {tf}: все {len(param_grid)} комбинаций уже в кэше[/cyan]")
+            continue
+
+        rows, metrics_parts, exits_parts = [], [], []
+        if results_db is not None:
+            equity_bars = np.unique(np.r_[0:len(df):VECTOR_EQUITY_EVERY, len(df) - 1])
+            equity_index = df.index[equity_bars]
+        for start, result in iter_vectorized(
+            df,
+            todo,
+            chunk_size=VECTOR_CHUNK,
+            strategy_ids=strategy_ids,
+            initial_cash=INITIAL_CASH,
+            commission=COMMISSION_MODEL,
+            slippage=SLIPPAGE,
+            symbol=symbol,
+            timeframe=tf,
+            run_id=run_id,
+            keep_curves=PERF_METRICS or results_db is not None,
+            pruning=PRUNING
+        ):
+            metrics = result["metrics"]
+            if PERF_METRICS:
+                # Кривые блока — в метрики одним вызовом, дальше блок не нужен
+                perf = perf_metrics_frame(result["equity"], periods_per_year(tf),
+                                          position=result["position"], index=metrics.index)
+                metrics = pd.concat([metrics, perf], axis=1)
+            chunk_rows = metrics.to_dict("records")
+            rows.extend(chunk_rows)
+
+            if results_db is not None:
+                # Строка runs на комбинацию; исполнения выходов — сделками этой комбинации
+                exits = result["exits"].assign(
+                    duration_sec=lambda x: (x["exit_datetime"] - x["entry_datetime"]).dt.total_seconds(),
+                    exit_reason=lambda x: x["reason"]
+                )
+                exits_by_combo = dict(tuple(exits.groupby("combo")))
+                curves = result["equity"][:, equity_bars]
+                for combo, row, curve in zip(metrics.index, chunk_rows, curves):
+                    results_db.add_run({
+                        "run_key": keys[combo],
+                        "run_id": run_id,
+                        "strategy_id": row["strategy_id"],
+                        "symbol": symbol,
+                        "timeframe": tf,
+                        "engine": "vector",
+                        "start_date": START_DATE,
+                        "end_date": END_DATE,
+                        "status": row.get("Status", "completed")
+                    }, row, params=todo[combo], trades=exits_by_combo.get(combo),
+                        equity=pd.Series(curve, index=equity_index))
+            else:
+                metrics_parts.append(metrics)
+                exits_parts.append(result["exits"])
+            del result  # пока считается следующий блок, кривые этого уже не держим
+
+        if results_db is not None:
+            stored_at = RESULTS_DB
+        else:
+            result_path = generate_result_path(symbol, tf, {"run_id": run_id, "strategy_id": "vector"})
+            save_params(result_path, {
+                "engine": "vector",
+                "param_grid": todo,
+                "strategy_ids": strategy_ids,
+                "symbol": symbol,
+                "timeframe": tf,
+                "start_date": START_DATE,
+                "end_date": END_DATE
             })
+            save_metrics_table(result_path, pd.concat(metrics_parts))
+            pd.concat(exits_parts).to_csv(result_path / "exits.csv", index=False)
+            stored_at = str(result_path)
+
+        for key, metrics in zip(keys, rows):
+            sweep_metrics.append(metrics)
+            if cache is not None:
+                cache.put(key, metrics, strategy_id=metrics["strategy_id"], symbol=symbol, timeframe=tf,
+                          engine="vector", run_id=run_id,
+                          result_path=f"{stored_at}#{key}" if results_db is not None else stored_at)
+
+        console.print(
+            f"[green]✅ {symbol} {tf}: {len(todo)} новых из {len(param_grid)} комбинаций → {stored_at}[/green]"
+        )
+
+    if results_db is not None:
+        results_db.close()
+    if sweep_metrics:
+        save_sweep_metrics(sweep_metrics)
+
+def run_param_search():
+    """
+    Адаптивный поиск по param_ranges (SEARCH_METHOD) поверх векторного движка.
+    Пачки комбинаций оцениваются параллельно в пуле процессов (SearchPool: целевая функция
+    и её кэш индикаторов — один раз на процесс); все оценки сохраняются в search.csv
+    на (symbol, tf), лучшей считается только оценка на полном окне.
+    """
+    market_data = load_market_data(SYMBOLS, TIMEFRAMES, start_date=START_DATE, end_date=END_DATE)
 
-            agg_trades = pd.DataFrame([
-                ["total_closed", len(trades_df)],
-                ["avg_pnl", trades_df["pnl"].mean()],
-                ["avg_pnl_comm", avg_pnl_comm],
-                ["avg_size", avg_size],
-                ["win_rate", win_rate],
-                ["loss_rate", loss_rate],
-                ["profit_factor", profit_factor]
-            ], columns=["metric", "value"])
-            save_trades(result_path, agg_trades)
-
-        save_metrics(result_path, metrics)
-
-        equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-        equity_df["date"] = pd.to_datetime(equity_df["date"])
-        equity_df.set_index("date", inplace=True)
-        save_equity_curve(result_path, equity_df)
-        save_equity_plot_png(result_path, equity_df)
-        save_entry_log(result_path, strat.entry_log)
-        save_exit_log(result_path, strat.exit_log)
-
-        qs.reports.html(
-            returns=equity_df["equity"],
-            title=f"{symbol} {tf} | {strategy_id}",
-            output=result_path / f"{result_path.name}_quantstats.html",
-            download=False
+    for symbol, tf in product(SYMBOLS, TIMEFRAMES):
+        df = market_data.get(symbol, {}).get(tf)
+        if df is None or df.empty:
+            console.print(f"[red]❌ Нет данных для {symbol} {tf}[/red]")
+            continue
+
+        objective = VectorObjective(
+            df,
+            metric=SEARCH_METRIC,
+            initial_cash=INITIAL_CASH,
+            commission=COMMISSION_MODEL,
+            slippage=SLIPPAGE,
+            pruning=PRUNING
         )
+        with SearchPool(objective, max_workers=SEARCH_WORKERS) as executor:
+            trials = search_params(
+                param_ranges,
+                objective,
+                method=SEARCH_METHOD,
+                budget_fraction=SEARCH_BUDGET_FRACTION,
+                executor=executor,
+                partial=True
+            )
 
-        indicators = {}
-        for key in ["rsi", "atr", "shandeller_exit", "ema", "kama"]:
-            if key in df.columns:
-                indicators[key.upper()] = df[key]
-
-        plot_strategy_chart(
-            df=df,
-            entry_log=strat.entry_log,
-            exit_log=strat.exit_log,
-            indicators=indicators,
-            save_path=result_path / f"{result_path.name}_strategy_chart.html"
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_path = generate_result_path(symbol, tf, {"run_id": run_id, "strategy_id": SEARCH_METHOD})
+        trials_df = pd.DataFrame([
+            {**trial["params"], "fraction": trial["fraction"], SEARCH_METRIC: trial["score"]}
+            for trial in trials
+        ])
+        trials_df.to_csv(result_path / "search.csv", index=False)
+
+        full = [trial for trial in trials if trial["fraction"] == 1.0]
+        best = full[0] if full else None
+        console.print(
+            f"[green]✅ {symbol} {tf}: {len(trials)} оценок ({SEARCH_METHOD}), "
+            f"лучший {SEARCH_METRIC} на полном окне = {best['score'] if best else None}[/green]"
         )
 
 if __name__ == "__main__":
-    run()
+    if SEARCH_METHOD != "grid":
+        run_param_search()
+    elif ENGINE == "vector":
+        run_vectorized_sweep()
+    else:
+        run()
     console.print("\n[bold green]✅ Все прогоны завершены.[/bold green]")
 
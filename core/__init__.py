@@ -1,11 +1,14 @@
 from .data_manager import load_market_data
-from .exit_engine import evaluate_exit_levels
+from .exit_engine import evaluate_exit_levels, compile_exit_levels, CompiledExits, ExitLedger
 from .indicator_engine import apply_indicators
-from .param_grid import generate_param_grid
+from .param_grid import generate_param_grid, iter_param_grid, params_hash
+from .param_search import search_params, VectorObjective, SearchPool, SEARCH_METHODS
 from .reporting import (
     generate_result_path,
     save_params,
     save_metrics,
+    save_metrics_table,
+    save_sweep_metrics,
     save_trades,
     save_trades_full,
     save_equity_curve,
@@ -14,16 +17,64 @@ from .reporting import (
     save_equity_plot_png   
 )
 from .visualization import plot_strategy_chart
+from .vector_engine import run_vectorized, iter_vectorized, build_indicator_cache
+from .portfolio_engine import run_portfolio, align_panel
+from .walk_forward import walk_forward, make_folds
+from .robustness import simulate_paths, robustness_report, robustness_from_trades_csv
+from .run_cache import RunCache, run_key, data_fingerprint, ENGINE_VERSION
+from .job_queue import JobQueue, job_key, default_worker_id
+from .pruning import PruningRules, PRUNE_REASONS
+from .results_db import ResultsDB, DEFAULT_RESULTS_DB, strategy_family, flatten_params
+from .results_query import ResultsQuery
+from .overfitting import (
+    load_returns,
+    deflated_sharpe,
+    probability_of_overfitting,
+    reality_check,
+    selection_bias_report
+)
+from .sensitivity import (
+    MetricSurface,
+    surface_from_frame,
+    surface_from_db,
+    stability_scores,
+    robust_plateaus,
+    plot_sensitivity_heatmap
+)
+from .trade_ledger import TradeLedger, trade_stats, trades_frame, closed_trade_metrics
+from .stream_sink import StreamSink, read_stream
+from .recorders import ArrayRecorder, RecorderMixin
+from .perf_metrics import batch_metrics, perf_metrics_frame, periods_per_year, validate_against_quantstats
+from .report_bundle import ReportBundle, bundle_run_id
+from .artifacts import (
+    render_heavy_artifacts,
+    render_artifacts,
+    render_run,
+    load_run_metrics,
+    select_runs_db,
+    select_runs_folders
+)
 from .take_profit_config import TakeProfitMode, ExitType
 
 __all__ = [
     "load_market_data",
     "evaluate_exit_levels",
+    "compile_exit_levels",
+    "CompiledExits",
+    "ExitLedger",
     "apply_indicators",
     "generate_param_grid",
+    "iter_param_grid",
+    "params_hash",
+    "search_params",
+    "VectorObjective",
+    "SearchPool",
+    "SEARCH_METHODS",
     "generate_result_path",
     "save_params",
     "save_metrics",
+    "save_metrics_table",
+    "save_sweep_metrics",
     "save_trades",
     "save_trades_full",
     "save_equity_curve",
@@ -31,6 +82,61 @@ __all__ = [
     "save_entry_log", 
     "save_equity_plot_png",  
     "plot_strategy_chart",
+    "run_vectorized",
+    "iter_vectorized",
+    "build_indicator_cache",
+    "run_portfolio",
+    "align_panel",
+    "walk_forward",
+    "make_folds",
+    "simulate_paths",
+    "robustness_report",
+    "robustness_from_trades_csv",
+    "RunCache",
+    "run_key",
+    "data_fingerprint",
+    "ENGINE_VERSION",
+    "JobQueue",
+    "job_key",
+    "default_worker_id",
+    "PruningRules",
+    "PRUNE_REASONS",
+    "ResultsDB",
+    "DEFAULT_RESULTS_DB",
+    "strategy_family",
+    "flatten_params",
+    "ResultsQuery",
+    "load_returns",
+    "deflated_sharpe",
+    "probability_of_overfitting",
+    "reality_check",
+    "selection_bias_report",
+    "MetricSurface",
+    "surface_from_frame",
+    "surface_from_db",
+    "stability_scores",
+    "robust_plateaus",
+    "plot_sensitivity_heatmap",
+    "TradeLedger",
+    "trade_stats",
+    "trades_frame",
+    "closed_trade_metrics",
+    "StreamSink",
+    "read_stream",
+    "ArrayRecorder",
+    "RecorderMixin",
+    "batch_metrics",
+    "perf_metrics_frame",
+    "periods_per_year",
+    "validate_against_quantstats",
+    "ReportBundle",
+    "bundle_run_id",
+    "render_heavy_artifacts",
+    "render_artifacts",
+    "render_run",
+    "load_run_metrics",
+    "select_runs_db",
+    "select_runs_folders",
     "TakeProfitMode",
     "ExitType"
 ]
@@ -0,0 +1,342 @@
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+CHART_INDICATORS = ["rsi", "atr", "shandeller_exit", "ema", "kama"]
+# Бюджет точек графика стратегии: длиннее — свечи склеиваются, линии прореживаются (core.downsample)
+CHART_MAX_POINTS = 5000
+
+
+def render_heavy_artifacts(result_path, df, equity_df, entry_log, exit_log, title, timeframe=None,
+                           max_points=CHART_MAX_POINTS, bundle_root=None):
+    """
+    Тяжёлые артефакты прогона: equity.png, quantstats HTML и plotly-график стратегии.
+    df — свечи с уже посчитанными колонками индикаторов (apply_indicators).
+    timeframe — для аннуализации в отчёте quantstats (по умолчанию дневные бары).
+    bundle_root — график пишется данными в общий отчёт (core.report_bundle) вместо
+    отдельного HTML со встроенным plotly.js; строку индекса добавляет вызывающий.
+    """
+    import quantstats as qs
+    from .perf_metrics import equity_returns, periods_per_year, DAYS_PER_YEAR
+    from .reporting import save_equity_plot_png
+    from .visualization import plot_strategy_chart
+
+    result_path = Path(result_path)
+    save_equity_plot_png(result_path, equity_df)
+
+    qs.reports.html(
+        returns=equity_returns(equity_df["equity"]),
+        periods_per_year=periods_per_year(timeframe) if timeframe else DAYS_PER_YEAR,
+        title=title,
+        output=result_path / f"{result_path.name}_quantstats.html",
+        download=False
+    )
+
+    indicators = {key.upper(): df[key] for key in CHART_INDICATORS if key in df.columns}
+    fig = plot_strategy_chart(
+        df=df,
+        entry_log=entry_log,
+        exit_log=exit_log,
+        indicators=indicators,
+        save_path=None if bundle_root else result_path / f"{result_path.name}_strategy_chart.html",
+        max_points=max_points
+    )
+    if bundle_root:
+        from .report_bundle import ReportBundle, bundle_run_id
+        ReportBundle(bundle_root).write_chart(bundle_run_id(result_path), fig)
+    return result_path
+
+
+# === Выбор прогонов для отрисовки
+
+def select_runs_db(db_path, metric="Final_portfolio_growth_percent", top=20, strategy_id=None,
+                   symbol=None, timeframe=None, ascending=False):
+    """
+    Прогоны из ResultsDB: по strategy_id или топ-N по метрике (через индекс metrics(name, value)).
+    Возвращает список заданий для render_run. Векторный прогон без сохранённой кривой
+    помечается rebuild — render_run пересчитает его комбинацию; прочие прогоны без кривой
+    (например, отсечённые pruning) остаются в выборке и завершатся ошибкой «нет equity».
+    """
+    from .results_db import ResultsDB
+
+    filters, args = ["m.name = ?"], [metric]
+    for column, value in (("strategy_id", strategy_id), ("symbol", symbol), ("timeframe", timeframe)):
+        if value is not None:
+            filters.append(f"r.{column} = ?")
+            args.append(value)
+
+    with ResultsDB(db_path) as db:
+        rows = db.conn.execute(
+            "SELECT r.run_pk, r.symbol, r.timeframe, r.strategy_id, r.engine, r.start_date, r.end_date, "
+            "e.run_pk IS NOT NULL, m.value "
+            "FROM metrics m JOIN runs r ON r.run_pk = m.run_pk "
+            "LEFT JOIN equity e ON e.run_pk = r.run_pk "
+            f"WHERE {' AND '.join(filters)} "
+            f"ORDER BY m.value {'ASC' if ascending else 'DESC'} LIMIT ?",
+            (*args, top),
+        ).fetchall()
+
+    return [
+        {
+            "source": "db", "db_path": str(db_path), "run_pk": run_pk,
+            "symbol": sym, "timeframe": tf, "strategy_id": sid,
+            "start_date": start, "end_date": end, "rebuild": not has_equity and engine == "vector",
+            metric: value,
+        }
+        for run_pk, sym, tf, sid, engine, start, end, has_equity, value in rows
+    ]
+
+
+def select_runs_folders(index_path=Path("results") / "run_index.jsonl", metric="Final_portfolio_growth_percent",
+                        top=20, strategy_id=None, symbol=None, timeframe=None, ascending=False):
+    """
+    Прогоны из индекса кэша (run_index.jsonl) с папкой, где лежит equity_curve.csv.
+    Векторный прогон (одна папка на всю сетку, кривых нет) помечается rebuild:
+    render_run пересчитает его комбинацию по params.json свипа в отдельную папку.
+    """
+    from .run_cache import RunCache
+
+    candidates = []
+    for entry in RunCache(index_path).entries.values():
+        result_path = Path(entry.get("result_path", ""))
+        rebuild = entry.get("engine") == "vector" and (result_path / "params.json").exists()
+        if not rebuild and not (result_path / "equity_curve.csv").exists():
+            continue
+        if any(v is not None and entry.get(k) != v
+               for k, v in (("strategy_id", strategy_id), ("symbol", symbol), ("timeframe", timeframe))):
+            continue
+        value = entry.get("metrics", {}).get(metric)
+        if value is None or pd.isna(value):
+            continue
+        candidates.append({
+            "source": "folders", "result_path": str(result_path),
+            "symbol": entry["symbol"], "timeframe": entry["timeframe"], "strategy_id": entry["strategy_id"],
+            "run_id": entry.get("run_id"), "rebuild": rebuild, metric: value,
+        })
+
+    candidates.sort(key=lambda c: c[metric], reverse=not ascending)
+    return candidates[:top]
+
+
+# === Отрисовка
+
+def _load_db_run(spec):
+    from .reporting import generate_result_path
+    from .results_db import ResultsDB
+
+    with ResultsDB(spec["db_path"]) as db:
+        run = db.run(spec["run_pk"])
+        equity = db.equity(spec["run_pk"])
+        trades = db.trades(spec["run_pk"])
+    if equity.empty:
+        raise ValueError(f"У прогона {spec['run_pk']} нет кривой equity")
+
+    entries = trades.dropna(subset=["entry_datetime"])
+    exits = trades.dropna(subset=["exit_datetime"])
+    entry_log = [{"timestamp": t, "price": p} for t, p in zip(entries["entry_datetime"], entries["entry_price"])]
+    exit_log = [
+        {"timestamp": t, "price": p, "reason": r}
+        for t, p, r in zip(exits["exit_datetime"], exits["exit_price"], exits["exit_reason"])
+    ]
+    result_path = generate_result_path(run["symbol"], run["timeframe"], run)
+    equity_df = equity.to_frame()
+    equity_df.index.name = "date"
+    return result_path, run["params"] or {}, equity_df, entry_log, exit_log
+
+
+def _load_folder_run(spec):
+    result_path = Path(spec["result_path"])
+    with open(result_path / "params.json") as f:
+        params = json.load(f)
+    equity_df = pd.read_csv(result_path / "equity_curve.csv", index_col=0, parse_dates=True)
+
+    logs = []
+    for name in ("entry_log.csv", "exit_log.csv"):
+        path = result_path / name
+        logs.append(pd.read_csv(path, parse_dates=["timestamp"]).to_dict("records") if path.exists() else [])
+    return result_path, params, equity_df, logs[0], logs[1]
+
+
+def load_run_metrics(spec):
+    """Все метрики выбранного прогона (из ResultsDB или metrics.csv папки)."""
+    if spec["source"] == "db":
+        from .results_db import ResultsDB
+        with ResultsDB(spec["db_path"]) as db:
+            return db.metrics(spec["run_pk"])
+    path = Path(spec["result_path"]) / "metrics.csv"
+    if not path.exists():
+        return {}
+    metrics = pd.read_csv(path)
+    if spec.get("rebuild"):
+        # metrics.csv векторного свипа — строка на комбинацию
+        metrics = metrics[metrics["strategy_id"] == spec["strategy_id"]]
+    return metrics.iloc[0].to_dict() if len(metrics) else {}
+
+
+def _load_pnl(spec, result_path):
+    """PnL сделок прогона с комиссией (ResultsDB или trades_full.csv папки)."""
+    if spec["source"] == "db":
+        from .results_db import ResultsDB
+        with ResultsDB(spec["db_path"]) as db:
+            trades = db.trades(spec["run_pk"])
+    else:
+        path = Path(result_path) / "trades_full.csv"
+        trades = pd.read_csv(path) if path.exists() else pd.DataFrame(columns=["pnl_comm"])
+    return trades["pnl_comm"].to_numpy(dtype=float)
+
+
+def _load_candles(spec, start_date, end_date, base_dir):
+    from .data_manager import load_market_data
+
+    market = load_market_data([spec["symbol"]], [spec["timeframe"]], base_dir=base_dir,
+                              start_date=start_date, end_date=end_date)
+    df = market.get(spec["symbol"], {}).get(spec["timeframe"])
+    if df is None or df.empty:
+        raise ValueError(f"Нет данных для {spec['symbol']} {spec['timeframe']}")
+    return df
+
+
+def _vector_combo(spec):
+    """Параметры комбинации векторного прогона, run_id и период: из ResultsDB или params.json свипа."""
+    if spec["source"] == "db":
+        from .results_db import ResultsDB
+        with ResultsDB(spec["db_path"]) as db:
+            run = db.run(spec["run_pk"])
+        return run["params"] or {}, run["run_id"], run["start_date"], run["end_date"]
+
+    with open(Path(spec["result_path"]) / "params.json") as f:
+        sweep = json.load(f)
+    if spec["strategy_id"] not in sweep["strategy_ids"]:
+        raise ValueError(f"{spec['strategy_id']} нет в сетке {spec['result_path']}")
+    params = sweep["param_grid"][sweep["strategy_ids"].index(spec["strategy_id"])]
+    return params, spec.get("run_id"), sweep.get("start_date"), sweep.get("end_date")
+
+
+def _rebuild_vector_run(spec, base_dir, run_config):
+    """
+    Пересчёт одной комбинации векторного прогона (core.vector_engine) с кривой equity.
+    run_config — брокер и pruning свипа (RUN_CONFIG из backtest_runner): с другими
+    настройками кривая не совпала бы с метриками, поэтому итог сверяется с сохранённым.
+    Кривая, журналы и сделки пишутся в папку комбинации как у прогона backtrader;
+    возвращает (задание на эту папку, свечи).
+    """
+    from .reporting import (generate_result_path, save_params, save_metrics, save_equity_curve,
+                            save_entry_log, save_exit_log, save_trades_full)
+    from .vector_engine import run_vectorized
+
+    if run_config is None:
+        raise ValueError(f"Кривой прогона {spec['strategy_id']} нет, а для пересчёта не передан run_config")
+    params, run_id, start_date, end_date = _vector_combo(spec)
+    df = _load_candles(spec, start_date, end_date, base_dir)
+    result = run_vectorized(
+        df, [params], strategy_ids=[spec["strategy_id"]], symbol=spec["symbol"], timeframe=spec["timeframe"],
+        run_id=run_id or "", keep_curves=True, **run_config
+    )
+
+    stored = load_run_metrics(spec)
+    final_value = float(result["metrics"]["Final_portfolio_value"].iloc[0])
+    expected = stored.get("Final_portfolio_value")
+    if expected is not None and not math.isclose(final_value, expected, abs_tol=0.01):
+        raise ValueError(
+            f"Пересчёт {spec['strategy_id']} дал {final_value}, в результатах {expected}: "
+            "run_config или данные не совпадают со свипом"
+        )
+
+    exits = result["exits"]
+    trades = exits.assign(
+        duration_sec=(exits["exit_datetime"] - exits["entry_datetime"]).dt.total_seconds(),
+        exit_reason=exits["reason"]
+    )
+    entries = exits.drop_duplicates("entry_datetime")  # частичные выходы — несколько строк на вход
+    equity_df = pd.DataFrame({"equity": result["equity"][0]}, index=df.index.rename("date"))
+
+    result_path = generate_result_path(spec["symbol"], spec["timeframe"],
+                                       {"run_id": run_id, "strategy_id": spec["strategy_id"]})
+    save_params(result_path, {**params, "engine": "vector", "start_date": start_date, "end_date": end_date})
+    save_metrics(result_path, stored)
+    save_equity_curve(result_path, equity_df)
+    save_trades_full(result_path, trades)
+    save_entry_log(result_path, [{"timestamp": t, "price": p}
+                                 for t, p in zip(entries["entry_datetime"], entries["entry_price"])])
+    save_exit_log(result_path, [{"timestamp": t, "price": p, "reason": r}
+                                for t, p, r in zip(exits["exit_datetime"], exits["exit_price"], exits["reason"])])
+
+    rebuilt = {
+        "source": "folders", "result_path": str(result_path),
+        "symbol": spec["symbol"], "timeframe": spec["timeframe"], "strategy_id": spec["strategy_id"],
+        "start_date": start_date, "end_date": end_date,
+    }
+    return rebuilt, df
+
+
+def render_run(spec, base_dir="kline_data", bundle_root=None, robustness_sims=0, run_config=None):
+    """
+    Строит тяжёлые артефакты для одного выбранного прогона (задание из select_runs_*).
+    Свечи и индикаторы для графика загружаются заново — в хранилище только сырые ряды.
+    Векторный прогон без кривой (rebuild) сперва пересчитывается с run_config (_rebuild_vector_run).
+    robustness_sims > 0 — ещё и Монте-Карло по сделкам прогона (core.robustness) → robustness.csv.
+    """
+    from .indicator_engine import apply_indicators
+
+    df = None
+    if spec.get("rebuild"):
+        spec, df = _rebuild_vector_run(spec, base_dir, run_config)
+
+    loader = _load_db_run if spec["source"] == "db" else _load_folder_run
+    result_path, params, equity_df, entry_log, exit_log = loader(spec)
+    if df is None:
+        start_date = spec.get("start_date") or params.get("start_date")
+        end_date = spec.get("end_date") or params.get("end_date")
+        df = _load_candles(spec, start_date, end_date, base_dir)
+
+    df = apply_indicators(df.copy(), params)
+    render_heavy_artifacts(
+        result_path, df, equity_df, entry_log, exit_log,
+        title=f"{spec['symbol']} {spec['timeframe']} | {spec['strategy_id']}",
+        timeframe=spec["timeframe"],
+        bundle_root=bundle_root
+    )
+
+    if robustness_sims:
+        from .robustness import robustness_report
+        pnl = _load_pnl(spec, result_path)
+        if pnl.size:
+            initial_cash = load_run_metrics(spec).get("Initial_portfolio_value", 100000)
+            robustness_report(pnl, n_sims=robustness_sims, initial_cash=initial_cash).to_csv(
+                Path(result_path) / "robustness.csv", index=False
+            )
+    return result_path
+
+
+def render_artifacts(specs, max_workers=None, base_dir="kline_data", bundle_root=None, robustness_sims=0,
+                     run_config=None):
+    """
+    Параллельная отрисовка выбранных прогонов в пуле процессов.
+    run_config — брокер и pruning свипа для пересчёта векторных прогонов без кривой.
+    Возвращает список (spec, путь или None, ошибка или None) в порядке завершения.
+    """
+    if max_workers == 1:
+        results = []
+        for spec in specs:
+            try:
+                results.append((spec, render_run(spec, base_dir, bundle_root, robustness_sims, run_config), None))
+            except Exception as e:
+                results.append((spec, None, e))
+        return results
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(render_run, spec, base_dir, bundle_root, robustness_sims, run_config): spec
+            for spec in specs
+        }
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                results.append((spec, future.result(), None))
+            except Exception as e:
+                results.append((spec, None, e))
+    return results
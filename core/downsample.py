@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: индексы n_out точек ряда, сохраняющих форму линии.
+    Первая и последняя точки всегда в выборке; из каждой корзины берётся точка,
+    образующая наибольший треугольник с предыдущей выбранной и средним следующей корзины.
+    NaN (прогрев индикатора) в отбор не попадают.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y))
+    n = len(finite)
+    if n_out >= n or n_out < 3:
+        return finite
+
+    x, y = x[finite], y[finite]
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Удвоенная площадь треугольника (a, candidate, среднее следующей корзины)
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return finite[selected]
+
+
+def ohlc_buckets(n, n_out):
+    """Начала n_out корзин подряд идущих свечей (равные по числу баров)."""
+    if n_out >= n:
+        return np.arange(n)
+    return np.unique((np.arange(n_out) * (n / n_out)).astype(np.int64))
+
+
+def aggregate_ohlc(df, n_out):
+    """
+    Свечи, склеенные в n_out корзин: open первой, high / low — экстремумы, close последней.
+    Время корзины — время её первой свечи. Любая цена исполнения внутри корзины
+    остаётся между low и high склеенной свечи, поэтому маркеры сделок не «висят».
+    """
+    starts = ohlc_buckets(len(df), n_out)
+    if len(starts) == len(df):
+        return df
+    ends = np.append(starts[1:], len(df)) - 1
+    return pd.DataFrame({
+        "open": df["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(df["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(df["low"].to_numpy(), starts),
+        "close": df["close"].to_numpy()[ends],
+    }, index=df.index[starts])
+
+
+def marker_positions(index, timestamps):
+    """Позиции баров (в index) для времён маркеров: ближайший бар не позже маркера."""
+    if not len(timestamps):
+        return np.empty(0, dtype=np.int64)
+    ts = pd.DatetimeIndex(pd.to_datetime(list(timestamps)))
+    positions = np.searchsorted(index.asi8, ts.asi8, side="right") - 1
+    return np.clip(positions, 0, len(index) - 1)
+
+
+def downsample_series(index, values, n_out, keep=None):
+    """
+    LTTB-прореживание ряда индикатора до ~n_out точек.
+    keep — позиции баров, которые обязаны остаться (бары входов / выходов).
+    Возвращает Series на прореженном индексе.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else np.arange(len(values))
+    selected = lttb_indices(x, values, n_out)
+    if keep is not None and len(keep):
+        selected = np.union1d(selected, keep)
+    return pd.Series(values[selected], index=index[selected])
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def evaluate_exit_levels(levels, context):
@@ -69,3 +70,359 @@ def evaluate_exit_levels(levels, context):
         # можно добавить другие exit_type: "time", "custom", "volatility", etc.
 
     return exits
+
+
+# === Компилированные выходы
+#
+# take_profit {"mode", "levels"} компилируется один раз на весь ряд в массивы порогов.
+# На баре остаётся только сравнение с ценой входа / максимумом закрытия с момента входа:
+#   EXIT_ENTRY — выход, если threshold[i] >= entry_price    (atr: close - mult × ATR)
+#   EXIT_PEAK  — выход, если highest_close >= threshold[i]  (chandelier: close + atr_mult × ATR)
+#   EXIT_MASK  — выход, если threshold[i] > 0               (ema_cross / kama_cross)
+
+EXIT_NONE = 0
+EXIT_ENTRY = 1
+EXIT_PEAK = 2
+EXIT_MASK = 3
+
+DEFAULT_EMA_PERIOD = 21
+DEFAULT_KAMA_CONFIG = (10, 2, 30)
+
+# Режим "partial": после первого частичного выхода остаток ведётся трейлинг-стопом
+# max(entry_price, highest_close - atr_mult × ATR). take_profit["trail"] = None — без трейлинга.
+DEFAULT_TRAIL_ATR_MULT = 3.0
+
+# Причина выхода в журнале: индекс уровня (>= 0) или один из кодов ниже
+EXIT_REASON_SIGNAL = -1   # rsi > rsi_exit
+EXIT_REASON_TRAIL = -2    # трейлинг-стоп остатка
+
+
+def _ema_key(params):
+    return ("ema", params.get("period", DEFAULT_EMA_PERIOD))
+
+
+def _kama_key(params):
+    period, fast, slow = DEFAULT_KAMA_CONFIG
+    return ("kama", (params.get("period", period), params.get("fast", fast), params.get("slow", slow)))
+
+
+def exit_indicator_keys(take_profit):
+    """Ключи дополнительных индикаторов (EMA / KAMA), нужных уровням take_profit."""
+    keys = []
+    for level in (take_profit or {}).get("levels", []):
+        params = level.get("params", {})
+        if level["exit_type"] == "ema_cross":
+            keys.append(_ema_key(params))
+        elif level["exit_type"] == "kama_cross":
+            keys.append(_kama_key(params))
+    return keys
+
+
+def compute_exit_indicator(key, close):
+    from .indicator_engine import ema_array, kama_array
+
+    name, config = key
+    if name == "ema":
+        return ema_array(close, config)
+    return kama_array(close, *config)
+
+
+def _cross_mask(line, close):
+    """Условие evaluate_exit_levels: prev_line > price и line < price."""
+    mask = np.zeros(len(close))
+    prev = np.roll(line, 1)
+    with np.errstate(invalid="ignore"):
+        mask[1:] = ((prev > close) & (line < close))[1:]
+    return mask
+
+
+class CompiledExits:
+    """
+    Скомпилированный take_profit для одного ряда цен.
+    mode: "full" | "partial"
+    kinds: (уровни,) — EXIT_*
+    thresholds: (бары × уровни) — пороги из комментария выше (NaN — уровень не активен)
+    percents, exit_types, reasons: по уровню
+    trail_mult: множитель ATR трейлинга остатка в режиме "partial" (NaN — без трейлинга)
+    rsi_exit: порог сигнального выхода rsi > rsi_exit — для текста причины EXIT_REASON_SIGNAL
+    """
+
+    def __init__(self, mode, kinds, thresholds, percents, exit_types, reasons, trail_mult=np.nan, rsi_exit=70):
+        self.mode = mode
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        self.thresholds = thresholds
+        self.percents = np.asarray(percents, dtype=float)
+        self.exit_types = exit_types
+        self.reasons = reasons
+        self.trail_mult = float(trail_mult)
+        self.rsi_exit = rsi_exit
+
+    @property
+    def partial(self):
+        return self.mode == "partial"
+
+    def reason(self, code, mask=0):
+        """
+        Текст причины выхода по коду и маске уровней из журнала выходов.
+        Несколько уровней на одном баре (полный выход) — причины через "; ", как в SuperStrategy.
+        """
+        if code == EXIT_REASON_SIGNAL:
+            return f"rsi > {self.rsi_exit:g}"
+        if code == EXIT_REASON_TRAIL:
+            return f"Trailing stop ({self.trail_mult} ATR)"
+        if mask & (mask - 1):
+            return "; ".join(r for j, r in enumerate(self.reasons) if mask >> j & 1)
+        return self.reasons[code]
+
+    @property
+    def n_levels(self):
+        return len(self.kinds)
+
+    def hits(self, bar, entry_price, highest_close):
+        """
+        Адаптер для backtrader: какие уровни сработали на баре `bar`.
+        Возвращает bool-массив (уровни,).
+        """
+        return level_hits(self.kinds, self.thresholds[bar], entry_price, highest_close)
+
+
+def level_hits(kinds, thresholds, entry_price, highest_close):
+    """
+    Общая проверка срабатывания уровней, работает и для скаляров, и для массивов:
+    kinds / thresholds — (..., уровни), entry_price / highest_close — (...) или скаляры.
+    """
+    entry_price = np.asarray(entry_price, dtype=float)[..., None]
+    highest_close = np.asarray(highest_close, dtype=float)[..., None]
+    with np.errstate(invalid="ignore"):
+        return (
+            ((kinds == EXIT_ENTRY) & (thresholds >= entry_price))
+            | ((kinds == EXIT_PEAK) & (highest_close >= thresholds))
+            | ((kinds == EXIT_MASK) & (thresholds > 0))
+        )
+
+
+def trail_hits(close, entry_price, highest_close, atr, trail_mult):
+    """
+    Трейлинг-стоп остатка позиции после частичного выхода:
+    close <= max(entry_price, highest_close - trail_mult × ATR). NaN в trail_mult — не срабатывает.
+    """
+    with np.errstate(invalid="ignore"):
+        return close <= np.maximum(entry_price, highest_close - trail_mult * atr)
+
+
+def level_mask(hits):
+    """Битовая маска сработавших уровней: (..., уровни) bool → (...) int64, бит j — уровень j."""
+    hits = np.asarray(hits)
+    return hits.astype(np.int64) @ (np.int64(1) << np.arange(hits.shape[-1], dtype=np.int64))
+
+
+def partial_exit_step(hits, fired, percents, out_new=None, out_scale=None, scratch=None):
+    """
+    Шаг автомата частичных выходов: уровень срабатывает один раз за позицию.
+    hits / fired — (..., уровни) bool, percents — (..., уровни).
+    Возвращает (новые срабатывания, суммарная доля от размера входа к продаже).
+    fired не меняется — отметка делается только для тех, кому реально отправлен ордер.
+    out_new / out_scale / scratch (float, как hits) — буферы результата и промежуточного произведения.
+    """
+    new = np.greater(hits, fired, out=out_new)  # hits & ~fired без промежуточного ~fired
+    weights = np.multiply(new, percents, out=scratch)
+    return new, weights.sum(axis=-1, out=out_scale)
+
+
+class LevelCheck:
+    """
+    Проверки уровней для цикла по барам без новых массивов на баре.
+    Маски видов уровней считаются один раз, пороги бара, срабатывания, доли частичного
+    выхода и трейлинг пишутся в заранее выделенные буферы (позиции × уровни / позиции).
+    Возвращаемые массивы — сами буферы: они действительны до следующего вызова.
+    После сжатия векторов состояния (pruning) объект создаётся заново по оставшимся kinds.
+    """
+
+    def __init__(self, kinds):
+        kinds = np.asarray(kinds)
+        shape, rows = kinds.shape, kinds.shape[:-1]
+        self.is_entry = kinds == EXIT_ENTRY
+        self.is_peak = kinds == EXIT_PEAK
+        self.is_mask = kinds == EXIT_MASK
+        self.thresholds = np.empty(shape)
+        self.hits = np.empty(shape, dtype=bool)
+        self.new_hits = np.zeros(shape, dtype=bool)
+        self.any_hit = np.empty(rows, dtype=bool)
+        self.scale = np.empty(rows)
+        self.trail = np.empty(rows, dtype=bool)
+        self._cmp = np.empty(shape, dtype=bool)
+        self._weights = np.empty(shape)
+        self._stop = np.empty(rows)
+
+    def gather(self, thresholds, index):
+        """Пороги бара (конфиги × уровни) для позиций по номерам конфигов index."""
+        return np.take(thresholds, index, axis=0, out=self.thresholds)
+
+    def level_hits(self, thresholds, entry_price, highest_close):
+        """Как level_hits, результат — в self.hits."""
+        out, cmp = self.hits, self._cmp
+        with np.errstate(invalid="ignore"):
+            np.greater_equal(thresholds, entry_price[..., None], out=out)
+            out &= self.is_entry
+            np.greater_equal(highest_close[..., None], thresholds, out=cmp)
+            cmp &= self.is_peak
+            out |= cmp
+            np.greater(thresholds, 0, out=cmp)
+            cmp &= self.is_mask
+            out |= cmp
+        return out
+
+    def any_level(self, hits):
+        """Сработал хотя бы один уровень — в self.any_hit."""
+        return np.any(hits, axis=-1, out=self.any_hit)
+
+    def partial_step(self, hits, fired, percents):
+        """partial_exit_step в буферы: (self.new_hits, self.scale)."""
+        return partial_exit_step(hits, fired, percents, out_new=self.new_hits,
+                                 out_scale=self.scale, scratch=self._weights)
+
+    def trail_hits(self, close, entry_price, highest_close, atr, trail_mult):
+        """Как trail_hits, результат — в self.trail."""
+        stop = self._stop
+        with np.errstate(invalid="ignore"):
+            np.multiply(trail_mult, atr, out=stop)
+            np.subtract(highest_close, stop, out=stop)
+            np.maximum(entry_price, stop, out=stop)
+            return np.less_equal(close, stop, out=self.trail)
+
+    def mark_fired(self, fired, sent):
+        """fired |= new_hits там, где ордер частичного выхода реально отправлен (sent — по позициям)."""
+        np.logical_and(self.new_hits, sent[..., None], out=self._cmp)
+        fired |= self._cmp
+
+
+def compile_exit_levels(take_profit, close, atr, indicators=None, rsi_exit=70):
+    """
+    Компилирует take_profit в CompiledExits для ряда close / atr.
+    indicators: кэш {("ema", 21): ndarray, ("kama", (10, 2, 30)): ndarray, ...};
+    недостающие линии досчитываются по close.
+    rsi_exit — порог сигнального выхода движка (только для текста причины в журнале).
+    """
+    take_profit = take_profit or {}
+    close = np.asarray(close, dtype=float)
+    atr = np.asarray(atr, dtype=float)
+    indicators = {} if indicators is None else indicators
+
+    kinds, columns, percents, exit_types, reasons = [], [], [], [], []
+    for level in take_profit.get("levels", []):
+        exit_type = level["exit_type"]
+        params = level.get("params", {})
+
+        if exit_type == "atr":
+            mult = params.get("mult", 1.0)
+            kinds.append(EXIT_ENTRY)
+            columns.append(close - mult * atr)
+            reasons.append(f"Price >= entry + {mult} ATR")
+        elif exit_type == "chandelier":
+            atr_mult = params.get("atr_mult", 3.0)
+            kinds.append(EXIT_PEAK)
+            columns.append(close + atr_mult * atr)
+            reasons.append(f"Price <= Chandelier stop ({atr_mult} ATR)")
+        elif exit_type in ("ema_cross", "kama_cross"):
+            key = _ema_key(params) if exit_type == "ema_cross" else _kama_key(params)
+            if key not in indicators:
+                indicators[key] = compute_exit_indicator(key, close)
+            kinds.append(EXIT_MASK)
+            columns.append(_cross_mask(indicators[key], close))
+            reasons.append("Price crossed above EMA" if exit_type == "ema_cross" else "Price crossed above KAMA")
+        else:
+            continue  # "custom" и прочие — только через evaluate_exit_levels
+
+        percents.append(level.get("percent", 1.0))
+        exit_types.append(exit_type)
+
+    thresholds = np.column_stack(columns) if columns else np.empty((len(close), 0))
+    mode = getattr(take_profit.get("mode", "full"), "value", take_profit.get("mode", "full"))
+
+    trail_mult = np.nan
+    if mode == "partial":
+        trail = take_profit.get("trail", {})
+        if trail is not None:
+            trail_mult = trail.get("atr_mult", DEFAULT_TRAIL_ATR_MULT)
+
+    return CompiledExits(mode, kinds, thresholds, percents, exit_types, reasons, trail_mult, rsi_exit)
+
+
+def stack_compiled_exits(compiled_list):
+    """
+    Склеивает несколько CompiledExits (разные take_profit / ATR-периоды) в общие массивы
+    для векторного движка; недостающие уровни дополняются EXIT_NONE.
+    Возвращает (kinds: конфиги × уровни, thresholds: бары × конфиги × уровни, percents: конфиги × уровни).
+    Режим и трейлинг по конфигам — в самих CompiledExits (partial, trail_mult).
+    """
+    n_configs = len(compiled_list)
+    n_levels = max([c.n_levels for c in compiled_list] + [1])
+    n_bars = compiled_list[0].thresholds.shape[0] if compiled_list else 0
+
+    kinds = np.full((n_configs, n_levels), EXIT_NONE, dtype=np.int8)
+    thresholds = np.full((n_bars, n_configs, n_levels), np.nan)
+    percents = np.zeros((n_configs, n_levels))
+    for k, compiled in enumerate(compiled_list):
+        n = compiled.n_levels
+        kinds[k, :n] = compiled.kinds
+        thresholds[:, k, :n] = compiled.thresholds
+        percents[k, :n] = compiled.percents
+    return kinds, thresholds, percents
+
+
+# === Журнал выходов
+#
+# Каждое исполнение выхода (в том числе каждый частичный) — отдельная строка;
+# несколько частичных уровней на одном баре — по строке на уровень.
+# slot — номер комбинации (векторный движок) или символа (портфель),
+# level — индекс уровня take_profit (первого из сработавших) или EXIT_REASON_*,
+# level_mask — биты всех уровней, по которым исполнена строка (0 — сигнал / трейлинг).
+
+EXIT_LEDGER_DTYPE = np.dtype([
+    ("slot", np.int64),
+    ("entry_bar", np.int64),
+    ("exit_bar", np.int64),
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("size", np.float64),
+    ("pnl", np.float64),
+    ("pnl_comm", np.float64),
+    ("level", np.int8),
+    ("level_mask", np.int64),
+])
+
+
+class ExitLedger:
+    """
+    Предвыделенный структурированный массив строк выходов.
+    На баре — только запись срезов; при заполнении ёмкость удваивается,
+    так что число перевыделений логарифмическое, а не по строке на сделку.
+    """
+
+    def __init__(self, capacity=1024):
+        self.rows = np.empty(max(int(capacity), 1), dtype=EXIT_LEDGER_DTYPE)
+        self.size = 0
+
+    def append(self, slot, entry_bar, exit_bar, entry_price, exit_price, size, pnl, pnl_comm, level, level_mask=0):
+        n = len(slot)
+        end = self.size + n
+        if end > len(self.rows):
+            grown = np.empty(max(end, 2 * len(self.rows)), dtype=EXIT_LEDGER_DTYPE)
+            grown[:self.size] = self.rows[:self.size]
+            self.rows = grown
+
+        rows = self.rows[self.size:end]
+        rows["slot"] = slot
+        rows["entry_bar"] = entry_bar
+        rows["exit_bar"] = exit_bar
+        rows["entry_price"] = entry_price
+        rows["exit_price"] = exit_price
+        rows["size"] = size
+        rows["pnl"] = pnl
+        rows["pnl_comm"] = pnl_comm
+        rows["level"] = level
+        rows["level_mask"] = level_mask
+        self.size = end
+
+    def to_array(self):
+        return self.rows[:self.size]
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def apply_indicators(df, params):
@@ -22,3 +23,88 @@ def apply_indicators(df, params):
         df["atr"] = tr.rolling(window=period).mean()
 
     return df
+
+
+# === Индикаторы на массивах (для векторных движков и компилятора выходов)
+
+def wilder_smooth(values, period):
+    """
+    Сглаживание Уайлдера (SMMA), как в backtrader:
+    первое значение — SMA за `period` баров, далее alpha = 1 / period.
+    NaN в начале ряда пропускаются.
+    """
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return out
+
+    seed = valid[0] + period - 1
+    seeded = values.copy()
+    seeded[:seed] = np.nan
+    seeded[seed] = values[valid[0]:seed + 1].mean()
+    out[seed:] = pd.Series(seeded[seed:]).ewm(alpha=1.0 / period, adjust=False).mean().to_numpy()
+    return out
+
+
+def rsi_wilder(close, period):
+    """RSI как bt.indicators.RSI (UpDay / DownDay + SMMA)."""
+    close = np.asarray(close, dtype=float)
+    delta = np.full(close.shape, np.nan)
+    delta[1:] = np.diff(close)
+    up = np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None))
+    down = np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None))
+
+    avg_up = wilder_smooth(up, period)
+    avg_down = wilder_smooth(down, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_up / avg_down
+        rsi = 100 - 100 / (1 + rs)
+    rsi[(avg_down == 0) & ~np.isnan(avg_up)] = 100.0
+    return rsi
+
+
+def atr_wilder(high, low, close, period):
+    """ATR как bt.indicators.ATR (TrueRange + SMMA)."""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    tr = np.full(close.shape, np.nan)
+    prev_close = close[:-1]
+    tr[1:] = np.maximum(high[1:], prev_close) - np.minimum(low[1:], prev_close)
+    return wilder_smooth(tr, period)
+
+
+def ema_array(close, period):
+    """EMA как bt.indicators.EMA: seed — SMA за period баров, далее alpha = 2 / (period + 1)."""
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    if len(close) < period:
+        return out
+    seeded = close.copy()
+    seeded[period - 1] = close[:period].mean()
+    out[period - 1:] = pd.Series(seeded[period - 1:]).ewm(alpha=2.0 / (period + 1), adjust=False).mean().to_numpy()
+    return out
+
+
+def kama_array(close, period=10, fast=2, slow=30):
+    """KAMA (Kaufman) — та же формула, что в general_kama_market_breadth.kama."""
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    if len(close) < period + 1:
+        return out
+
+    direction = np.full(close.shape, np.nan)
+    direction[period:] = np.abs(close[period:] - close[:-period])
+    step = np.abs(np.diff(close, prepend=np.nan))
+    volatility = pd.Series(step).rolling(period).sum().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        er = np.nan_to_num(direction / volatility)
+    fast_sc = 2 / (fast + 1)
+    slow_sc = 2 / (slow + 1)
+    sc = (er * (fast_sc - slow_sc) + slow_sc) ** 2
+
+    out[period - 1] = close[period - 1]
+    for i in range(period, len(close)):
+        out[i] = out[i - 1] + sc[i] * (close[i] - out[i - 1])
+    return out
@@ -0,0 +1,261 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from .param_grid import params_hash
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY,
+    job_key     TEXT NOT NULL UNIQUE,
+    symbol      TEXT NOT NULL,
+    timeframe   TEXT NOT NULL,
+    start_date  TEXT,
+    end_date    TEXT,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    lease_until REAL,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_until);
+CREATE INDEX IF NOT EXISTS jobs_market ON jobs (symbol, timeframe, status);
+"""
+
+
+def default_worker_id():
+    """host:pid — уникально для процесса на любой машине, видно в status."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def job_key(symbol, timeframe, params, start_date=None, end_date=None):
+    """Ключ задания: повторная постановка той же сетки не плодит дубликатов."""
+    return params_hash({
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "params": params,
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+    }, length=None)
+
+
+class JobQueue:
+    """
+    Очередь заданий свипа (symbol, timeframe, params) в одном SQLite-файле.
+    Файл может лежать в общей директории: воркеры с разных машин / контейнеров
+    забирают задания с арендой (lease) и пишут результат обратно.
+
+    Захват — одна транзакция BEGIN IMMEDIATE + UPDATE ... RETURNING, поэтому
+    два воркера никогда не получат одно задание. Аренда продлевается heartbeat();
+    если воркер умер, по истечении lease_seconds задание снова становится
+    доступным (до max_attempts попыток, потом — failed).
+
+    Журнал — классический rollback (не WAL): WAL не работает на сетевых ФС.
+    """
+
+    def __init__(self, db_path=Path("results") / "sweep_queue.sqlite", lease_seconds=600, max_attempts=3):
+        self.db_path = Path(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout = 60000")
+        return _Connection(conn)
+
+    # === Координатор
+
+    def enqueue(self, jobs, start_date=None, end_date=None):
+        """
+        jobs: итерируемое из словарей {"symbol", "timeframe", "params"}.
+        Возвращает число реально добавленных заданий (уже стоящие в очереди пропускаются).
+        """
+        now = time.time()
+        rows = [
+            (
+                job_key(job["symbol"], job["timeframe"], job["params"], start_date, end_date),
+                job["symbol"], job["timeframe"], str(start_date), str(end_date),
+                json.dumps(job["params"], default=str, ensure_ascii=False), now, now,
+            )
+            for job in jobs
+        ]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (job_key, symbol, timeframe, start_date, end_date, params, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        return added
+
+    def recover_expired(self):
+        """Возвращает в очередь задания с истёкшей арендой (или помечает failed после max_attempts)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, "
+                "error = 'lease expired', updated_at = ? "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (JOB_FAILED, now, JOB_RUNNING, now, self.max_attempts),
+            ).rowcount
+            recovered = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_until < ?",
+                (JOB_PENDING, now, JOB_RUNNING, now),
+            ).rowcount
+            conn.execute("COMMIT")
+        return {"recovered": recovered, "failed": failed}
+
+    # === Воркер
+
+    def claim(self, worker_id, batch_size=64):
+        """
+        Забирает до batch_size заданий одного (symbol, timeframe) — векторный движок
+        прогоняет их одним проходом по барам. Возвращает список словарей
+        {"id", "symbol", "timeframe", "start_date", "end_date", "params", "attempts"}.
+        """
+        self.recover_expired()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            head = conn.execute(
+                "SELECT symbol, timeframe FROM jobs WHERE status = ? ORDER BY id LIMIT 1",
+                (JOB_PENDING,),
+            ).fetchone()
+            if head is None:
+                conn.execute("COMMIT")
+                return []
+            rows = conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id IN ("
+                "    SELECT id FROM jobs WHERE status = ? AND symbol = ? AND timeframe = ? ORDER BY id LIMIT ?"
+                ") RETURNING id, symbol, timeframe, start_date, end_date, params, attempts",
+                (JOB_RUNNING, worker_id, now + self.lease_seconds, now,
+                 JOB_PENDING, head["symbol"], head["timeframe"], batch_size),
+            ).fetchall()
+            conn.execute("COMMIT")
+
+        return [{**dict(row), "params": json.loads(row["params"])} for row in rows]
+
+    def heartbeat(self, worker_id, job_ids):
+        """Продлевает аренду своих заданий; возвращает число продлённых."""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET lease_until = ?, updated_at = ? "
+                f"WHERE worker = ? AND status = ? AND id IN ({_placeholders(job_ids)})",
+                (now + self.lease_seconds, now, worker_id, JOB_RUNNING, *job_ids),
+            ).rowcount
+
+    def complete(self, worker_id, results):
+        """
+        results: {job_id: metrics dict}. Записываются только задания, которые всё ещё
+        за этим воркером (если аренду перехватили — результат достаётся новому владельцу).
+        """
+        now = time.time()
+        rows = [
+            (json.dumps(metrics, default=_json_default, ensure_ascii=False), now, job_id, worker_id, JOB_RUNNING)
+            for job_id, metrics in results.items()
+        ]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                f"UPDATE jobs SET status = '{JOB_DONE}', result = ?, error = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                rows,
+            )
+            written = conn.total_changes - before
+            conn.execute("COMMIT")
+        return written
+
+    def fail(self, worker_id, job_ids, error):
+        """Ошибка прогона: задание возвращается в очередь, после max_attempts — failed."""
+        now = time.time()
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                f"WHERE worker = ? AND status = ? AND id IN ({_placeholders(job_ids)})",
+                (self.max_attempts, JOB_FAILED, JOB_PENDING, str(error), now, worker_id, JOB_RUNNING, *job_ids),
+            ).rowcount
+
+    # === Сводка
+
+    def status(self):
+        """Число заданий по статусам плюс активные воркеры."""
+        with self._connect() as conn:
+            counts = {row["status"]: row["n"] for row in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            )}
+            workers = [row["worker"] for row in conn.execute(
+                "SELECT DISTINCT worker FROM jobs WHERE status = ? AND lease_until >= ?",
+                (JOB_RUNNING, time.time()),
+            )]
+        summary = {s: counts.get(s, 0) for s in (JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED)}
+        summary["total"] = sum(counts.values())
+        summary["workers"] = workers
+        return summary
+
+    def results(self):
+        """Метрики выполненных заданий — строка на задание, в формате sweep_metrics.csv."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, result FROM jobs WHERE status = ? ORDER BY id", (JOB_DONE,)).fetchall()
+        return pd.DataFrame([{"job_id": row["id"], **json.loads(row["result"])} for row in rows])
+
+    def failures(self):
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT id, symbol, timeframe, params, attempts, error FROM jobs WHERE status = ? ORDER BY id",
+                conn.raw, params=(JOB_FAILED,),
+            )
+
+
+class _Connection:
+    """sqlite3.Connection, закрывающееся в with (штатный контекст только коммитит)."""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+        self.raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def _placeholders(values):
+    return ", ".join("?" * len(values))
+
+
+def _json_default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
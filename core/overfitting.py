@@ -0,0 +1,332 @@
+import math
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+EULER_GAMMA = 0.5772156649015329
+_NORMAL = NormalDist()
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def _norm_cdf(x):
+    x = np.asarray(x, dtype=np.float64)
+    return (0.5 * _erfc(-x / math.sqrt(2.0))).astype(np.float64)
+
+
+# === Матрица доходностей прогонов
+
+def load_returns(query, **filters):
+    """
+    Доходности баров всех прогонов под фильтрами (equity из базы результатов)
+    одной матрицей runs × bars на общей шкале времени.
+    Шкала — метки, которые есть у всех прогонов (общий период; при разных таймфреймах
+    или прореженных кривых — более редкая сетка): доходность считается между соседними
+    общими метками по самой кривой, без нулей на барах, которых у прогона нет, —
+    иначе Sharpe и PBO занижались бы у коротких прогонов.
+    query — core.results_query.ResultsQuery или путь к базе; filters — как у ResultsQuery.
+
+    Возвращает (runs, index, returns): DataFrame прогонов, DatetimeIndex, float64-матрица.
+    Прогоны без сохранённой equity отбрасываются с предупреждением, их число —
+    runs.attrs["without_equity"]; сколько меток вне общей шкалы — runs.attrs["dropped_bars"].
+    """
+    from .results_query import ResultsQuery
+
+    owned = not isinstance(query, ResultsQuery)
+    if owned:
+        query = ResultsQuery(query)
+    try:
+        runs = query.select(**filters)
+        curves = {}
+        pks = runs["run_pk"].tolist()
+        for start in range(0, len(pks), 500):
+            chunk = pks[start:start + 500]
+            rows = query.conn.execute(
+                f"SELECT run_pk, ts, value FROM equity WHERE run_pk IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            for run_pk, ts, value in rows:
+                curves[run_pk] = (np.frombuffer(ts, dtype=np.int64), np.frombuffer(value, dtype=np.float64))
+    finally:
+        if owned:
+            query.close()
+
+    without_equity = len(runs) - len(curves)
+    if without_equity:
+        warnings.warn(f"{without_equity} из {len(runs)} прогонов без сохранённой equity — исключены из матрицы")
+    runs = runs[runs["run_pk"].isin(list(curves))].reset_index(drop=True)
+    runs.attrs["without_equity"] = without_equity
+    if runs.empty:
+        runs.attrs["dropped_bars"] = 0
+        return runs, pd.DatetimeIndex([]), np.empty((0, 0))
+
+    stamps = curves[runs["run_pk"].iloc[0]][0]
+    union = stamps
+    for run_pk in runs["run_pk"].iloc[1:]:
+        ts = curves[run_pk][0]
+        stamps = np.intersect1d(stamps, ts, assume_unique=True)
+        union = np.union1d(union, ts)
+    runs.attrs["dropped_bars"] = len(union) - len(stamps)
+    if runs.attrs["dropped_bars"]:
+        warnings.warn(
+            f"Общих меток времени у {len(runs)} прогонов — {len(stamps)} из {len(union)}: "
+            "доходности считаются только на общей шкале"
+        )
+
+    returns = np.empty((len(runs), max(len(stamps) - 1, 0)), dtype=np.float64)
+    for i, run_pk in enumerate(runs["run_pk"]):
+        ts, equity = curves[run_pk]
+        equity = equity[np.searchsorted(ts, stamps)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = np.diff(equity) / equity[:-1]
+        returns[i] = np.where(np.isfinite(r), r, 0.0)
+    return runs, pd.DatetimeIndex(stamps[1:].view("datetime64[ns]")), returns
+
+
+# === Deflated Sharpe
+
+def sharpe_moments(returns, chunk_size=2048):
+    """
+    По строкам матрицы доходностей (runs × bars): Sharpe за бар (ddof=1),
+    асимметрия и эксцесс (не избыточный, у нормального = 3) — входы PSR / DSR.
+    Строки идут пачками по chunk_size, чтобы временные массивы не росли с числом прогонов.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_runs, n = returns.shape
+    sharpe, skew, kurt = np.empty(n_runs), np.empty(n_runs), np.empty(n_runs)
+    for start in range(0, n_runs, chunk_size):
+        rows = slice(start, start + chunk_size)
+        centered = returns[rows] - returns[rows].mean(axis=1)[:, None]
+        m2 = np.einsum("ij,ij->i", centered, centered) / n
+        power = centered * centered * centered
+        m3 = power.mean(axis=1)
+        power *= centered
+        m4 = power.mean(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sharpe[rows] = returns[rows].mean(axis=1) / np.sqrt(m2 * n / (n - 1))
+            skew[rows] = m3 / m2 ** 1.5
+            kurt[rows] = m4 / m2 ** 2
+    return sharpe, skew, kurt
+
+
+def expected_max_sharpe(n_trials, sharpe_variance):
+    """
+    Ожидаемый максимум Sharpe среди n_trials независимых проб при нулевом истинном Sharpe
+    (Bailey, López de Prado) — порог, который должен перейти «победитель» свипа.
+    """
+    if n_trials < 2:
+        return 0.0
+    return math.sqrt(sharpe_variance) * (
+        (1 - EULER_GAMMA) * _NORMAL.inv_cdf(1 - 1 / n_trials)
+        + EULER_GAMMA * _NORMAL.inv_cdf(1 - 1 / (n_trials * math.e))
+    )
+
+
+def probabilistic_sharpe(sharpe, skew, kurt, n_bars, threshold=0.0):
+    """PSR: вероятность, что истинный Sharpe выше threshold, с поправкой на длину ряда и хвосты."""
+    denom = np.sqrt(np.maximum(1 - skew * sharpe + (kurt - 1) / 4 * sharpe ** 2, 1e-12))
+    return _norm_cdf((sharpe - threshold) * math.sqrt(n_bars - 1) / denom)
+
+
+def deflated_sharpe(returns, n_trials=None, periods_per_year=None):
+    """
+    Deflated Sharpe Ratio для каждого прогона: PSR против ожидаемого максимума Sharpe
+    среди n_trials проб (по умолчанию — число прогонов; для сильно коррелированной сетки
+    можно передать эффективное число проб). Дисперсия Sharpe — по всем прогонам свипа.
+
+    Sharpe сравнимы только на одной шкале баров — смешивать таймфреймы не стоит.
+    periods_per_year — добавить колонку годового Sharpe для чтения.
+    Возвращает DataFrame: sharpe, skew, kurtosis, psr (против 0), dsr; sr0 — в attrs.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_runs, n_bars = returns.shape
+    sharpe, skew, kurt = sharpe_moments(returns)
+    finite = np.isfinite(sharpe)
+    variance = float(np.var(sharpe[finite], ddof=1)) if finite.sum() > 1 else 0.0
+    sr0 = expected_max_sharpe(n_trials or int(finite.sum()), variance)
+
+    frame = pd.DataFrame({
+        "sharpe": sharpe,
+        "skew": skew,
+        "kurtosis": kurt,
+        "psr": probabilistic_sharpe(sharpe, skew, kurt, n_bars),
+        "dsr": probabilistic_sharpe(sharpe, skew, kurt, n_bars, threshold=sr0),
+    })
+    if periods_per_year:
+        frame.insert(1, "sharpe_annual", sharpe * math.sqrt(periods_per_year))
+    frame.attrs["sr0"] = sr0
+    frame.attrs["n_trials"] = n_trials or int(finite.sum())
+    return frame
+
+
+# === PBO (CSCV)
+
+def _sharpe_from_sums(total, total_sq, n):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / n
+        var = (total_sq - total * mean) / (n - 1)
+        sharpe = mean / np.sqrt(var)
+    return np.where(np.isfinite(sharpe), sharpe, -np.inf)
+
+
+def _cscv_chunk(block_sum, block_sq, block_n, combos, memory_cells=4_000_000):
+    """
+    Набор разбиений CSCV: IS-суммы — матричное произведение сумм блоков на маску комбинаций.
+    Возвращает logit относительного ранга IS-лучшего прогона в OOS, его IS- и OOS-Sharpe.
+    """
+    n_runs, n_splits = block_sum.shape
+    total_sum, total_sq, total_n = block_sum.sum(axis=1), block_sq.sum(axis=1), block_n.sum()
+    step = max(1, memory_cells // max(n_runs, 1))
+    logits, is_best, oos_best = [], [], []
+    for start in range(0, len(combos), step):
+        part = combos[start:start + step]
+        mask = np.zeros((n_splits, len(part)))
+        mask[part.T, np.arange(len(part))] = 1.0
+        is_sum, is_sq, is_n = block_sum @ mask, block_sq @ mask, block_n @ mask
+        is_sharpe = _sharpe_from_sums(is_sum, is_sq, is_n)
+        oos_sharpe = _sharpe_from_sums(total_sum[:, None] - is_sum, total_sq[:, None] - is_sq, total_n - is_n)
+
+        cols = np.arange(len(part))
+        best = np.argmax(is_sharpe, axis=0)
+        best_oos = oos_sharpe[best, cols]
+        # Относительный ранг в OOS: ω ∈ (0, 1), ничьи — пополам
+        below = (oos_sharpe < best_oos).sum(axis=0)
+        ties = (oos_sharpe == best_oos).sum(axis=0)
+        omega = (below + 0.5 * (ties - 1) + 1) / (n_runs + 1)
+        logits.append(np.log(omega / (1 - omega)))
+        is_best.append(is_sharpe[best, cols])
+        oos_best.append(best_oos)
+    return np.concatenate(logits), np.concatenate(is_best), np.concatenate(oos_best)
+
+
+def probability_of_overfitting(returns, n_splits=16, max_workers=None):
+    """
+    Probability of Backtest Overfitting по CSCV (Bailey, Borwein, López de Prado, Zhu):
+    бары режутся на n_splits блоков, каждая комбинация половины блоков — IS, остальное — OOS.
+    Для каждой комбинации: лучший по IS Sharpe прогон и его относительный ранг в OOS.
+    PBO — доля комбинаций, где IS-победитель оказался в OOS ниже медианы.
+
+    Прогоны сводятся к суммам по блокам один раз, разбиения считаются матричными
+    произведениями пачками и делятся между процессами (max_workers=1 — без пула).
+    Возвращает словарь: pbo, logits, is_sharpe / oos_sharpe лучших, slope (OOS ~ IS),
+    prob_oos_loss (доля комбинаций с OOS Sharpe победителя < 0).
+    """
+    if n_splits % 2:
+        raise ValueError("n_splits должно быть чётным")
+    returns = np.asarray(returns, dtype=np.float64)
+    n_bars = returns.shape[1]
+    if n_bars < 2 * n_splits:
+        raise ValueError(f"Слишком мало баров ({n_bars}) для {n_splits} блоков")
+
+    edges = np.linspace(0, n_bars, n_splits + 1).astype(np.int64)
+    block_sum = np.add.reduceat(returns, edges[:-1], axis=1)
+    block_sq = np.add.reduceat(returns * returns, edges[:-1], axis=1)
+    block_n = np.diff(edges).astype(np.float64)
+    combos = np.array(list(combinations(range(n_splits), n_splits // 2)), dtype=np.int64)
+
+    if max_workers == 1:
+        results = [_cscv_chunk(block_sum, block_sq, block_n, combos)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            parts = np.array_split(combos, 4 * (max_workers or os.cpu_count() or 1))
+            futures = [executor.submit(_cscv_chunk, block_sum, block_sq, block_n, part) for part in parts if len(part)]
+            results = [f.result() for f in futures]
+
+    logits = np.concatenate([r[0] for r in results])
+    is_sharpe = np.concatenate([r[1] for r in results])
+    oos_sharpe = np.concatenate([r[2] for r in results])
+    finite = np.isfinite(is_sharpe) & np.isfinite(oos_sharpe)
+    slope = float(np.polyfit(is_sharpe[finite], oos_sharpe[finite], 1)[0]) if finite.sum() > 1 else np.nan
+    return {
+        "pbo": float((logits <= 0).mean()),
+        "logits": logits,
+        "is_sharpe": is_sharpe,
+        "oos_sharpe": oos_sharpe,
+        "slope": slope,
+        "prob_oos_loss": float((oos_sharpe < 0).mean()),
+        "n_combinations": len(combos),
+    }
+
+
+# === White's Reality Check
+
+def stationary_bootstrap_indices(n_bars, n_boot, mean_block, rng):
+    """Стационарный бутстреп (Politis, Romano): блоки геометрической длины со средним mean_block, по кругу."""
+    new_block = rng.random((n_boot, n_bars)) < 1.0 / mean_block
+    new_block[:, 0] = True
+    positions = np.arange(n_bars)
+    block_start = np.maximum.accumulate(np.where(new_block, positions, 0), axis=1)
+    starts = rng.integers(0, n_bars, size=(n_boot, n_bars))
+    first = np.take_along_axis(starts, block_start, axis=1)
+    return (first + positions - block_start) % n_bars
+
+
+def reality_check(returns, benchmark=None, n_boot=1000, mean_block=None, seed=None, chunk=100):
+    """
+    White's Reality Check: нулевая гипотеза — лучший прогон свипа не лучше бенчмарка
+    (по умолчанию — нулевая доходность, т. е. «не торговать»).
+    Статистика — max_k √T · mean(f_k), f = returns − benchmark; распределение под нулём —
+    стационарный бутстреп центрированных средних. Средние всех прогонов по бутстреп-выборке —
+    одно матричное произведение (частоты баров × f), пачками по chunk выборок.
+
+    Возвращает словарь: p_value, statistic, best (индекс строки), bootstrap (max по выборкам).
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    n_runs, n_bars = returns.shape
+    f = returns - (0.0 if benchmark is None else np.asarray(benchmark, dtype=np.float64)[None, :])
+    mean_f = f.mean(axis=1)
+    statistic = math.sqrt(n_bars) * mean_f.max()
+    mean_block = mean_block or max(1, int(round(n_bars ** (1 / 3))))
+
+    rng = np.random.default_rng(seed)
+    maxima = np.empty(n_boot)
+    for start in range(0, n_boot, chunk):
+        size = min(chunk, n_boot - start)
+        idx = stationary_bootstrap_indices(n_bars, size, mean_block, rng)
+        # Частоты баров в каждой выборке → средние всех прогонов сразу
+        offsets = (idx + n_bars * np.arange(size)[:, None]).ravel()
+        freq = np.bincount(offsets, minlength=size * n_bars).reshape(size, n_bars).astype(np.float64)
+        boot_means = freq @ f.T / n_bars
+        maxima[start:start + size] = math.sqrt(n_bars) * (boot_means - mean_f[None, :]).max(axis=1)
+
+    return {
+        "p_value": float((maxima >= statistic).mean()),
+        "statistic": float(statistic),
+        "best": int(np.argmax(mean_f)),
+        "bootstrap": maxima,
+    }
+
+
+# === Сводка по свипу
+
+def selection_bias_report(query, n_splits=16, n_boot=1000, n_trials=None, max_workers=None, seed=None, **filters):
+    """
+    Всё сразу по прогонам из базы результатов: DSR по прогонам, PBO (CSCV) и Reality Check.
+    Возвращает (runs, summary): runs — прогоны с sharpe / psr / dsr, отсортированные по dsr;
+    summary — словарь итоговых оценок свипа.
+    """
+    runs, index, returns = load_returns(query, **filters)
+    if runs.empty:
+        return runs, {}
+    without_equity, dropped_bars = runs.attrs["without_equity"], runs.attrs["dropped_bars"]
+    stats = deflated_sharpe(returns, n_trials=n_trials)
+    runs = pd.concat([runs, stats], axis=1)
+    pbo = probability_of_overfitting(returns, n_splits=n_splits, max_workers=max_workers)
+    check = reality_check(returns, n_boot=n_boot, seed=seed)
+    summary = {
+        "runs": len(runs),
+        "runs_without_equity": without_equity,
+        "bars": len(index),
+        "bars_outside_common_span": dropped_bars,
+        "sr0": stats.attrs["sr0"],
+        "best_dsr": float(stats["dsr"].max()),
+        "pbo": pbo["pbo"],
+        "pbo_slope": pbo["slope"],
+        "prob_oos_loss": pbo["prob_oos_loss"],
+        "reality_check_p": check["p_value"],
+        "reality_check_best": int(runs["run_pk"].iloc[check["best"]]),
+    }
+    return runs.sort_values("dsr", ascending=False).reset_index(drop=True), summary
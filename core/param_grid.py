@@ -1,6 +1,129 @@
+import hashlib
+import json
+from enum import Enum
 from itertools import product
 
-def generate_param_grid(param_ranges):
+import numpy as np
+
+
+def canonicalize(value):
+    """
+    Приводит значение параметра к канонической форме для хеширования:
+    - словари сортируются по ключам (рекурсивно);
+    - tuple → list, numpy-скаляры → python;
+    - целые float (14.0) → int (14).
+    """
+    if isinstance(value, Enum):
+        return value.value  # TakeProfitMode, ExitType
+    if isinstance(value, dict):
+        return {str(k): canonicalize(value[k]) for k in sorted(value, key=str)}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def params_hash(params, length=8):
+    """
+    Канонический хеш набора параметров (strategy_id).
+    Эквивалентные комбинации ({"a": 14.0, "b": 1} и {"b": 1, "a": 14}) дают один хеш.
+    """
+    payload = json.dumps(canonicalize(params), sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.md5(payload.encode()).hexdigest()
+    return digest[:length] if length else digest
+
+
+def _unique_values(values):
+    """Убирает эквивалентные значения из диапазона, сохраняя порядок."""
+    seen = set()
+    unique = []
+    for v in values:
+        key = params_hash(v, length=None)
+        if key not in seen:
+            seen.add(key)
+            unique.append(v)
+    return unique
+
+
+def _split_constraints(keys, constraints):
+    """
+    Ограничения бывают двух видов:
+    - callable(params) -> bool — проверяется на полной комбинации;
+    - (("fast_period", "slow_period"), callable) — проверяется сразу, как только
+      заданы перечисленные ключи, и отсекает целую ветку перебора.
+    Возвращает {глубина: [(ключи, callable), ...]}.
+    """
+    position = {k: i for i, k in enumerate(keys)}
+    by_depth = {}
+    for constraint in constraints or []:
+        if callable(constraint):
+            depth = len(keys) - 1
+            needed, check = (), constraint
+        else:
+            needed, check = constraint
+            depth = max(position[k] for k in needed)
+        by_depth.setdefault(depth, []).append((tuple(needed), check))
+    return by_depth
+
+
+def _passes(checks, current):
+    """
+    Все ограничения глубины выполнены. Ограничение по ключам, часть которых
+    не участвует в комбинации (conditional-предикат ложен), не применяется.
+    """
+    return all(check(current) for needed, check in checks if all(k in current for k in needed))
+
+
+def iter_param_grid(param_ranges, constraints=None, conditional=None, dedupe=True):
+    """
+    Ленивый генератор комбинаций — ничего не материализует, отдаёт по одной.
+
+    param_ranges: {"fast_period": [10, 20], "slow_period": [50, 100], ...}
+    constraints: список ограничений, например
+        [(("fast_period", "slow_period"), lambda p: p["fast_period"] < p["slow_period"])]
+    conditional: {ключ: предикат(предыдущие параметры)} — параметр участвует в переборе,
+        только если предикат истинен; иначе ключа нет в комбинации, например
+        {"tp_mult": lambda p: p["tp_exit_type"] == "atr"}.
+        Предикат видит только ключи, стоящие в param_ranges раньше. Ограничение
+        (ключи, предикат), где есть выпавший conditional-ключ, к комбинации не применяется.
+    dedupe: эквивалентные значения внутри диапазона (14 и 14.0, словари с другим
+        порядком ключей) отбрасываются по каноническому хешу, поэтому одинаковые
+        комбинации не выдаются повторно — без хранения уже выданных.
+    """
+    keys = list(param_ranges.keys())
+    values = [_unique_values(v) if dedupe else list(v) for v in param_ranges.values()]
+    conditional = conditional or {}
+    checks = _split_constraints(keys, constraints)
+
+    if not conditional and not checks:
+        for combo in product(*values):
+            yield dict(zip(keys, combo))
+        return
+
+    def walk(depth, current):
+        if depth == len(keys):
+            yield dict(current)
+            return
+
+        key = keys[depth]
+        if key in conditional and not conditional[key](current):
+            if _passes(checks.get(depth, []), current):
+                yield from walk(depth + 1, current)
+            return
+
+        for value in values[depth]:
+            current[key] = value
+            if _passes(checks.get(depth, []), current):
+                yield from walk(depth + 1, current)
+        current.pop(key, None)
+
+    yield from walk(0, {})
+
+
+def generate_param_grid(param_ranges, constraints=None, conditional=None, dedupe=True):
     """
     Принимает словарь параметров с диапазонами:
     {
@@ -15,8 +138,6 @@ def generate_param_grid(param_ranges):
         {"rsi_period": 10, "atr_period": 21, ...},
         ...
     ]
+    Для больших пространств используйте iter_param_grid — он отдаёт комбинации лениво.
     """
-    keys = list(param_ranges.keys())
-    values = list(param_ranges.values())
-    grid = [dict(zip(keys, combo)) for combo in product(*values)]
-    return grid
+    return list(iter_param_grid(param_ranges, constraints, conditional, dedupe))
@@ -0,0 +1,357 @@
+import math
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from .param_grid import generate_param_grid, params_hash
+from .vector_engine import build_indicator_cache, run_vectorized
+
+
+def _is_numeric(values):
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+
+
+class SearchStrategy(ABC):
+    """
+    Базовый класс стратегии поиска по тому же словарю диапазонов, что и generate_param_grid:
+    {
+        "rsi_period": [10, 14, 21],
+        "atr_period": [14, 21],
+        ...
+    }
+
+    run(evaluate_batch, max_evals) возвращает список испытаний:
+    [
+        {"params": {...}, "score": float, "fraction": float},
+        ...
+    ]
+    evaluate_batch(list_of_params, fraction) -> list of scores (больше — лучше),
+    fraction — доля окна дат, на которой оценивается комбинация (1.0 — всё окно).
+    Уже оценённые комбинации помнятся по полному каноническому хешу (как в iter_param_grid).
+    """
+
+    def __init__(self, param_ranges, seed=None):
+        self.param_ranges = param_ranges
+        self.keys = list(param_ranges.keys())
+        self.values = [list(v) for v in param_ranges.values()]
+        self.rng = np.random.default_rng(seed)
+        self.trials = []
+        self._seen = set()
+
+    @property
+    def space_size(self):
+        return math.prod(len(v) for v in self.values)
+
+    def _params_from_indices(self, indices):
+        return {k: vals[i] for k, vals, i in zip(self.keys, self.values, indices)}
+
+    def _sample_random(self, n):
+        """n случайных ещё не оценённых комбинаций (меньше, если пространство исчерпано)."""
+        batch = []
+        attempts = 0
+        while len(batch) < n and attempts < n * 50 and len(self._seen) < self.space_size:
+            attempts += 1
+            indices = [self.rng.integers(len(vals)) for vals in self.values]
+            params = self._params_from_indices(indices)
+            key = params_hash(params, length=None)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            batch.append(params)
+        return batch
+
+    def _record(self, batch, scores, fraction):
+        for params, score in zip(batch, scores):
+            score = float(score) if score is not None and np.isfinite(score) else -np.inf
+            self.trials.append({"params": params, "score": score, "fraction": fraction})
+
+    @abstractmethod
+    def run(self, evaluate_batch, max_evals):
+        """Оценивает не больше max_evals комбинаций через evaluate_batch, возвращает self.trials."""
+
+
+class GridSearch(SearchStrategy):
+    """Полный перебор (как generate_param_grid), ограниченный max_evals."""
+
+    def run(self, evaluate_batch, max_evals):
+        batch = generate_param_grid(self.param_ranges)[:max_evals]
+        self._record(batch, evaluate_batch(batch, 1.0), 1.0)
+        return self.trials
+
+
+class RandomSearch(SearchStrategy):
+    """Случайный поиск без повторов."""
+
+    def __init__(self, param_ranges, seed=None, batch_size=64):
+        super().__init__(param_ranges, seed)
+        self.batch_size = batch_size
+
+    def run(self, evaluate_batch, max_evals):
+        while len(self.trials) < max_evals:
+            batch = self._sample_random(min(self.batch_size, max_evals - len(self.trials)))
+            if not batch:
+                break
+            self._record(batch, evaluate_batch(batch, 1.0), 1.0)
+        return self.trials
+
+
+class SuccessiveHalving(SearchStrategy):
+    """
+    Successive halving / Hyperband на растущих окнах дат.
+    Кандидаты сначала оцениваются на доле окна min_fraction,
+    лучшие 1 / eta переходят на окно в eta раз больше — и так до полного окна.
+    hyperband=True перебирает несколько «скобок» с разным балансом
+    «много кандидатов на коротком окне» ↔ «мало кандидатов на полном».
+    """
+
+    def __init__(self, param_ranges, seed=None, eta=3, min_fraction=1 / 9, hyperband=False):
+        super().__init__(param_ranges, seed)
+        self.eta = eta
+        self.min_fraction = min_fraction
+        self.hyperband = hyperband
+
+    def _bracket_cost(self, n_configs, s):
+        """Сколько оценок съест скобка: n_configs кандидатов, s + 1 ступеней с отбором 1 / eta."""
+        cost = 0
+        for _ in range(s + 1):
+            cost += n_configs
+            n_configs = max(1, n_configs // self.eta)
+        return cost
+
+    def _fit_configs(self, s, budget, limit):
+        """Наибольшее число стартовых кандидатов (не больше limit), чья скобка укладывается в budget."""
+        n = 0
+        while n < limit and self._bracket_cost(n + 1, s) <= budget:
+            n += 1
+        return n
+
+    def _bracket(self, evaluate_batch, n_configs, s):
+        candidates = self._sample_random(n_configs)
+        used = 0
+        for rung in range(s + 1):
+            if not candidates:
+                break
+            fraction = min(1.0, self.eta ** (rung - s))
+            scores = evaluate_batch(candidates, fraction)
+            self._record(candidates, scores, fraction)
+            used += len(candidates)
+
+            keep = max(1, len(candidates) // self.eta)
+            order = np.argsort(-np.nan_to_num(np.asarray(scores, dtype=float), nan=-np.inf), kind="stable")
+            candidates = [candidates[i] for i in order[:keep]]
+        return used
+
+    def run(self, evaluate_batch, max_evals):
+        """
+        Скобки размеряются от бюджета: стартовое число кандидатов — наибольшее, при котором
+        скобка доходит до полного окна, так что лучшие кандидаты всегда оценены на fraction 1.0.
+        Hyperband делит остаток бюджета поровну между оставшимися скобками прохода;
+        скобка, которой не хватает даже на одного кандидата до полного окна, пропускается.
+        """
+        s_max = max(0, round(math.log(1 / self.min_fraction, self.eta)))
+        if not self.hyperband:
+            # Одна скобка; при совсем малом бюджете — меньше ступеней, но до полного окна
+            s = min(s_max, max(0, max_evals - 1))
+            n_configs = self._fit_configs(s, max_evals, self.space_size - len(self._seen))
+            self._bracket(evaluate_batch, n_configs, s)
+            return self.trials
+
+        used = 0
+        while used < max_evals and len(self._seen) < self.space_size:
+            used_before = used
+            for left, s in enumerate(range(s_max, -1, -1)):
+                budget = (max_evals - used) // (s_max + 1 - left)
+                limit = min(math.ceil((s_max + 1) / (s + 1) * self.eta ** s), self.space_size - len(self._seen))
+                n_configs = self._fit_configs(s, budget, limit)
+                if n_configs:
+                    used += self._bracket(evaluate_batch, n_configs, s)
+            if used == used_before:
+                break
+        return self.trials
+
+
+class TPESearch(SearchStrategy):
+    """
+    Tree-structured Parzen Estimator на дискретных диапазонах.
+    После n_startup случайных испытаний лучшие gamma доли задают плотность l(x),
+    остальные — g(x); следующая пачка — кандидаты с максимальным l(x) / g(x).
+    Для числовых диапазонов плотность сглаживается гауссовым ядром по соседним значениям.
+    """
+
+    def __init__(self, param_ranges, seed=None, n_startup=20, gamma=0.25,
+                 n_candidates=64, batch_size=8, bandwidth=1.0):
+        super().__init__(param_ranges, seed)
+        self.n_startup = n_startup
+        self.gamma = gamma
+        self.n_candidates = n_candidates
+        self.batch_size = batch_size
+        self.kernels = []
+        for vals in self.values:
+            positions = np.arange(len(vals))
+            if _is_numeric(vals):
+                dist = positions[:, None] - positions[None, :]
+                self.kernels.append(np.exp(-0.5 * (dist / bandwidth) ** 2))
+            else:
+                self.kernels.append(np.eye(len(vals)))
+
+    def _densities(self, trials):
+        """Категориальные плотности по каждому параметру (с априорной равномерной примесью)."""
+        densities = []
+        for key, vals, kernel in zip(self.keys, self.values, self.kernels):
+            lookup = {params_hash(v, length=None): i for i, v in enumerate(vals)}
+            counts = np.zeros(len(vals))
+            for trial in trials:
+                counts[lookup[params_hash(trial["params"][key], length=None)]] += 1
+            weights = kernel @ counts + 1.0 / len(vals)
+            densities.append(weights / weights.sum())
+        return densities
+
+    def _suggest(self, n):
+        scored = sorted(self.trials, key=lambda t: t["score"], reverse=True)
+        n_good = max(1, int(math.ceil(self.gamma * len(scored))))
+        good = self._densities(scored[:n_good])
+        bad = self._densities(scored[n_good:])
+
+        # === Кандидаты из l(x), ранжирование по l(x) / g(x)
+        n_cand = self.n_candidates * n
+        samples = np.column_stack([
+            self.rng.choice(len(vals), size=n_cand, p=l) for vals, l in zip(self.values, good)
+        ])
+        log_ratio = np.zeros(n_cand)
+        for j, (l, g) in enumerate(zip(good, bad)):
+            log_ratio += np.log(l[samples[:, j]]) - np.log(g[samples[:, j]])
+
+        batch = []
+        for row in np.argsort(-log_ratio):
+            params = self._params_from_indices(samples[row])
+            key = params_hash(params, length=None)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            batch.append(params)
+            if len(batch) == n:
+                break
+        return batch or self._sample_random(n)
+
+    def run(self, evaluate_batch, max_evals):
+        startup = self._sample_random(min(self.n_startup, max_evals))
+        self._record(startup, evaluate_batch(startup, 1.0), 1.0)
+
+        while len(self.trials) < max_evals and len(self._seen) < self.space_size:
+            batch = self._suggest(min(self.batch_size, max_evals - len(self.trials)))
+            if not batch:
+                break
+            self._record(batch, evaluate_batch(batch, 1.0), 1.0)
+        return self.trials
+
+
+SEARCH_METHODS = {
+    "grid": GridSearch,
+    "random": RandomSearch,
+    "halving": SuccessiveHalving,
+    "hyperband": lambda param_ranges, **kw: SuccessiveHalving(param_ranges, hyperband=True, **kw),
+    "tpe": TPESearch,
+}
+
+
+class VectorObjective:
+    """
+    Целевая функция для search_params поверх векторного движка.
+    Пачка комбинаций оценивается одним вызовом run_vectorized на первых
+    `fraction` баров окна; индикаторы считаются один раз на полном окне
+    (они причинные, поэтому срез префикса корректен).
+    Объект сериализуемый: SearchPool передаёт его в каждый процесс один раз,
+    и кэш индикаторов копится в процессе между пачками.
+    """
+
+    def __init__(self, df, metric="Final_portfolio_growth_percent", min_bars=100, **engine_kwargs):
+        self.df = df
+        self.metric = metric
+        self.min_bars = min_bars
+        self.engine_kwargs = engine_kwargs
+        self.indicators = {}
+
+    def __call__(self, batch, fraction=1.0):
+        if not batch:
+            return []
+        build_indicator_cache(self.df, batch, self.indicators)
+        n_bars = min(len(self.df), max(self.min_bars, int(len(self.df) * fraction)))
+        window = {key: values[:n_bars] for key, values in self.indicators.items()}
+        result = run_vectorized(self.df.iloc[:n_bars], batch, indicators=window,
+                                keep_curves=False, **self.engine_kwargs)
+        return result["metrics"][self.metric].astype(float).fillna(-np.inf).tolist()
+
+
+# Целевая функция процесса пула SearchPool: создаётся initializer'ом один раз на процесс
+_worker_evaluate = None
+
+
+def _init_search_worker(evaluate):
+    global _worker_evaluate
+    _worker_evaluate = evaluate
+
+
+def _evaluate_in_worker(batch, fraction):
+    return _worker_evaluate(batch, fraction)
+
+
+class SearchPool(ProcessPoolExecutor):
+    """
+    Пул процессов для search_params с одной целевой функцией: evaluate передаётся
+    в процесс при старте (initializer), а не сериализуется заново с каждой пачкой,
+    поэтому его состояние (кэш индикаторов VectorObjective) живёт между пачками.
+    """
+
+    def __init__(self, evaluate, max_workers=None):
+        super().__init__(max_workers=max_workers, initializer=_init_search_worker, initargs=(evaluate,))
+
+
+def _chunks(batch, n_chunks):
+    size = max(1, math.ceil(len(batch) / n_chunks))
+    return [batch[i:i + size] for i in range(0, len(batch), size)]
+
+
+def search_params(param_ranges, evaluate, method="random", max_evals=None,
+                  budget_fraction=0.1, executor=None, n_chunks=None, seed=None, partial=False, **method_kwargs):
+    """
+    Адаптивный поиск по param_ranges вместо полного перебора.
+
+    evaluate(list_of_params, fraction) -> list of scores (например, VectorObjective).
+    method: "grid" | "random" | "halving" | "hyperband" | "tpe" или свой SearchStrategy-класс.
+    max_evals: бюджет оценок; по умолчанию budget_fraction от размера полной сетки.
+    executor: concurrent.futures.Executor — пачка делится на n_chunks частей и
+    оценивается параллельно. SearchPool(evaluate) держит evaluate в процессах;
+    любому другому пулу evaluate передаётся с каждой частью (должен быть сериализуемым).
+
+    Возвращает испытания на полном окне (fraction 1.0), от лучшего к худшему:
+    [
+        {"params": {...}, "score": float, "fraction": 1.0},
+        ...
+    ]
+    partial=True — после них и оценки на части окна (successive halving / hyperband).
+    """
+    factory = SEARCH_METHODS.get(method, method) if isinstance(method, str) else method
+    if factory is None or isinstance(factory, str):
+        raise ValueError(f"Неизвестный метод поиска: {method}")
+    strategy = factory(param_ranges, seed=seed, **method_kwargs)
+
+    if max_evals is None:
+        max_evals = max(1, int(math.ceil(strategy.space_size * budget_fraction)))
+
+    def evaluate_batch(batch, fraction):
+        if executor is None or len(batch) < 2:
+            return list(evaluate(batch, fraction))
+        fn = _evaluate_in_worker if isinstance(executor, SearchPool) else evaluate
+        parts = _chunks(batch, n_chunks or getattr(executor, "_max_workers", 4))
+        scores = []
+        for part_scores in executor.map(fn, parts, repeat(fraction)):
+            scores.extend(part_scores)
+        return scores
+
+    trials = strategy.run(evaluate_batch, max_evals)
+    if not partial:
+        trials = [t for t in trials if t["fraction"] == 1.0]
+    # Полное окно важнее частичного: сначала по fraction, затем по score
+    return sorted(trials, key=lambda t: (t["fraction"], t["score"]), reverse=True)
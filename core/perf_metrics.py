@@ -0,0 +1,181 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+# Крипта торгуется 24/7: год — 365 календарных дней, а не 252 торговых
+DAYS_PER_YEAR = 365
+_TIMEFRAME_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+PERF_COLUMNS = [
+    "CAGR_percent",
+    "Sharpe",
+    "Sortino",
+    "Calmar",
+    "Max_drawdown_percent",
+    "Max_drawdown_duration_bars",
+    "Returns_profit_factor",
+    "Returns_win_rate",
+    "Exposure",
+    "Tail_ratio",
+]
+
+
+def timeframe_seconds(timeframe):
+    """Длительность бара в секундах: "15m", "4h", "12H", "1D", "1W"."""
+    match = re.fullmatch(r"\s*(\d+)\s*([mhdwMHDW])\s*", str(timeframe))
+    if match is None:
+        raise ValueError(f"Неизвестный таймфрейм: {timeframe}")
+    count, unit = match.groups()
+    # Регистр не важен ("12H" == "12h"); месяцы в проекте не используются, "M" — минуты
+    return int(count) * _TIMEFRAME_UNITS[unit.lower()]
+
+
+def periods_per_year(timeframe, days_per_year=DAYS_PER_YEAR):
+    """Число баров в году для аннуализации Sharpe / Sortino: 1D → 365, 12H → 730, 1h → 8760."""
+    return days_per_year * 86400 / timeframe_seconds(timeframe)
+
+
+def batch_metrics(equity, periods_per_year=DAYS_PER_YEAR, position=None, years=None, cutoff=0.95, chunk_size=4096):
+    """
+    Метрики доходности для множества кривых equity сразу (прогоны × бары) — вместо
+    quantstats на каждый прогон. Формулы повторяют quantstats.stats:
+    доходности — pct_change с нулём на первом баре, Sharpe — mean / std(ddof=1),
+    Sortino — mean / sqrt(sum(r²; r < 0) / n), оба × sqrt(periods_per_year);
+    profit factor и win rate — по доходностям баров, tail ratio — |q(cutoff) / q(1 - cutoff)|.
+
+    Отличия от quantstats (осознанные):
+    - CAGR: years по умолчанию (бары - 1) / periods_per_year — число интервалов между барами;
+      quantstats берёт число доходностей (с нулевой первой) / periods; для календарного окна
+      передайте years явно;
+    - Calmar: CAGR / |max drawdown| с тем же CAGR (quantstats внутри берёт 252 периода);
+    - Exposure: доля баров в позиции (position != 0), без ступеньки ceil до процента;
+      без position — доля ненулевых доходностей, как в quantstats.
+
+    position — матрица размеров позиции той же формы (или None).
+    Считается блоками по chunk_size строк, чтобы временные массивы не росли со всей сеткой.
+    Возвращает словарь массивов длины «прогоны», ключи — PERF_COLUMNS (без округления).
+    """
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    n_runs, n_bars = equity.shape
+    if position is not None:
+        position = np.atleast_2d(np.asarray(position))
+        if position.shape != equity.shape:
+            raise ValueError(f"position {position.shape} не совпадает с equity {equity.shape}")
+    if years is None:
+        years = (n_bars - 1) / periods_per_year
+
+    out = {name: np.full(n_runs, np.nan) for name in PERF_COLUMNS}
+    bars = np.arange(n_bars)
+
+    for start in range(0, n_runs, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_runs))
+        eq = equity[rows]
+
+        # === Доходности баров: (прогоны × бары), первый бар — 0, как после fillna(0)
+        returns = np.zeros_like(eq)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(eq[:, 1:], eq[:, :-1], out=returns[:, 1:])
+            returns[:, 1:] -= 1.0
+        returns[~np.isfinite(returns)] = 0.0
+
+        mean = returns.mean(axis=1)
+        std = returns.std(axis=1, ddof=1)
+        negative = np.minimum(returns, 0.0)
+        downside = np.sqrt(np.einsum("ij,ij->i", negative, negative) / n_bars)
+        gains = np.maximum(returns, 0.0).sum(axis=1)
+        losses = -negative.sum(axis=1)
+        n_pos = np.count_nonzero(returns > 0, axis=1)
+        n_nonzero = np.count_nonzero(returns, axis=1)
+
+        # === Просадка: глубина и самая длинная серия баров ниже пика
+        peak = np.maximum.accumulate(eq, axis=1)
+        at_peak = eq >= peak
+        max_dd = (eq / peak).min(axis=1) - 1.0
+        last_peak = np.maximum.accumulate(np.where(at_peak, bars, 0), axis=1)
+        dd_duration = (bars - last_peak).max(axis=1)
+
+        upper, lower = np.quantile(returns, [cutoff, 1 - cutoff], axis=1)
+        total = eq[:, -1] / eq[:, 0]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cagr = np.abs(total) ** (1.0 / years) - 1.0 if years > 0 else np.full(len(total), np.nan)
+            out["CAGR_percent"][rows] = cagr * 100
+            out["Sharpe"][rows] = mean / std * math.sqrt(periods_per_year)
+            out["Sortino"][rows] = mean / downside * math.sqrt(periods_per_year)
+            out["Calmar"][rows] = cagr / np.abs(max_dd)
+            out["Returns_profit_factor"][rows] = np.where(
+                losses > 0, gains / losses, np.where(gains > 0, np.inf, 0.0)
+            )
+            out["Returns_win_rate"][rows] = np.where(n_nonzero > 0, n_pos / n_nonzero, 0.0)
+            # нулевой нижний квантиль (редкие сделки, плоские бары) — NaN, как в quantstats
+            out["Tail_ratio"][rows] = np.where(lower != 0, np.abs(upper / lower), np.nan)
+
+        out["Max_drawdown_percent"][rows] = max_dd * 100
+        out["Max_drawdown_duration_bars"][rows] = dd_duration
+        if position is not None:
+            out["Exposure"][rows] = np.count_nonzero(position[rows], axis=1) / n_bars
+        else:
+            out["Exposure"][rows] = n_nonzero / n_bars
+
+    return out
+
+
+def perf_metrics_frame(equity, periods_per_year=DAYS_PER_YEAR, position=None, years=None, index=None, **kwargs):
+    """batch_metrics в виде DataFrame с округлением как в metrics.csv (проценты — 2 знака, доли — 4)."""
+    metrics = pd.DataFrame(
+        batch_metrics(equity, periods_per_year, position=position, years=years, **kwargs), index=index
+    )
+    percent_cols = ["CAGR_percent", "Max_drawdown_percent"]
+    metrics[percent_cols] = metrics[percent_cols].round(2)
+    metrics = metrics.round({c: 4 for c in PERF_COLUMNS if c not in percent_cols})
+    metrics["Max_drawdown_duration_bars"] = metrics["Max_drawdown_duration_bars"].astype(int)
+    return metrics
+
+
+def equity_returns(equity):
+    """Доходности баров из кривой equity (Series) — то, что ждёт quantstats вместо цен."""
+    return equity.pct_change().replace([np.inf, -np.inf], np.nan).fillna(0.0)
+
+
+def validate_against_quantstats(equity, timeframe, rtol=1e-9):
+    """
+    Сверка batch_metrics с quantstats на одной кривой equity (Series с DatetimeIndex).
+    Метрики с осознанными отличиями приводятся к формулам quantstats
+    (CAGR — years = число доходностей / periods, Exposure — ceil до процента).
+    Возвращает DataFrame: metric, batch, quantstats, match.
+    Проверка на сохранённых кривых: python results_query.py perf-check --n 20
+    """
+    import quantstats as qs
+
+    ppy = periods_per_year(timeframe)
+    returns = equity_returns(equity)
+    years = len(returns) / ppy
+    ours = {k: v[0] for k, v in batch_metrics(equity.to_numpy(), ppy, years=years).items()}
+
+    cagr = qs.stats.cagr(returns, periods=ppy)
+    max_dd = qs.stats.max_drawdown(returns)
+    reference = {
+        "CAGR_percent": cagr * 100,
+        "Sharpe": qs.stats.sharpe(returns, periods=ppy),
+        "Sortino": qs.stats.sortino(returns, periods=ppy),
+        "Calmar": cagr / abs(max_dd),
+        "Max_drawdown_percent": max_dd * 100,
+        "Returns_profit_factor": qs.stats.profit_factor(returns),
+        "Returns_win_rate": qs.stats.win_rate(returns),
+        "Exposure": qs.stats.exposure(returns),
+        "Tail_ratio": qs.stats.tail_ratio(returns),
+    }
+    ours["Exposure"] = math.ceil(ours["Exposure"] * 100) / 100
+
+    rows = []
+    for name, expected in reference.items():
+        expected = float(expected)
+        rows.append({
+            "metric": name,
+            "batch": ours[name],
+            "quantstats": expected,
+            "match": bool(np.isclose(ours[name], expected, rtol=rtol, equal_nan=True)),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,353 @@
+import numpy as np
+import pandas as pd
+
+from .exit_engine import (
+    EXIT_REASON_SIGNAL,
+    EXIT_REASON_TRAIL,
+    ExitLedger,
+    LevelCheck,
+    compile_exit_levels,
+    level_mask,
+)
+from .indicator_engine import rsi_wilder, atr_wilder
+
+
+def align_panel(frames, columns=("open", "high", "low", "close")):
+    """
+    Выравнивает свечи нескольких символов на общую ось времени (объединение индексов).
+    frames: {symbol: DataFrame}
+    Возвращает словарь:
+    {
+        "index": DatetimeIndex,
+        "symbols": [...],
+        "open": ndarray (бары × символы), "high": ..., "low": ..., "close": ...
+    }
+    Бары, на которых символа ещё (или уже) нет, — NaN.
+    """
+    symbols = [s for s, df in frames.items() if df is not None and not df.empty]
+    index = frames[symbols[0]].index
+    for symbol in symbols[1:]:
+        index = index.union(frames[symbol].index)
+
+    panel = {"index": index, "symbols": symbols}
+    for col in columns:
+        panel[col] = np.column_stack([
+            frames[s][col].reindex(index).to_numpy(dtype=float) for s in symbols
+        ])
+    return panel
+
+
+def _panel_indicator(frames, panel, compute):
+    """Индикатор считается по собственной истории символа (без дыр) и раскладывается на общую ось."""
+    columns = []
+    for symbol in panel["symbols"]:
+        df = frames[symbol]
+        values = pd.Series(compute(df), index=df.index)
+        columns.append(values.reindex(panel["index"]).to_numpy())
+    return np.column_stack(columns)
+
+
+SIZING_RULES = ("equal", "fixed_fraction", "atr_risk")
+
+
+def run_portfolio(
+    frames,
+    params,
+    initial_cash=100000,
+    commission=0.00055,
+    slippage=0.0005,
+    sizing="equal",
+    max_positions=None,
+    fraction=0.2,
+    risk_per_trade=0.01,
+    atr_risk_mult=2.0,
+    rsi_entry=30,
+    rsi_exit=70,
+):
+    """
+    Портфельный прогон логики SuperStrategy по нескольким символам с общим капиталом.
+    Один проход по выровненной панели: на каждом баре все символы обрабатываются векторно.
+
+    Размер позиции (sizing):
+    - "equal"          — equity / max_positions на позицию (по умолчанию max_positions = число символов);
+    - "fixed_fraction" — fraction × equity на позицию;
+    - "atr_risk"       — риск risk_per_trade × equity при стопе atr_risk_mult × ATR.
+    Кредитного плеча нет: если свободного кэша не хватает на все входы бара,
+    входы пропорционально уменьшаются.
+    take_profit в режиме "partial" продаёт percent от размера входа на каждом уровне
+    (один раз за позицию), остаток ведётся трейлинг-стопом — как в run_vectorized.
+
+    Возвращает словарь:
+    {
+        "equity": DataFrame (equity, cash, exposure, open_positions),
+        "attribution": DataFrame (бары × символы, накопленный PnL по активу с учётом комиссий),
+        "assets": DataFrame (итог по символам: сделки, PnL, комиссии, время в позиции),
+        "metrics": dict,
+        "exits": DataFrame (строка на каждое исполнение выхода, включая частичные),
+    }
+    """
+    panel = align_panel(frames)
+    symbols = panel["symbols"]
+    open_, high, low, close = panel["open"], panel["high"], panel["low"], panel["close"]
+    n_bars, n_assets = close.shape
+    max_positions = max_positions or n_assets
+
+    rsi_period = params.get("rsi_period", 14)
+    atr_period = params.get("atr_period", 14)
+    rsi = _panel_indicator(frames, panel, lambda df: rsi_wilder(df["close"].to_numpy(), rsi_period))
+    atr = _panel_indicator(frames, panel, lambda df: atr_wilder(
+        df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), atr_period
+    ))
+
+    # === take_profit компилируется по истории каждого символа и раскладывается на общую ось
+    take_profit = params.get("take_profit") or {}
+    exit_thresholds = []
+    for symbol in symbols:
+        df = frames[symbol]
+        compiled = compile_exit_levels(
+            take_profit,
+            df["close"].to_numpy(),
+            atr_wilder(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), atr_period),
+            rsi_exit=rsi_exit,
+        )
+        exit_thresholds.append(pd.DataFrame(compiled.thresholds, index=df.index).reindex(panel["index"]).to_numpy())
+    exit_kinds = np.broadcast_to(compiled.kinds, (n_assets, compiled.n_levels))
+    exit_percents = np.broadcast_to(compiled.percents, (n_assets, compiled.n_levels))
+    exit_thresholds = np.stack(exit_thresholds, axis=1)   # бары × символы × уровни
+
+    # === Состояние
+    cash = float(initial_cash)
+    units = np.zeros(n_assets)
+    entry_price = np.zeros(n_assets)
+    entry_units = np.zeros(n_assets)
+    entry_bar = np.zeros(n_assets, dtype=np.int64)
+    entry_cost = np.zeros(n_assets)    # цена × units + комиссия входа (по остатку позиции)
+    highest_close = np.full(n_assets, -np.inf)
+    last_price = np.full(n_assets, np.nan)
+    pending = np.zeros(n_assets, dtype=np.int8)
+    pending_units = np.zeros(n_assets)
+    sell_units = np.zeros(n_assets)
+    sell_level = np.zeros(n_assets, dtype=np.int8)
+    sell_mask = np.zeros(n_assets, dtype=np.int64)   # уровни take_profit ордера (биты)
+    trade_pnl = np.zeros(n_assets)
+
+    # === Автомат частичных выходов
+    fired = np.zeros((n_assets, compiled.n_levels), dtype=bool)
+    levels = LevelCheck(exit_kinds)
+    trailing = np.zeros(n_assets, dtype=bool)
+    ledger = ExitLedger(capacity=n_assets * 64)
+
+    realized = np.zeros(n_assets)
+    fees = np.zeros(n_assets)
+    trades = np.zeros(n_assets, dtype=np.int64)
+    wins = np.zeros(n_assets, dtype=np.int64)
+    bars_in_position = np.zeros(n_assets, dtype=np.int64)
+
+    equity_curve = np.empty(n_bars)
+    cash_curve = np.empty(n_bars)
+    exposure_curve = np.empty(n_bars)
+    positions_curve = np.empty(n_bars, dtype=np.int64)
+    attribution = np.empty((n_bars, n_assets))
+
+    for i in range(n_bars):
+        has_bar = ~np.isnan(open_[i])
+
+        # === 1. Выходы по open (сначала освобождаем кэш)
+        sells = (pending == -1) & has_bar
+        if sells.any():
+            # Частичные уровни, сработавшие на одном баре, — по исполнению (строке журнала) на уровень
+            batches = []
+            whole = sells
+            if compiled.partial:
+                scaling = sells & (sell_level >= 0)
+                if scaling.any():
+                    whole = sells & ~scaling
+                    for j in range(compiled.n_levels):
+                        part = scaling & ((sell_mask >> j) & 1).astype(bool)
+                        if part.any():
+                            batches.append((part, entry_units[part] * exit_percents[part, j], j, 1 << j))
+            if whole.any():
+                batches.append((whole, sell_units[whole], sell_level[whole], sell_mask[whole]))
+
+            for rows, qty, level, mask in batches:
+                fill = np.maximum(open_[i, rows] * (1 - slippage), low[i, rows])
+                qty = np.minimum(qty, units[rows])
+                proceeds = fill * qty
+                comm = proceeds * commission
+                cash += float((proceeds - comm).sum())
+                # Себестоимость списывается пропорционально проданной доле остатка
+                cost = entry_cost[rows] * (qty / units[rows])
+                pnl = proceeds - comm - cost
+                realized[rows] += pnl
+                fees[rows] += comm
+                trade_pnl[rows] += pnl
+                entry_cost[rows] -= cost
+                units[rows] -= qty
+                ledger.append(
+                    np.flatnonzero(rows), entry_bar[rows], i, entry_price[rows], fill,
+                    qty, (fill - entry_price[rows]) * qty, pnl, level, mask,
+                )
+            pending[sells] = 0
+            trailing[sells] = True
+
+            closed = sells & (units <= 1e-12 * entry_units)
+            if closed.any():
+                trades[closed] += 1
+                wins[closed] += trade_pnl[closed] >= 0
+                units[closed] = 0.0
+                entry_cost[closed] = 0.0
+                trade_pnl[closed] = 0.0
+                fired[closed] = False
+                trailing[closed] = False
+
+        # === 2. Входы по open, размер рассчитан на закрытии прошлого бара
+        buys = (pending == 1) & has_bar
+        if buys.any():
+            fill = np.minimum(open_[i, buys] * (1 + slippage), high[i, buys])
+            qty = pending_units[buys]
+            cost = fill * qty * (1 + commission)
+            total = float(cost.sum())
+            if total > cash:
+                scale = max(cash, 0.0) / total
+                qty = qty * scale
+                cost = cost * scale
+            comm = fill * qty * commission
+            cash -= float(cost.sum())
+            units[buys] = qty
+            entry_units[buys] = qty
+            entry_bar[buys] = i
+            entry_price[buys] = fill
+            entry_cost[buys] = cost
+            highest_close[buys] = -np.inf
+            fees[buys] += comm
+            pending[buys] = 0
+
+        # === 3. Оценка портфеля
+        np.copyto(last_price, close[i], where=has_bar)
+        value = np.where(units > 0, units * last_price, 0.0)
+        equity = cash + float(value.sum())
+        equity_curve[i] = equity
+        cash_curve[i] = cash
+        exposure_curve[i] = float(value.sum()) / equity if equity > 0 else 0.0
+        held = units > 0
+        np.maximum(highest_close, close[i], out=highest_close, where=held & has_bar)
+        positions_curve[i] = int(held.sum())
+        bars_in_position += held
+        attribution[i] = realized + np.where(held, value - entry_cost, 0.0)
+
+        # === 4. Сигналы на закрытии
+        ready = has_bar & ~np.isnan(rsi[i]) & ~np.isnan(atr[i]) & (pending == 0)
+        signal_exit = rsi[i] > rsi_exit
+        hits = levels.level_hits(exit_thresholds[i], entry_price, highest_close)
+        if compiled.partial:
+            new_hits, scale = levels.partial_step(hits, fired, exit_percents)
+            trail = levels.trail_hits(close[i], entry_price, highest_close, atr[i], compiled.trail_mult)
+            trail &= trailing
+            exit_signal = ready & held & (signal_exit | trail)
+            scale_out = ready & held & ~exit_signal & (scale > 0)
+
+            if scale_out.any():
+                # Размер каждой части — entry_units × percent уровня, считается при исполнении
+                sell_level[scale_out] = np.argmax(new_hits[scale_out], axis=1)
+                sell_mask[scale_out] = level_mask(new_hits[scale_out])
+            pending[scale_out] = -1
+            levels.mark_fired(fired, scale_out)
+            sell_level[exit_signal & trail] = EXIT_REASON_TRAIL
+            sell_mask[exit_signal & trail] = 0
+        else:
+            take_profit_hit = levels.any_level(hits)
+            exit_signal = ready & held & (signal_exit | take_profit_hit)
+            # без take_profit уровней нет вовсе (hits: символы × 0) — argmax по пустой оси невозможен
+            take_profit_exit = exit_signal & take_profit_hit
+            if take_profit_exit.any():
+                # Полный выход по нескольким уровням сразу — все они в маске (причины через "; ")
+                sell_level[take_profit_exit] = np.argmax(hits[take_profit_exit], axis=1)
+                sell_mask[take_profit_exit] = level_mask(hits[take_profit_exit])
+
+        sell_level[exit_signal & signal_exit] = EXIT_REASON_SIGNAL
+        sell_mask[exit_signal & signal_exit] = 0
+        sell_units[exit_signal] = units[exit_signal]
+        pending[exit_signal] = -1
+
+        enter_signal = ready & ~held & (rsi[i] < rsi_entry)
+        if sizing == "atr_risk":
+            # Риск на сделку не определён без ATR: нулевой / нечисловой ATR — не кандидат
+            enter_signal &= np.isfinite(atr[i]) & (atr[i] > 0)
+        slots = max_positions - int(held.sum()) + int(exit_signal.sum())
+        if slots <= 0:
+            continue
+        candidates = np.flatnonzero(enter_signal)
+        if len(candidates) > slots:
+            # Приоритет — наиболее перепроданные
+            candidates = candidates[np.argsort(rsi[i, candidates])[:slots]]
+
+        if sizing == "equal":
+            notional = np.full(len(candidates), equity / max_positions)
+        elif sizing == "fixed_fraction":
+            notional = np.full(len(candidates), equity * fraction)
+        elif sizing == "atr_risk":
+            risk_units = equity * risk_per_trade / (atr_risk_mult * atr[i, candidates])
+            # Без плеча: позиция не больше свободного кэша
+            notional = np.minimum(risk_units * close[i, candidates], max(cash, 0.0))
+        else:
+            raise ValueError(f"Неизвестное правило размера позиции: {sizing} (доступны {SIZING_RULES})")
+
+        pending[candidates] = 1
+        pending_units[candidates] = notional / close[i, candidates]
+
+    index = panel["index"]
+    equity_df = pd.DataFrame({
+        "equity": equity_curve,
+        "cash": cash_curve,
+        "exposure": exposure_curve,
+        "open_positions": positions_curve,
+    }, index=index)
+    attribution_df = pd.DataFrame(attribution, index=index, columns=symbols)
+
+    final_value = float(equity_curve[-1]) if n_bars else float(initial_cash)
+    assets_df = pd.DataFrame({
+        "symbol": symbols,
+        "Total_trades": trades,
+        "Winning_trades": wins,
+        "Net_PnL": np.round(attribution[-1] if n_bars else realized, 2),
+        "Realized_PnL": np.round(realized, 2),
+        "Fees": np.round(fees, 2),
+        "Time_in_market": np.round(bars_in_position / max(n_bars, 1), 4),
+        "PnL_share": np.round(
+            (attribution[-1] if n_bars else realized) / (final_value - initial_cash)
+            if final_value != initial_cash else np.zeros(n_assets), 4
+        ),
+    })
+
+    peak = np.maximum.accumulate(equity_curve) if n_bars else np.array([initial_cash])
+    metrics = {
+        "symbols": ",".join(symbols),
+        "sizing": sizing,
+        "Initial_portfolio_value": initial_cash,
+        "Final_portfolio_value": round(final_value, 2),
+        "Final_portfolio_growth_percent": round((final_value - initial_cash) / initial_cash * 100, 2),
+        "Total_trades": int(trades.sum()),
+        "Winning_trades": int(wins.sum()),
+        "Losing_trades": int(trades.sum() - wins.sum()),
+        "Max_drawdown_percent": round(float(((equity_curve - peak) / peak).min() * 100), 2) if n_bars else 0.0,
+        "Avg_exposure": round(float(exposure_curve.mean()), 4) if n_bars else 0.0,
+        "Max_exposure": round(float(exposure_curve.max()), 4) if n_bars else 0.0,
+        "Fees": round(float(fees.sum()), 2),
+    }
+
+    rows = ledger.to_array()
+    exits_df = pd.DataFrame(rows).rename(columns={"slot": "symbol"})
+    exits_df["symbol"] = np.asarray(symbols, dtype=object)[rows["slot"]]
+    exits_df.insert(2, "entry_datetime", index[rows["entry_bar"]])
+    exits_df.insert(4, "exit_datetime", index[rows["exit_bar"]])
+    exits_df["reason"] = [
+        compiled.reason(level, mask) for level, mask in zip(rows["level"].tolist(), rows["level_mask"].tolist())
+    ]
+
+    return {
+        "equity": equity_df,
+        "attribution": attribution_df,
+        "assets": assets_df,
+        "metrics": metrics,
+        "exits": exits_df,
+    }
@@ -0,0 +1,71 @@
+import numpy as np
+
+PRUNE_NONE = 0
+PRUNE_DRAWDOWN = 1
+PRUNE_EQUITY = 2
+PRUNE_NO_TRADES = 3
+
+PRUNE_REASONS = {
+    PRUNE_NONE: "",
+    PRUNE_DRAWDOWN: "max_drawdown",
+    PRUNE_EQUITY: "equity_below",
+    PRUNE_NO_TRADES: "no_trades",
+}
+
+STATUS_COMPLETED = "completed"
+STATUS_PRUNED = "pruned"
+
+
+class PruningRules:
+    """
+    Правила досрочной остановки безнадёжного прогона.
+    max_drawdown          — доля просадки от пика equity (0.3 — стоп при -30%);
+    min_equity_percent    — equity ниже этого % от начального кэша ...
+    min_equity_after_bars — ... начиная с этого бара;
+    no_trades_after_bars  — ни одного входа за столько баров.
+    Любое правило можно не задавать (None).
+
+    check() работает и со скалярами (backtrader), и с векторами по комбинациям
+    (векторный движок) — одна реализация для обоих путей.
+    """
+
+    def __init__(self, max_drawdown=None, min_equity_percent=None, min_equity_after_bars=0, no_trades_after_bars=None):
+        self.max_drawdown = max_drawdown
+        self.min_equity_percent = min_equity_percent
+        self.min_equity_after_bars = min_equity_after_bars
+        self.no_trades_after_bars = no_trades_after_bars
+
+    @classmethod
+    def from_config(cls, config):
+        """None / {} → None; словарь → PruningRules; готовый PruningRules возвращается как есть."""
+        if not config:
+            return None
+        if isinstance(config, cls):
+            return config
+        return cls(**config)
+
+    def to_dict(self):
+        return {
+            "max_drawdown": self.max_drawdown,
+            "min_equity_percent": self.min_equity_percent,
+            "min_equity_after_bars": self.min_equity_after_bars,
+            "no_trades_after_bars": self.no_trades_after_bars,
+        }
+
+    def check(self, bars, equity, peak, initial_cash, n_entries):
+        """
+        bars — число пройденных баров, equity / peak / n_entries — текущие значения.
+        Возвращает код причины PRUNE_* (0 — продолжаем); при нескольких причинах —
+        первая по порядку: просадка, equity, отсутствие сделок.
+        """
+        equity = np.asarray(equity, dtype=float)
+        reason = np.zeros(equity.shape, dtype=np.int8)
+
+        if self.no_trades_after_bars is not None and bars >= self.no_trades_after_bars:
+            reason[np.asarray(n_entries) == 0] = PRUNE_NO_TRADES
+        if self.min_equity_percent is not None and bars >= self.min_equity_after_bars:
+            reason[equity < initial_cash * self.min_equity_percent / 100] = PRUNE_EQUITY
+        if self.max_drawdown is not None:
+            reason[equity <= np.asarray(peak) * (1 - self.max_drawdown)] = PRUNE_DRAWDOWN
+
+        return reason if reason.ndim else int(reason)
@@ -0,0 +1,149 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .stream_sink import StreamSink
+
+# Число дня 1970-01-01 в формате дат backtrader (proleptic ordinal + доля суток)
+_BT_EPOCH_ORDINAL = 719163
+_NS_PER_DAY = 86400 * 10**9
+
+
+def bt_num_to_ns(nums):
+    """
+    Даты backtrader (data.datetime[0], float-дни) → int64 нс epoch одним векторным вызовом.
+    Точность float-дня ~10 мкс (backtrader в num2date так же подтягивает время к секундам),
+    поэтому время округляется до миллисекунд — для баров этого с запасом.
+    """
+    millis = np.round((np.asarray(nums, dtype=np.float64) - _BT_EPOCH_ORDINAL) * (_NS_PER_DAY // 10**6))
+    return millis.astype(np.int64) * 10**6
+
+
+class ArrayRecorder:
+    """
+    Побарная запись equity / позиции / кэша в заранее выделенные массивы.
+    На баре — четыре присваивания в float64-массивы (дата — сырым числом backtrader);
+    datetime-объекты и DataFrame появляются только в to_frame() в конце прогона.
+    Ёмкость — длина фида; если баров больше (фид без preload), массивы удваиваются.
+
+    sink (core.stream_sink.StreamSink) — потоковый режим: массивы служат буфером
+    на capacity баров и при заполнении дописываются в поток на диске,
+    так что память не зависит от длины прогона.
+    """
+
+    def __init__(self, capacity, sink=None):
+        capacity = max(int(capacity), 1)
+        self.sink = sink
+        self.dates = np.empty(capacity, dtype=np.float64)
+        self.equity = np.empty(capacity, dtype=np.float64)
+        self.position = np.empty(capacity, dtype=np.float64)
+        self.cash = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size + (self.sink.written if self.sink is not None else 0)
+
+    def _grow(self):
+        for name in ("dates", "equity", "position", "cash"):
+            old = getattr(self, name)
+            grown = np.empty(2 * len(old), dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def record(self, date_num, equity, position, cash=np.nan):
+        i = self.size
+        if i == len(self.equity):
+            if self.sink is not None:
+                self.flush()
+                i = 0
+            else:
+                self._grow()
+        self.dates[i] = date_num
+        self.equity[i] = equity
+        self.position[i] = position
+        self.cash[i] = cash
+        self.size = i + 1
+
+    def timestamps(self):
+        """int64 нс epoch по барам в памяти."""
+        return bt_num_to_ns(self.dates[:self.size])
+
+    def flush(self):
+        """Потоковый режим: бары из буфера — в sink, буфер освобождается."""
+        if self.sink is None or not self.size:
+            return
+        n = self.size
+        self.sink.write_columns(
+            date=self.timestamps().view("datetime64[ns]"),
+            equity=self.equity[:n],
+            position=self.position[:n],
+            cash=self.cash[:n],
+        )
+        self.size = 0
+
+    def to_frame(self):
+        """DataFrame с индексом date: equity, position, cash (копии, без хвоста ёмкости)."""
+        if self.sink is not None:
+            self.flush()
+            return self.sink.to_frame().set_index("date")
+        n = self.size
+        frame = pd.DataFrame({
+            "equity": self.equity[:n].copy(),
+            "position": self.position[:n].copy(),
+            "cash": self.cash[:n].copy(),
+        }, index=pd.DatetimeIndex(self.timestamps().view("datetime64[ns]"), name="date"))
+        return frame
+
+
+class RecorderMixin:
+    """
+    Примесь к bt.Strategy: class MyStrategy(RecorderMixin, bt.Strategy).
+    В start() выделяет ArrayRecorder по длине фида, в next() стратегия вызывает
+    self.record_bar() вместо equity_curve.append((datetime, value)).
+    Бары прогрева индикаторов (prenext) записываются самой примесью: кривая начинается
+    с первого бара фида, как у векторного движка, и Sharpe / CAGR / Exposure у обоих
+    движков считаются по одной шкале.
+    Итог — self.recorder.to_frame() / self.equity_frame().
+    Сделки пишутся отдельно (core.trade_ledger.TradeLedger).
+
+    Параметр стратегии stream_dir (если объявлен и задан) включает потоковый режим:
+    equity пишется в stream_dir/equity пачками по stream_batch баров, а open_sink(name)
+    даёт стратегии такие же потоки для своих логов. Все потоки дописываются в stop().
+    """
+
+    stream_batch = 4096
+
+    def start(self):
+        stream_dir = getattr(self.params, "stream_dir", None)
+        self.stream_dir = Path(stream_dir) if stream_dir else None
+        self.sinks = []
+        if self.stream_dir is not None:
+            self.recorder = ArrayRecorder(self.stream_batch, sink=self.open_sink("equity"))
+        else:
+            self.recorder = ArrayRecorder(self.data.buflen())
+        super().start()
+
+    def open_sink(self, name):
+        sink = StreamSink(self.stream_dir / name, batch_size=self.stream_batch)
+        self.sinks.append(sink)
+        return sink
+
+    def stop(self):
+        self.recorder.flush()
+        for sink in self.sinks:
+            sink.close()
+        super().stop()
+
+    def prenext(self):
+        # next() ещё не вызывается, но бар прогрева — часть кривой (позиция 0, equity = кэш)
+        self.record_bar()
+        super().prenext()
+
+    def record_bar(self):
+        broker = self.broker
+        self.recorder.record(self.data.datetime[0], broker.getvalue(), self.position.size, broker.getcash())
+
+    def equity_frame(self):
+        """Кривая в прежнем формате equity_curve.csv: индекс date, колонка equity."""
+        return self.recorder.to_frame()[["equity"]]
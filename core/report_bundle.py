@@ -0,0 +1,263 @@
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+REPORT_ROOT = Path("results") / "report"
+
+_CSS = """\
+body { font-family: Arial, sans-serif; margin: 16px; color: #222; }
+h1 { font-size: 20px; margin: 0 0 12px; }
+#controls { margin-bottom: 8px; }
+#controls input { width: 320px; padding: 4px; }
+table { border-collapse: collapse; font-size: 13px; }
+th, td { border: 1px solid #ddd; padding: 3px 6px; text-align: right; white-space: nowrap; }
+th { background: #f3f3f3; cursor: pointer; position: sticky; top: 0; }
+th.sorted-asc::after { content: " \\25B2"; }
+th.sorted-desc::after { content: " \\25BC"; }
+td.text { text-align: left; }
+tr.run:hover { background: #eef5ff; cursor: pointer; }
+tr.open { background: #dde9ff; }
+td.chart { padding: 0; text-align: left; }
+.chart-box { width: 100%; min-width: 900px; height: 900px; }
+#pager button { margin: 0 4px; }
+"""
+
+_INDEX_HTML = """\
+<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Backtest report</title>
+<link rel="stylesheet" href="assets/report.css">
+<script src="assets/plotly.min.js"></script>
+</head>
+<body>
+<h1>Прогоны</h1>
+<div id="controls">
+  <input id="filter" placeholder="фильтр: BTCUSDT 1D ...">
+  <span id="pager"></span>
+</div>
+<table id="runs"><thead></thead><tbody></tbody></table>
+<script>
+// Таблица строится из data/index.js; график прогона (data/<id>.js) подгружается при открытии строки
+var PAGE_SIZE = 200;
+var state = { rows: [], columns: [], sortKey: null, desc: true, page: 0, filter: "" };
+
+window.reportIndex = function (rows) {
+  state.rows = rows;
+  var seen = {};
+  rows.forEach(function (row) { Object.keys(row).forEach(function (k) { seen[k] = true; }); });
+  state.columns = Object.keys(seen).filter(function (k) { return k !== "id" && k !== "chart" && k !== "quantstats"; });
+  renderHead();
+  renderBody();
+};
+
+window.reportChart = function (id, fig) {
+  var box = document.getElementById("chart-" + id);
+  if (box) { Plotly.newPlot(box, fig.data, fig.layout, { responsive: true }); }
+};
+
+function visibleRows() {
+  var terms = state.filter.toLowerCase().split(/\\s+/).filter(Boolean);
+  var rows = state.rows.filter(function (row) {
+    var text = state.columns.map(function (c) { return row[c]; }).join(" ").toLowerCase();
+    return terms.every(function (t) { return text.indexOf(t) >= 0; });
+  });
+  if (state.sortKey !== null) {
+    var key = state.sortKey, sign = state.desc ? -1 : 1;
+    rows.sort(function (a, b) {
+      var x = a[key], y = b[key];
+      if (x === y) { return 0; }
+      if (x === null || x === undefined) { return 1; }
+      if (y === null || y === undefined) { return -1; }
+      return (x < y ? -1 : 1) * sign;
+    });
+  }
+  return rows;
+}
+
+function renderHead() {
+  var tr = document.createElement("tr");
+  state.columns.forEach(function (column) {
+    var th = document.createElement("th");
+    th.textContent = column;
+    if (column === state.sortKey) { th.className = state.desc ? "sorted-desc" : "sorted-asc"; }
+    th.onclick = function () {
+      state.desc = state.sortKey === column ? !state.desc : true;
+      state.sortKey = column;
+      state.page = 0;
+      renderHead();
+      renderBody();
+    };
+    tr.appendChild(th);
+  });
+  var thead = document.querySelector("#runs thead");
+  thead.innerHTML = "";
+  thead.appendChild(tr);
+}
+
+function renderBody() {
+  var rows = visibleRows();
+  var pages = Math.max(1, Math.ceil(rows.length / PAGE_SIZE));
+  state.page = Math.min(state.page, pages - 1);
+  var tbody = document.querySelector("#runs tbody");
+  tbody.innerHTML = "";
+  rows.slice(state.page * PAGE_SIZE, (state.page + 1) * PAGE_SIZE).forEach(function (row) {
+    var tr = document.createElement("tr");
+    tr.className = "run";
+    state.columns.forEach(function (column) {
+      var td = document.createElement("td");
+      var value = row[column];
+      td.textContent = value === null || value === undefined ? "" : value;
+      if (typeof value !== "number") { td.className = "text"; }
+      tr.appendChild(td);
+    });
+    tr.onclick = function () { toggleRun(tr, row); };
+    tbody.appendChild(tr);
+  });
+  renderPager(rows.length, pages);
+}
+
+function renderPager(total, pages) {
+  var pager = document.getElementById("pager");
+  pager.innerHTML = "";
+  var prev = document.createElement("button"), next = document.createElement("button");
+  prev.textContent = "<"; next.textContent = ">";
+  prev.onclick = function () { if (state.page > 0) { state.page--; renderBody(); } };
+  next.onclick = function () { if (state.page < pages - 1) { state.page++; renderBody(); } };
+  pager.appendChild(prev);
+  pager.appendChild(document.createTextNode((state.page + 1) + " / " + pages + " (" + total + " прогонов)"));
+  pager.appendChild(next);
+}
+
+function toggleRun(tr, row) {
+  var detail = tr.nextSibling;
+  if (detail && detail.className === "detail") {
+    detail.parentNode.removeChild(detail);
+    tr.classList.remove("open");
+    return;
+  }
+  tr.classList.add("open");
+  var detailRow = document.createElement("tr");
+  detailRow.className = "detail";
+  var td = document.createElement("td");
+  td.className = "chart";
+  td.colSpan = state.columns.length;
+  if (row.quantstats) {
+    var link = document.createElement("a");
+    link.href = row.quantstats;
+    link.target = "_blank";
+    link.textContent = "quantstats";
+    td.appendChild(link);
+  }
+  if (row.chart) {
+    var box = document.createElement("div");
+    box.id = "chart-" + row.id;
+    box.className = "chart-box";
+    td.appendChild(box);
+    var script = document.createElement("script");
+    script.src = "data/" + encodeURIComponent(row.id) + ".js";
+    document.body.appendChild(script);
+  } else if (!row.quantstats) {
+    td.textContent = "график не построен (python render.py)";
+  }
+  detailRow.appendChild(td);
+  tr.parentNode.insertBefore(detailRow, tr.nextSibling);
+}
+
+document.getElementById("filter").oninput = function (e) {
+  state.filter = e.target.value;
+  state.page = 0;
+  renderBody();
+};
+</script>
+<script src="data/index.js"></script>
+</body>
+</html>
+"""
+
+
+def bundle_run_id(result_path):
+    """Идентификатор прогона в бандле: <symbol>_<tf>_<run_id>_<strategy_id> из пути results/<symbol>/<tf>/<папка>."""
+    return "_".join(Path(result_path).parts[-3:])
+
+
+class ReportBundle:
+    """
+    Отчёт по множеству прогонов в одной папке (results/report):
+    - assets/plotly.min.js и assets/report.css — один экземпляр на все прогоны;
+    - data/<id>.js — фигура plotly прогона в JSON (обёрнута в вызов, чтобы грузиться и с file://);
+    - data/index.js + runs.json — метрики всех прогонов;
+    - index.html — сортируемая таблица метрик, график подгружается при открытии строки.
+
+    write_chart() можно вызывать из процессов пула (файлы прогонов независимы),
+    add_runs() — из главного процесса: он переписывает общий индекс.
+    """
+
+    def __init__(self, root=REPORT_ROOT):
+        self.root = Path(root)
+        self.data_dir = self.root / "data"
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.runs_path = self.root / "runs.json"
+        self._write_assets()
+
+    def _write_assets(self):
+        assets = self.root / "assets"
+        assets.mkdir(exist_ok=True)
+        plotly_js = assets / "plotly.min.js"
+        if not plotly_js.exists():
+            from plotly.offline import get_plotlyjs
+            _write_atomic(plotly_js, get_plotlyjs())
+        for path, text in ((assets / "report.css", _CSS), (self.root / "index.html", _INDEX_HTML)):
+            if not path.exists() or path.read_text(encoding="utf-8") != text:
+                _write_atomic(path, text)
+
+    def write_chart(self, run_id, fig):
+        """Фигура plotly → data/<run_id>.js (только данные, без plotly.js)."""
+        path = self.data_dir / f"{run_id}.js"
+        _write_atomic(path, f"window.reportChart({json.dumps(run_id)}, {fig.to_json()});\n")
+        return path
+
+    def add_runs(self, rows):
+        """
+        rows — словари метрик с ключом "id" (+ "chart": есть ли data/<id>.js, "quantstats": путь к HTML).
+        Строки с тем же id заменяются; индекс пишется целиком и грузится страницей сразу,
+        поэтому в отчёт добавляются только прогоны с графиком, а не вся сетка.
+        """
+        runs = {}
+        if self.runs_path.exists():
+            with open(self.runs_path, encoding="utf-8") as f:
+                runs = {row["id"]: row for row in json.load(f)}
+        for row in rows:
+            runs[row["id"]] = {k: _json_value(v) for k, v in row.items()}
+
+        ordered = list(runs.values())
+        _write_atomic(self.runs_path, json.dumps(ordered, ensure_ascii=False))
+        _write_atomic(self.data_dir / "index.js", f"window.reportIndex({json.dumps(ordered, ensure_ascii=False)});\n")
+        return len(ordered)
+
+    def quantstats_link(self, result_path):
+        """Относительная ссылка из index.html на quantstats-отчёт прогона."""
+        result_path = Path(result_path)
+        target = result_path / f"{result_path.name}_quantstats.html"
+        return Path(os.path.relpath(target, self.root)).as_posix()
+
+
+def _json_value(value):
+    # NaN / inf в JSON недопустимы — в таблице это пустые ячейки
+    if isinstance(value, (np.integer, np.floating, np.bool_)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _write_atomic(path, text):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
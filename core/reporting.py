@@ -40,6 +40,17 @@ def save_metrics(result_path, metrics):
     df = pd.DataFrame([metrics])
     df.to_csv(result_path / "metrics.csv", index=False)
 
+def save_metrics_table(result_path, metrics_df):
+    metrics_df.to_csv(result_path / "metrics.csv", index=False)
+
+def save_sweep_metrics(metrics_rows, path="results/sweep_metrics.csv"):
+    from pathlib import Path
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(metrics_rows).to_csv(path, index=False)
+    return path
+
 def save_trades(result_path, trades_df):
     trades_df.to_csv(result_path / "trades.csv", index=False)
 
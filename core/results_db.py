@@ -0,0 +1,356 @@
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_pk      INTEGER PRIMARY KEY,
+    run_key     TEXT NOT NULL UNIQUE,
+    run_id      TEXT,
+    strategy_id TEXT,
+    symbol      TEXT,
+    timeframe   TEXT,
+    engine      TEXT,
+    start_date  TEXT,
+    end_date    TEXT,
+    status      TEXT,
+    params      TEXT,
+    created_at  REAL NOT NULL,
+    family      TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_market ON runs (symbol, timeframe);
+CREATE INDEX IF NOT EXISTS runs_strategy ON runs (strategy_id);
+CREATE INDEX IF NOT EXISTS runs_family ON runs (family, symbol, timeframe);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_pk INTEGER NOT NULL REFERENCES runs (run_pk) ON DELETE CASCADE,
+    name   TEXT NOT NULL,
+    value  REAL,
+    PRIMARY KEY (run_pk, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metrics_name_value ON metrics (name, value);
+
+CREATE TABLE IF NOT EXISTS params (
+    run_pk INTEGER NOT NULL REFERENCES runs (run_pk) ON DELETE CASCADE,
+    name   TEXT NOT NULL,
+    value,
+    PRIMARY KEY (run_pk, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS params_name_value ON params (name, value);
+
+CREATE TABLE IF NOT EXISTS trades (
+    run_pk       INTEGER NOT NULL REFERENCES runs (run_pk) ON DELETE CASCADE,
+    trade_no     INTEGER NOT NULL,
+    entry_ts     INTEGER,
+    exit_ts      INTEGER,
+    entry_price  REAL,
+    exit_price   REAL,
+    size         REAL,
+    pnl          REAL,
+    pnl_comm     REAL,
+    duration_sec REAL,
+    exit_reason  TEXT,
+    PRIMARY KEY (run_pk, trade_no)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS equity (
+    run_pk INTEGER PRIMARY KEY REFERENCES runs (run_pk) ON DELETE CASCADE,
+    n      INTEGER NOT NULL,
+    ts     BLOB NOT NULL,
+    value  BLOB NOT NULL
+);
+"""
+
+# Путь базы по умолчанию — общий для раннеров (запись) и core.results_query (чтение)
+DEFAULT_RESULTS_DB = "results/results.sqlite"
+
+RUN_FIELDS = ("run_key", "run_id", "strategy_id", "symbol", "timeframe", "engine", "start_date", "end_date", "status", "family")
+# Служебные ключи params прогона — в таблицу params (оси для срезов) не попадают
+PARAM_SKIP = {"indicators", "run_id", "strategy_id", "symbol", "timeframe", "start_date", "end_date"}
+TRADE_COLUMNS = (
+    "entry_datetime", "exit_datetime", "entry_price", "exit_price",
+    "size", "pnl", "pnl_comm", "duration_sec", "exit_reason",
+)
+
+
+class ResultsDB:
+    """
+    Единая база результатов вместо папки с десятком CSV на прогон.
+    Таблицы:
+    - runs    — строка на прогон (ключ кэша, strategy_id, рынок, движок, семейство, params в JSON);
+    - metrics — длинный формат (run_pk, name, value), индекс (name, value) для топов по метрике;
+    - params  — скалярные параметры прогона в длинном формате ("take_profit.levels.0.params.mult"),
+                индекс (name, value) для срезов по параметрам (core.results_query);
+    - trades  — сделки прогона;
+    - equity  — кривая целиком: int64-метки и float64-значения в BLOB (один ряд на прогон).
+
+    Запись буферизуется: add_run() копит прогоны, flush() пишет пачку одной транзакцией
+    (автоматически каждые batch_size прогонов и при выходе из with).
+    Повторная запись того же run_key заменяет прогон вместе с дочерними строками.
+    """
+
+    def __init__(self, db_path=DEFAULT_RESULTS_DB, batch_size=500):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.buffer = []
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=60)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")   # читатели не блокируют пишущий свип
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate()
+        self.conn.executescript(_SCHEMA)
+
+    def _migrate(self):
+        # Базы до появления семейства стратегий: колонка добавляется, params заполняет reindex()
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(runs)")]
+        if columns and "family" not in columns:
+            self.conn.execute("ALTER TABLE runs ADD COLUMN family TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+
+    # === Запись
+
+    def add_run(self, run, metrics, params=None, trades=None, equity=None):
+        """
+        run: {"run_key", "run_id", "strategy_id", "symbol", "timeframe", "engine", "start_date", "end_date", "status"}
+        metrics: словарь метрик (в таблицу попадают числовые значения);
+        trades: DataFrame в формате trades_full.csv (или None);
+        equity: Series с DatetimeIndex (или None).
+        """
+        self.buffer.append((run, metrics, params, trades, equity))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return 0
+        now = time.time()
+        metric_rows, param_rows, trade_rows, equity_rows = [], [], [], []
+
+        # В одной пачке побеждает последняя запись ключа (дочерние строки пишутся после цикла)
+        latest = {entry[0]["run_key"]: entry for entry in self.buffer}
+
+        with self.conn:
+            for run, metrics, params, trades, equity in latest.values():
+                if run.get("family") is None:
+                    run = {**run, "family": strategy_family(params)}
+                self.conn.execute("DELETE FROM runs WHERE run_key = ?", (run["run_key"],))
+                run_pk = self.conn.execute(
+                    f"INSERT INTO runs ({', '.join(RUN_FIELDS)}, params, created_at) "
+                    f"VALUES ({', '.join('?' * len(RUN_FIELDS))}, ?, ?) RETURNING run_pk",
+                    (*(_sql_value(run.get(f)) for f in RUN_FIELDS),
+                     json.dumps(params, default=str, ensure_ascii=False) if params is not None else None, now),
+                ).fetchone()[0]
+
+                metric_rows.extend(
+                    (run_pk, name, _metric_value(value))
+                    for name, value in metrics.items()
+                    if _metric_value(value) is not None
+                )
+                param_rows.extend((run_pk, name, value) for name, value in flatten_params(params).items())
+                if trades is not None and not trades.empty:
+                    trade_rows.extend(_trade_rows(run_pk, trades))
+                if equity is not None and len(equity):
+                    equity_rows.append((
+                        run_pk, len(equity),
+                        _timestamps(equity.index).tobytes(),
+                        np.ascontiguousarray(equity.to_numpy(dtype=np.float64)).tobytes(),
+                    ))
+
+            self.conn.executemany("INSERT INTO metrics VALUES (?, ?, ?)", metric_rows)
+            self.conn.executemany("INSERT INTO params VALUES (?, ?, ?)", param_rows)
+            self.conn.executemany(
+                f"INSERT INTO trades VALUES ({', '.join('?' * (len(TRADE_COLUMNS) + 2))})", trade_rows
+            )
+            self.conn.executemany("INSERT INTO equity VALUES (?, ?, ?, ?)", equity_rows)
+
+        written = len(self.buffer)
+        self.buffer = []
+        return written
+
+    def reindex(self):
+        """Пересобирает семейство и таблицу params из runs.params (для баз, записанных до их появления)."""
+        self.flush()
+        rows = self.conn.execute("SELECT run_pk, params FROM runs").fetchall()
+        with self.conn:
+            self.conn.execute("DELETE FROM params")
+            for run_pk, params in rows:
+                params = json.loads(params) if params else None
+                self.conn.execute("UPDATE runs SET family = ? WHERE run_pk = ?", (strategy_family(params), run_pk))
+                self.conn.executemany(
+                    "INSERT INTO params VALUES (?, ?, ?)",
+                    [(run_pk, name, value) for name, value in flatten_params(params).items()],
+                )
+        self.conn.execute("ANALYZE")
+        return len(rows)
+
+    # === Чтение
+
+    def runs(self, **filters):
+        """Прогоны как DataFrame; фильтры по полям runs: runs(symbol="BTCUSDT", timeframe="1D")."""
+        unknown = set(filters) - set(RUN_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля фильтра: {sorted(unknown)}")
+        where = " AND ".join(f"{k} = ?" for k in filters)
+        return pd.read_sql_query(
+            "SELECT * FROM runs" + (f" WHERE {where}" if where else "") + " ORDER BY run_pk",
+            self.conn, params=tuple(filters.values()),
+        )
+
+    def run_pk(self, run_key=None, strategy_id=None, symbol=None, timeframe=None):
+        """run_pk по ключу прогона или по (strategy_id [, symbol, timeframe]) — последний записанный."""
+        if run_key is not None:
+            row = self.conn.execute("SELECT run_pk FROM runs WHERE run_key = ?", (run_key,)).fetchone()
+        else:
+            filters = {"strategy_id": strategy_id, "symbol": symbol, "timeframe": timeframe}
+            filters = {k: v for k, v in filters.items() if v is not None}
+            where = " AND ".join(f"{k} = ?" for k in filters)
+            row = self.conn.execute(
+                f"SELECT run_pk FROM runs WHERE {where} ORDER BY run_pk DESC LIMIT 1", tuple(filters.values())
+            ).fetchone()
+        return row[0] if row else None
+
+    def run(self, run_pk):
+        cursor = self.conn.execute("SELECT * FROM runs WHERE run_pk = ?", (run_pk,))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError(f"Прогон {run_pk} не найден")
+        run = dict(zip([d[0] for d in cursor.description], row))
+        run["params"] = json.loads(run["params"]) if run["params"] else None
+        return run
+
+    def metrics(self, run_pk):
+        return dict(self.conn.execute("SELECT name, value FROM metrics WHERE run_pk = ?", (run_pk,)).fetchall())
+
+    def trades(self, run_pk):
+        trades = pd.read_sql_query(
+            f"SELECT {', '.join(_trade_sql_columns())} FROM trades WHERE run_pk = ? ORDER BY trade_no",
+            self.conn, params=(run_pk,),
+        )
+        trades.columns = list(TRADE_COLUMNS)
+        trades["entry_datetime"] = pd.to_datetime(trades["entry_datetime"])
+        trades["exit_datetime"] = pd.to_datetime(trades["exit_datetime"])
+        return trades
+
+    def equity(self, run_pk):
+        row = self.conn.execute("SELECT n, ts, value FROM equity WHERE run_pk = ?", (run_pk,)).fetchone()
+        if row is None:
+            return pd.Series(dtype=float, name="equity")
+        index = pd.to_datetime(np.frombuffer(row[1], dtype=np.int64))
+        return pd.Series(np.frombuffer(row[2], dtype=np.float64), index=index, name="equity")
+
+    # === Экспорт в привычную структуру папок
+
+    def export_run(self, run_pk, with_png=True):
+        """
+        Восстанавливает results/<symbol>/<tf>/<run_id>_<strategy_id>/ для выбранного прогона:
+        params.json, metrics.csv, trades_full.csv, equity_curve.csv (+ equity.png).
+        """
+        from .reporting import (
+            generate_result_path, save_params, save_metrics, save_trades_full,
+            save_equity_curve, save_equity_plot_png,
+        )
+
+        run = self.run(run_pk)
+        result_path = generate_result_path(run["symbol"], run["timeframe"], run)
+        save_params(result_path, {**(run["params"] or {}), "start_date": run["start_date"], "end_date": run["end_date"]})
+        save_metrics(result_path, {
+            "strategy_id": run["strategy_id"], "run_id": run["run_id"],
+            "symbol": run["symbol"], "timeframe": run["timeframe"],
+            **self.metrics(run_pk),
+        })
+
+        trades = self.trades(run_pk)
+        if not trades.empty:
+            save_trades_full(result_path, trades)
+
+        equity = self.equity(run_pk)
+        if len(equity):
+            equity_df = equity.to_frame()
+            equity_df.index.name = "date"
+            save_equity_curve(result_path, equity_df)
+            if with_png:
+                save_equity_plot_png(result_path, equity_df)
+        return result_path
+
+
+def strategy_family(params):
+    """
+    Семейство стратегии: режим take_profit и набор типов выходов ("full:atr", "partial:atr+ema_cross").
+    Внутри семейства прогоны отличаются только числами — их и сравнивают срезы по параметрам.
+    """
+    take_profit = (params or {}).get("take_profit")
+    if not take_profit:
+        return "signal"
+    mode = take_profit.get("mode", "full")
+    mode = getattr(mode, "value", mode)
+    exits = "+".join(str(getattr(level.get("exit_type"), "value", level.get("exit_type"))) for level in take_profit.get("levels", []))
+    return f"{mode}:{exits}"
+
+
+def flatten_params(params, prefix=""):
+    """Скалярные параметры с путями через точку: {"take_profit": {"mode": "full"}} → {"take_profit.mode": "full"}."""
+    flat = {}
+    items = params.items() if isinstance(params, dict) else enumerate(params or [])
+    for key, value in items:
+        if not prefix and key in PARAM_SKIP:
+            continue
+        name = f"{prefix}{key}"
+        value = getattr(value, "value", value)  # Enum → значение
+        if isinstance(value, (dict, list, tuple)):
+            flat.update(flatten_params(value, f"{name}."))
+        elif isinstance(value, (bool, np.bool_)):
+            flat[name] = int(value)
+        elif isinstance(value, (int, float, str, np.integer, np.floating)):
+            flat[name] = value.item() if hasattr(value, "item") else value
+    return flat
+
+
+def _sql_value(value):
+    return None if value is None else str(value)
+
+
+def _metric_value(value):
+    if isinstance(value, (bool, np.bool_)):
+        return float(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        value = float(value)
+        return None if math.isnan(value) else value
+    return None
+
+
+def _timestamps(values):
+    index = pd.DatetimeIndex(values)
+    return index.asi8.astype(np.int64, copy=False)
+
+
+def _trade_sql_columns():
+    return ["entry_ts", "exit_ts"] + list(TRADE_COLUMNS[2:])
+
+
+def _trade_rows(run_pk, trades):
+    entry_ts = _timestamps(trades["entry_datetime"]) if "entry_datetime" in trades else [None] * len(trades)
+    exit_ts = _timestamps(trades["exit_datetime"]) if "exit_datetime" in trades else [None] * len(trades)
+    columns = [
+        trades[c].tolist() if c in trades else [None] * len(trades)
+        for c in TRADE_COLUMNS[2:]
+    ]
+    for n, row in enumerate(zip(entry_ts, exit_ts, *columns)):
+        yield (run_pk, n, *(v.item() if hasattr(v, "item") else v for v in row))
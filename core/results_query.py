@@ -0,0 +1,198 @@
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from .results_db import DEFAULT_RESULTS_DB, RUN_FIELDS
+
+AGGREGATES = {"mean": "AVG", "min": "MIN", "max": "MAX", "sum": "SUM", "count": "COUNT"}
+_OPERATORS = {">=", "<=", ">", "<", "=", "!="}
+
+# Метрики, которые top() подтягивает к строкам по умолчанию (если есть в базе)
+DEFAULT_COLUMNS = [
+    "Final_portfolio_growth_percent", "Total_trades", "Win_rate", "Profit_factor",
+    "Sharpe", "Max_drawdown_percent",
+]
+
+
+class ResultsQuery:
+    """
+    Запросы к базе результатов (core.results_db) без чтения тысяч metrics.csv:
+    - top()         — топ-N прогонов по любой метрике с фильтрами;
+    - group()       — агрегаты метрики по рынкам / семействам / движкам;
+    - leaderboard() — strategy_id, устойчивые на нескольких рынках (symbol × tf), отдельно по движкам;
+    - pivot()       — срез метрики по параметрам (чувствительность).
+
+    Общие фильтры (именованные аргументы всех методов):
+    symbol / timeframe / family / engine / strategy_id / status — значение или список;
+    min_trades — Total_trades >= N; max_drawdown — просадка не глубже N % (30 → Max_drawdown_percent >= -30);
+    where — [(метрика, оператор, значение), ...]; params — {"rsi_period": 14, ...}.
+
+    Топ идёт по индексу metrics(name, value) сверху вниз, фильтры проверяются
+    точечными выборками по первичным ключам, поэтому ответ не зависит от размера базы
+    до тех пор, пока фильтры не отсекают почти всё. group() / leaderboard() / pivot()
+    читают строки одной метрики по тому же индексу одним проходом (~1–2 с на 1M прогонов).
+
+    База открывается только на чтение (mode=ro): запрос не меняет журнал и схему
+    базы, в которую параллельно пишет свип, и не создаёт пустую базу по опечатке в пути.
+    """
+
+    def __init__(self, db_path=DEFAULT_RESULTS_DB):
+        self.db_path = Path(db_path)
+        if not self.db_path.is_file():
+            raise FileNotFoundError(f"База результатов не найдена: {self.db_path}")
+        self.conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=60)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(runs)")]
+        if "family" not in columns:
+            self.conn.close()
+            raise ValueError(f"{self.db_path}: база без runs.family — пересоберите её: python results_query.py reindex")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # === Фильтры
+
+    def _filters(self, symbol=None, timeframe=None, family=None, engine=None, strategy_id=None, status=None,
+                 min_trades=None, max_drawdown=None, where=None, params=None):
+        conditions, args = [], []
+        run_filters = {
+            "symbol": symbol, "timeframe": timeframe, "family": family,
+            "engine": engine, "strategy_id": strategy_id, "status": status,
+        }
+        for column, value in run_filters.items():
+            if value is None:
+                continue
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            conditions.append(f"r.{column} IN ({', '.join('?' * len(values))})")
+            args.extend(values)
+
+        metric_filters = list(where or [])
+        if min_trades is not None:
+            metric_filters.append(("Total_trades", ">=", min_trades))
+        if max_drawdown is not None:
+            metric_filters.append(("Max_drawdown_percent", ">=", -abs(max_drawdown)))
+        for name, op, value in metric_filters:
+            if op not in _OPERATORS:
+                raise ValueError(f"Неизвестный оператор: {op}")
+            conditions.append(
+                f"EXISTS (SELECT 1 FROM metrics f WHERE f.run_pk = r.run_pk AND f.name = ? AND f.value {op} ?)"
+            )
+            args.extend([name, value])
+
+        for name, value in (params or {}).items():
+            conditions.append("EXISTS (SELECT 1 FROM params p WHERE p.run_pk = r.run_pk AND p.name = ? AND p.value = ?)")
+            args.extend([name, value])
+        return conditions, args
+
+    def _axis(self, name, joins, args, k):
+        """Ось группировки: поле runs или параметр (через join к params)."""
+        if name in RUN_FIELDS:
+            return f"r.{name}"
+        joins.append(f"JOIN params a{k} ON a{k}.run_pk = r.run_pk AND a{k}.name = ?")
+        args.append(name)
+        return f"a{k}.value"
+
+    # === Запросы
+
+    def select(self, **filters):
+        """Прогоны под фильтрами: run_pk, strategy_id, symbol, timeframe, family, engine, status."""
+        conditions, args = self._filters(**filters)
+        return pd.read_sql_query(
+            "SELECT r.run_pk, r.strategy_id, r.symbol, r.timeframe, r.family, r.engine, r.status FROM runs r "
+            f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''} ORDER BY r.run_pk",
+            self.conn, params=args,
+        )
+
+    def top(self, metric, n=20, ascending=False, columns=None, **filters):
+        """Топ-N прогонов по metric; columns — какие ещё метрики подтянуть к строкам."""
+        conditions, args = self._filters(**filters)
+        rows = pd.read_sql_query(
+            "SELECT r.run_pk, r.strategy_id, r.symbol, r.timeframe, r.family, r.engine, r.status, "
+            f"m.value AS \"{metric}\" "
+            "FROM metrics m JOIN runs r ON r.run_pk = m.run_pk "
+            f"WHERE {' AND '.join(['m.name = ?'] + conditions)} "
+            f"ORDER BY m.value {'ASC' if ascending else 'DESC'} LIMIT ?",
+            self.conn, params=(metric, *args, n),
+        )
+        extra = [c for c in (columns if columns is not None else DEFAULT_COLUMNS) if c != metric]
+        if rows.empty or not extra:
+            return rows
+
+        run_pks = rows["run_pk"].tolist()
+        wide = pd.read_sql_query(
+            f"SELECT run_pk, name, value FROM metrics WHERE run_pk IN ({', '.join('?' * len(run_pks))}) "
+            f"AND name IN ({', '.join('?' * len(extra))})",
+            self.conn, params=(*run_pks, *extra),
+        ).pivot(index="run_pk", columns="name", values="value")
+        wide = wide.reindex(columns=[c for c in extra if c in wide.columns])
+        return rows.join(wide, on="run_pk")
+
+    def group(self, metric, by=("symbol", "timeframe"), **filters):
+        """count / mean / min / max метрики по группам (поля runs или параметры)."""
+        by = [by] if isinstance(by, str) else list(by)
+        conditions, args = self._filters(**filters)
+        joins, axis_args = [], []
+        axes = [self._axis(name, joins, axis_args, k) for k, name in enumerate(by)]
+        select = ", ".join(f"{axis} AS \"{name}\"" for axis, name in zip(axes, by))
+        return pd.read_sql_query(
+            f"SELECT {select}, COUNT(*) AS runs, AVG(m.value) AS mean, MIN(m.value) AS min, MAX(m.value) AS max "
+            f"FROM metrics m JOIN runs r ON r.run_pk = m.run_pk {' '.join(joins)} "
+            f"WHERE {' AND '.join(['m.name = ?'] + conditions)} "
+            f"GROUP BY {', '.join(axes)} ORDER BY mean DESC",
+            self.conn, params=(*axis_args, metric, *args),
+        )
+
+    def leaderboard(self, metric, n=20, agg="mean", min_markets=1, **filters):
+        """
+        Рейтинг strategy_id по агрегату метрики на всех рынках (symbol × tf).
+        agg="min" — худший рынок: устойчивость, а не удачный выброс.
+        Строка — пара (strategy_id, engine): метрики одного strategy_id на разных движках
+        считаются по разным кривым и в один агрегат не смешиваются (фильтр engine= — один движок).
+        """
+        if agg not in AGGREGATES:
+            raise ValueError(f"agg должен быть одним из {sorted(AGGREGATES)}")
+        conditions, args = self._filters(**filters)
+        return pd.read_sql_query(
+            f"SELECT r.strategy_id, r.engine, r.family, COUNT(DISTINCT r.symbol || '|' || r.timeframe) AS markets, "
+            f"COUNT(*) AS runs, {AGGREGATES[agg]}(m.value) AS \"{metric}_{agg}\", "
+            "AVG(m.value) AS mean, MIN(m.value) AS min, MAX(m.value) AS max "
+            "FROM metrics m JOIN runs r ON r.run_pk = m.run_pk "
+            f"WHERE {' AND '.join(['m.name = ?'] + conditions)} "
+            f"GROUP BY r.strategy_id, r.engine HAVING markets >= ? ORDER BY \"{metric}_{agg}\" DESC LIMIT ?",
+            self.conn, params=(metric, *args, min_markets, n),
+        )
+
+    def pivot(self, metric, rows, columns=None, agg="mean", **filters):
+        """
+        Сводная таблица метрики: строки / колонки — параметры ("rsi_period",
+        "take_profit.levels.0.params.mult") или поля runs ("symbol", "timeframe").
+        """
+        if agg not in AGGREGATES:
+            raise ValueError(f"agg должен быть одним из {sorted(AGGREGATES)}")
+        names = [rows] + ([columns] if columns else [])
+        conditions, args = self._filters(**filters)
+        joins, axis_args = [], []
+        axes = [self._axis(name, joins, axis_args, k) for k, name in enumerate(names)]
+        select = ", ".join(f"{axis} AS \"{name}\"" for axis, name in zip(axes, names))
+        flat = pd.read_sql_query(
+            f"SELECT {select}, {AGGREGATES[agg]}(m.value) AS value "
+            f"FROM metrics m JOIN runs r ON r.run_pk = m.run_pk {' '.join(joins)} "
+            f"WHERE {' AND '.join(['m.name = ?'] + conditions)} "
+            f"GROUP BY {', '.join(axes)}",
+            self.conn, params=(*axis_args, metric, *args),
+        )
+        if not columns:
+            return flat.set_index(rows)["value"].rename(metric).sort_index()
+        return flat.pivot(index=rows, columns=columns, values="value").sort_index().sort_index(axis=1)
+
+    def metric_names(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT name FROM metrics ORDER BY name")]
+
+    def param_names(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT name FROM params ORDER BY name")]
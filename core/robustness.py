@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+
+def bootstrap_indices(n_trades, n_sims, rng):
+    """Бутстреп с возвращением: (n_sims × n_trades) индексов сделок."""
+    return rng.integers(0, n_trades, size=(n_sims, n_trades), dtype=np.int32)
+
+
+def shuffle_indices(n_trades, n_sims, rng):
+    """Перестановка порядка сделок без возвращения: каждая строка — перестановка."""
+    return rng.permuted(np.broadcast_to(np.arange(n_trades, dtype=np.int32), (n_sims, n_trades)), axis=1)
+
+
+def block_bootstrap_indices(n_trades, n_sims, rng, block_size=10):
+    """
+    Блочный бутстреп: склеиваем блоки подряд идущих сделок со случайных стартов
+    (циклически), чтобы сохранить серии выигрышей / проигрышей.
+    """
+    n_blocks = -(-n_trades // block_size)
+    starts = rng.integers(0, n_trades, size=(n_sims, n_blocks), dtype=np.int32)
+    offsets = np.arange(block_size, dtype=np.int32)
+    idx = (starts[:, :, None] + offsets[None, None, :]) % n_trades
+    return idx.reshape(n_sims, -1)[:, :n_trades]
+
+
+RESAMPLERS = {
+    "bootstrap": bootstrap_indices,
+    "shuffle": shuffle_indices,
+    "block": block_bootstrap_indices,
+}
+
+
+def simulate_paths(pnl, n_sims=10000, method="bootstrap", initial_cash=100000, seed=None, **kwargs):
+    """
+    Строит n_sims траекторий equity из PnL сделок (pnl_comm из trades_full.csv).
+    Индексы ресэмплинга — одна 2-D матрица, дальше только векторные операции.
+
+    Возвращает словарь массивов длины n_sims:
+    {
+        "final_equity": ..., "max_drawdown": ... (доля, отрицательная),
+        "profit_factor": ...,
+    }
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    pnl = pnl[~np.isnan(pnl)]
+    if pnl.size == 0:
+        raise ValueError("Нет сделок для симуляции")
+
+    rng = np.random.default_rng(seed)
+    idx = RESAMPLERS[method](pnl.size, n_sims, rng, **kwargs)
+    # Прибыль по сделкам: положительная часть — отдельной выборкой по тем же индексам
+    gross_profit = np.maximum(pnl, 0.0)[idx].sum(axis=1)
+
+    # === Equity и просадка на месте, без лишних (n_sims × n_trades) временных массивов
+    equity = pnl[idx]
+    np.cumsum(equity, axis=1, out=equity)
+    equity += initial_cash
+    net = equity[:, -1] - initial_cash
+    gross_loss = gross_profit - net
+
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, initial_cash, out=peak)
+    np.divide(equity, peak, out=peak)
+    max_drawdown = peak.min(axis=1) - 1.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(gross_loss > 1e-9, gross_profit / gross_loss, np.inf)
+
+    return {
+        "final_equity": equity[:, -1].copy(),
+        "max_drawdown": max_drawdown,
+        "profit_factor": profit_factor,
+    }
+
+
+def summarize_distribution(values, percentiles=(1, 5, 25, 50, 75, 95, 99)):
+    """Среднее, std и перцентили распределения (inf отбрасываются)."""
+    values = np.asarray(values, dtype=np.float64)
+    finite = values[np.isfinite(values)]
+    summary = {
+        "mean": float(finite.mean()) if finite.size else np.nan,
+        "std": float(finite.std()) if finite.size else np.nan,
+        "share_inf": float(1 - finite.size / values.size) if values.size else np.nan,
+    }
+    if finite.size:
+        for p, v in zip(percentiles, np.percentile(finite, percentiles)):
+            summary[f"p{p}"] = float(v)
+    return summary
+
+
+def robustness_report(pnl, n_sims=10000, methods=("bootstrap", "shuffle", "block"),
+                      initial_cash=100000, seed=None, block_size=10):
+    """
+    Сводка по всем методам: строка на (method, metric) с перцентилями.
+    Дополнительно — вероятность убытка и вероятность просадки хуже фактической.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    pnl = pnl[~np.isnan(pnl)]
+    if pnl.size == 0:
+        raise ValueError("Нет сделок для симуляции")
+
+    # === Фактический порядок сделок
+    equity = initial_cash + np.cumsum(pnl)
+    peak = np.maximum(np.maximum.accumulate(equity), initial_cash)
+    realized_dd = float(((equity - peak) / peak).min())
+
+    rows = []
+    for i, method in enumerate(methods):
+        kwargs = {"block_size": block_size} if method == "block" else {}
+        sims = simulate_paths(pnl, n_sims, method, initial_cash, None if seed is None else seed + i, **kwargs)
+        for metric, values in sims.items():
+            rows.append({"method": method, "metric": metric, **summarize_distribution(values)})
+        rows.append({
+            "method": method,
+            "metric": "prob_loss",
+            "mean": float((sims["final_equity"] < initial_cash).mean()),
+        })
+        rows.append({
+            "method": method,
+            "metric": "prob_worse_drawdown",
+            "mean": float((sims["max_drawdown"] < realized_dd).mean()),
+        })
+
+    report = pd.DataFrame(rows)
+    report.attrs["realized"] = {"final_equity": float(equity[-1]), "max_drawdown": realized_dd}
+    return report
+
+
+def robustness_from_trades_csv(path, pnl_column="pnl_comm", **kwargs):
+    """Отчёт устойчивости по сохранённому trades_full.csv."""
+    trades = pd.read_csv(path)
+    return robustness_report(trades[pnl_column].to_numpy(dtype=np.float64), **kwargs)
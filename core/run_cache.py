@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from .param_grid import params_hash
+
+# Увеличивать при любом изменении логики движков, влияющем на результаты —
+# старые записи кэша перестанут совпадать по ключу.
+ENGINE_VERSION = "3"
+
+
+def data_fingerprint(df):
+    """Хеш содержимого свечей (индекс + OHLCV): меняется при любой докачке или правке данных."""
+    if df is None or df.empty:
+        return ""
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.md5(hashed.tobytes()).hexdigest()[:16]
+
+
+def run_key(strategy_id, symbol, timeframe, start_date, end_date, data_hash, engine, config=None):
+    """
+    Ключ прогона: strategy_id + symbol + timeframe + окно дат + хеш данных
+    + движок и его версия + настройки брокера (кэш, комиссия, проскальзывание).
+    """
+    return params_hash({
+        "strategy_id": strategy_id,
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "data_hash": data_hash,
+        "engine": engine,
+        "engine_version": ENGINE_VERSION,
+        "config": config or {},
+    }, length=None)
+
+
+class RunCache:
+    """
+    Индекс уже посчитанных прогонов (append-only JSONL).
+    Каждая строка:
+    {
+        "key": "...",
+        "strategy_id": "...", "symbol": "...", "timeframe": "...",
+        "engine": "...", "run_id": "...", "result_path": "...",
+        "metrics": {...},
+        "cached_at": "..."
+    }
+    При повторной записи того же ключа побеждает последняя строка.
+    """
+
+    def __init__(self, index_path=Path("results") / "run_index.jsonl"):
+        self.index_path = Path(index_path)
+        self.entries = {}
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # оборванная последняя строка после аварийного завершения
+                    self.entries[entry["key"]] = entry
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, metrics, **fields):
+        entry = {
+            "key": key,
+            **fields,
+            "metrics": {k: v.item() if hasattr(v, "item") else v for k, v in metrics.items()},
+            "cached_at": datetime.now().isoformat(),
+        }
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str, ensure_ascii=False) + "\n")
+        self.entries[key] = entry
+        return entry
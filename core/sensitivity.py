@@ -0,0 +1,223 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+SURFACE_AGGREGATES = ("mean", "min", "max")
+
+
+class MetricSurface:
+    """
+    Метрика на сетке параметров как плотный массив:
+    values[i, j, ...] — значение при names[0] = axes[0][i], names[1] = axes[1][j], ...
+    Точки сетки, которых нет в свипе, — NaN; counts — число прогонов в точке
+    (несколько рынков / повторов в одной точке агрегируются при построении).
+    """
+
+    def __init__(self, metric, names, axes, values, counts=None):
+        self.metric = metric
+        self.names = list(names)
+        self.axes = [np.asarray(axis) for axis in axes]
+        self.values = np.asarray(values, dtype=np.float64)
+        self.counts = np.asarray(counts) if counts is not None else np.isfinite(self.values).astype(np.int64)
+
+    @property
+    def ndim(self):
+        return self.values.ndim
+
+    def __repr__(self):
+        shape = " × ".join(f"{name}[{len(axis)}]" for name, axis in zip(self.names, self.axes))
+        return f"MetricSurface({self.metric}: {shape})"
+
+    def axis_index(self, name):
+        if name not in self.names:
+            raise KeyError(f"Параметра {name} нет в поверхности: {self.names}")
+        return self.names.index(name)
+
+    def marginal(self, keep, how="mean"):
+        """
+        Поверхность по параметрам keep, остальные оси свёрнуты (mean / min / max по точкам сетки).
+        how="max" — лучшее значение при любых прочих параметрах, "min" — худшее.
+        """
+        keep = [keep] if isinstance(keep, str) else list(keep)
+        if how not in SURFACE_AGGREGATES:
+            raise ValueError(f"how должен быть одним из {SURFACE_AGGREGATES}")
+        positions = [self.axis_index(name) for name in keep]
+        other = tuple(i for i in range(self.ndim) if i not in positions)
+        reducer = {"mean": np.nanmean, "min": np.nanmin, "max": np.nanmax}[how]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # точки, где вся свёртка — NaN
+            values = reducer(self.values, axis=other) if other else self.values
+        counts = self.counts.sum(axis=other) if other else self.counts
+        # После свёртки оси идут в исходном порядке — переставляем в порядок keep
+        order = np.argsort(np.argsort(positions))
+        return MetricSurface(
+            self.metric, keep, [self.axes[i] for i in positions],
+            np.transpose(values, order), np.transpose(counts, order),
+        )
+
+    def to_frame(self):
+        """Длинный формат: колонки параметров + метрика + runs (только заполненные точки)."""
+        grids = np.meshgrid(*self.axes, indexing="ij")
+        frame = pd.DataFrame({name: grid.ravel() for name, grid in zip(self.names, grids)})
+        frame[self.metric] = self.values.ravel()
+        frame["runs"] = self.counts.ravel()
+        return frame[np.isfinite(frame[self.metric].to_numpy())].reset_index(drop=True)
+
+
+# === Построение поверхности
+
+def surface_from_frame(frame, metric, params, agg="mean"):
+    """
+    Поверхность из таблицы прогонов (sweep_metrics.csv, ResultsQuery.group / top и т. п.):
+    колонки params — оси, metric — значение. Повторы точки сетки сводятся agg.
+    """
+    params = [params] if isinstance(params, str) else list(params)
+    if agg not in SURFACE_AGGREGATES:
+        raise ValueError(f"agg должен быть одним из {SURFACE_AGGREGATES}")
+    frame = frame.dropna(subset=params)
+    axes, codes = [], []
+    for name in params:
+        axis, code = np.unique(frame[name].to_numpy(), return_inverse=True)
+        axes.append(axis)
+        codes.append(code)
+    shape = tuple(len(axis) for axis in axes)
+    flat = np.ravel_multi_index(codes, shape) if params else np.zeros(len(frame), dtype=np.int64)
+    size = int(np.prod(shape))
+
+    value = frame[metric].to_numpy(dtype=np.float64)
+    finite = np.isfinite(value)
+    flat, value = flat[finite], value[finite]
+    counts = np.bincount(flat, minlength=size)
+    if agg == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.bincount(flat, weights=value, minlength=size) / counts
+    else:
+        values = np.full(size, np.inf if agg == "min" else -np.inf)
+        (np.minimum if agg == "min" else np.maximum).at(values, flat, value)
+        values[counts == 0] = np.nan
+    return MetricSurface(metric, params, axes, values.reshape(shape), counts.reshape(shape))
+
+
+def surface_from_db(query, metric, axes, agg="mean", **filters):
+    """
+    Поверхность прямо из базы результатов одним GROUP BY по осям axes
+    (query — core.results_query.ResultsQuery или путь к базе; filters — как у ResultsQuery,
+    в том числе params={...} — срез по остальным параметрам).
+    """
+    from .results_query import ResultsQuery
+
+    axes = [axes] if isinstance(axes, str) else list(axes)
+    if agg not in SURFACE_AGGREGATES:
+        raise ValueError(f"agg должен быть одним из {SURFACE_AGGREGATES}")
+    owned = not isinstance(query, ResultsQuery)
+    if owned:
+        query = ResultsQuery(query)
+    try:
+        grouped = query.group(metric, by=axes, **filters).dropna(subset=axes)
+    finally:
+        if owned:
+            query.close()
+    surface = surface_from_frame(grouped.rename(columns={agg: metric}), metric, axes, agg=agg)
+    # Число прогонов в точке — из GROUP BY, а не число строк группировки
+    codes = [np.searchsorted(axis, grouped[name].to_numpy()) for name, axis in zip(axes, surface.axes)]
+    counts = np.zeros(surface.values.shape, dtype=np.int64)
+    counts[tuple(codes)] = grouped["runs"].to_numpy()
+    surface.counts = counts
+    return surface
+
+
+# === Устойчивость
+
+def _window_reduce(values, radius, reducer, fill):
+    """Окно (2·radius+1) по каждой оси — разделимо: по оси за раз, O(size · radius · ndim)."""
+    width = 2 * radius + 1
+    out = values
+    for axis in range(values.ndim):
+        pad = [(0, 0)] * values.ndim
+        pad[axis] = (radius, radius)
+        padded = np.pad(out, pad, constant_values=fill)
+        windows = np.lib.stride_tricks.sliding_window_view(padded, width, axis=axis)
+        out = reducer(windows, axis=-1)
+    return out
+
+
+def stability_scores(surface, radius=1, penalty=1.0):
+    """
+    Сглаженные оценки по окрестности каждой точки сетки (куб ±radius шагов по всем осям),
+    векторно по всей сетке. Пустые точки и края в окрестность не входят.
+    Возвращает словарь массивов формы surface.values:
+    - smoothed    — среднее метрики в окрестности;
+    - std         — разброс в окрестности;
+    - worst       — худшее значение в окрестности;
+    - degradation — value − worst: сколько теряется при сдвиге параметров на шаг;
+    - score       — smoothed − penalty · std: высокое и ровное плато лучше одиночного пика.
+    """
+    values = surface.values
+    finite = np.isfinite(values)
+    filled = np.where(finite, values, 0.0)
+
+    count = _window_reduce(finite.astype(np.float64), radius, np.sum, 0.0)
+    total = _window_reduce(filled, radius, np.sum, 0.0)
+    total_sq = _window_reduce(filled * filled, radius, np.sum, 0.0)
+    worst = _window_reduce(np.where(finite, values, np.inf), radius, np.min, np.inf)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = total / count
+        std = np.sqrt(np.maximum(total_sq / count - smoothed * smoothed, 0.0))
+    empty = ~finite   # оценки — только для точек, которые есть в свипе
+    smoothed[empty] = np.nan
+    std[empty] = np.nan
+    worst = np.where(empty, np.nan, worst)
+    return {
+        "smoothed": smoothed,
+        "std": std,
+        "worst": worst,
+        "degradation": values - worst,
+        "score": smoothed - penalty * std,
+    }
+
+
+def robust_plateaus(surface, n=10, radius=1, penalty=1.0):
+    """Топ-n точек сетки по score устойчивости (а не по сырому значению метрики)."""
+    scores = stability_scores(surface, radius=radius, penalty=penalty)
+    frame = surface.to_frame()
+    mask = np.isfinite(surface.values).ravel()
+    for key, array in scores.items():
+        frame[key] = array.ravel()[mask]
+    return frame.sort_values("score", ascending=False).head(n).reset_index(drop=True)
+
+
+# === Визуализация
+
+def plot_sensitivity_heatmap(surface, x, y, how="mean", radius=1, penalty=1.0, save_path=None):
+    """
+    Тепловые карты пары параметров (прочие свёрнуты how): слева метрика,
+    справа score устойчивости на той же сетке.
+    save_path — HTML; фигура возвращается всегда.
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    plane = surface.marginal([x, y], how=how)
+    scores = stability_scores(plane, radius=radius, penalty=penalty)
+    x_labels = [str(v) for v in plane.axes[0]]
+    y_labels = [str(v) for v in plane.axes[1]]
+
+    fig = make_subplots(
+        rows=1, cols=2, horizontal_spacing=0.12,
+        subplot_titles=(f"{surface.metric} ({how})", f"Устойчивость (±{radius}, penalty {penalty})"),
+    )
+    for col, z, colorbar_x in ((1, plane.values, 0.44), (2, scores["score"], 1.0)):
+        fig.add_trace(go.Heatmap(
+            z=z.T, x=x_labels, y=y_labels, colorscale="RdYlGn",
+            colorbar=dict(x=colorbar_x, len=0.9),
+            hovertemplate=f"{x}=%{{x}}<br>{y}=%{{y}}<br>%{{z:.3f}}<extra></extra>",
+        ), row=1, col=col)
+        fig.update_xaxes(title_text=x, type="category", row=1, col=col)
+        fig.update_yaxes(title_text=y, type="category", row=1, col=col)
+    fig.update_layout(title=f"Чувствительность {surface.metric}: {x} × {y}", height=600, width=1300)
+
+    if save_path:
+        fig.write_html(str(save_path))
+    return fig
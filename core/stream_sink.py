@@ -0,0 +1,188 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Типы колонок: как хранятся на диске
+_KIND_DTYPES = {
+    "datetime": np.dtype("<i8"),   # нс epoch
+    "float": np.dtype("<f8"),
+    "bool": np.dtype("?"),
+    "category": np.dtype("<i4"),   # коды, строки — в colN.txt
+}
+
+SCHEMA_FILE = "schema.json"
+
+
+def _kind_of(value):
+    if isinstance(value, (datetime, np.datetime64, pd.Timestamp)):
+        return "datetime"
+    if isinstance(value, (bool, np.bool_)):
+        return "bool"
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return "float"
+    return "category"
+
+
+class StreamSink:
+    """
+    Поток записей прогона (лог входов / выходов, побарная equity) в папку с
+    колонками в отдельных append-only файлах: colN.bin — сырые значения,
+    colN.txt — словарь строк категориальной колонки, schema.json — имена и типы.
+
+    В памяти — только буфер на batch_size строк: при заполнении он дописывается
+    в конец файлов, так что память не растёт с длиной прогона, а прерванный прогон
+    читается read_stream() до последней записанной пачки (недописанный хвост отрезается).
+
+    append(dict) — запись-словарь (схема — по первой записи, как у pd.DataFrame(list_of_dicts));
+    write_columns(**arrays) — готовая пачка колонок (ArrayRecorder).
+    Итерация / to_frame() читают записанное обратно — для отчётов в конце прогона.
+    """
+
+    def __init__(self, directory, batch_size=4096, fsync=False):
+        self.directory = Path(directory)
+        self.batch_size = int(batch_size)
+        self.fsync = fsync
+        if self.directory.exists():
+            shutil.rmtree(self.directory)   # новый прогон — новый поток
+        self.directory.mkdir(parents=True)
+        self.columns = None
+        self.buffer = None
+        self.categories = None
+        self.written = 0
+
+    def __len__(self):
+        return self.written + (len(self.buffer[self.columns[0][0]]) if self.buffer else 0)
+
+    def __iter__(self):
+        return iter(self.to_frame().to_dict("records"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # === Схема
+
+    def _init_schema(self, kinds):
+        self.columns = list(kinds.items())
+        self.buffer = {name: [] for name, _ in self.columns}
+        self.categories = {name: {} for name, kind in self.columns if kind == "category"}
+        schema = {"columns": [{"name": name, "kind": kind} for name, kind in self.columns]}
+        with open(self.directory / SCHEMA_FILE, "w", encoding="utf-8") as f:
+            json.dump(schema, f, ensure_ascii=False)
+        for i in range(len(self.columns)):
+            (self.directory / f"col{i}.bin").touch()
+
+    def _category_code(self, i, name, value):
+        value = "" if value is None else str(value)
+        codes = self.categories[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            # Словарь дописывается до строк, которые на него ссылаются
+            with open(self.directory / f"col{i}.txt", "a", encoding="utf-8") as f:
+                f.write(json.dumps(value, ensure_ascii=False) + "\n")
+        return code
+
+    # === Запись
+
+    def append(self, record):
+        if self.columns is None:
+            self._init_schema({name: _kind_of(value) for name, value in record.items()})
+        unknown = set(record) - set(self.buffer)
+        if unknown:
+            raise ValueError(f"Поля не из схемы потока: {sorted(unknown)}")
+
+        for i, (name, kind) in enumerate(self.columns):
+            value = record.get(name)
+            if kind == "category":
+                value = self._category_code(i, name, value)
+            elif kind == "datetime":
+                value = pd.Timestamp(value).value if value is not None else np.iinfo(np.int64).min
+            elif value is None:
+                value = np.nan if kind == "float" else False
+            self.buffer[name].append(value)
+
+        if len(self.buffer[self.columns[0][0]]) >= self.batch_size:
+            self.flush()
+
+    def write_columns(self, **arrays):
+        """Пачка колонок (numpy-массивы одной длины) сразу в файлы, минуя буфер записей."""
+        if self.columns is None:
+            kinds = {
+                name: "datetime" if np.issubdtype(np.asarray(a).dtype, np.datetime64) else
+                      "bool" if np.asarray(a).dtype == np.bool_ else "float"
+                for name, a in arrays.items()
+            }
+            self._init_schema(kinds)
+        self.flush()
+        self._write({name: np.asarray(arrays[name]) for name, _ in self.columns})
+
+    def flush(self):
+        if not self.buffer or not self.buffer[self.columns[0][0]]:
+            return 0
+        batch = {name: self.buffer[name] for name, _ in self.columns}
+        self.buffer = {name: [] for name, _ in self.columns}
+        return self._write(batch)
+
+    def _write(self, batch):
+        n = None
+        for i, (name, kind) in enumerate(self.columns):
+            values = np.asarray(batch[name])
+            if kind == "datetime" and np.issubdtype(values.dtype, np.datetime64):
+                values = values.astype("datetime64[ns]").view(np.int64)
+            values = values.astype(_KIND_DTYPES[kind], copy=False)
+            n = len(values)
+            with open(self.directory / f"col{i}.bin", "ab") as f:
+                values.tofile(f)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        self.written += n
+        return n
+
+    def close(self):
+        self.flush()
+
+    # === Чтение
+
+    def to_frame(self):
+        self.flush()
+        return read_stream(self.directory)
+
+
+def read_stream(directory):
+    """
+    Поток StreamSink → DataFrame. Работает и по папке прерванного прогона:
+    строк столько, сколько полностью записано во всех колонках.
+    """
+    directory = Path(directory)
+    schema_path = directory / SCHEMA_FILE
+    if not schema_path.exists():
+        return pd.DataFrame()
+    with open(schema_path, encoding="utf-8") as f:
+        columns = [(c["name"], c["kind"]) for c in json.load(f)["columns"]]
+
+    sizes = [(directory / f"col{i}.bin").stat().st_size // _KIND_DTYPES[kind].itemsize
+             for i, (_, kind) in enumerate(columns)]
+    n = min(sizes) if sizes else 0
+
+    data = {}
+    for i, (name, kind) in enumerate(columns):
+        values = np.fromfile(directory / f"col{i}.bin", dtype=_KIND_DTYPES[kind], count=n)
+        if kind == "datetime":
+            values = pd.to_datetime(values.view("datetime64[ns]"))
+        elif kind == "category":
+            path = directory / f"col{i}.txt"
+            lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+            labels = [json.loads(line) for line in lines]
+            values = pd.Categorical.from_codes(values, categories=pd.Index(labels)) if labels else values.astype(str)
+            values = np.asarray(values, dtype=object)
+        data[name] = values
+    return pd.DataFrame(data)
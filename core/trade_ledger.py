@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+SIDE_LONG = 1
+SIDE_SHORT = -1
+
+TRADE_LEDGER_DTYPE = np.dtype([
+    ("entry_ts", np.int64),        # время исполнения входа, нс epoch
+    ("exit_ts", np.int64),         # время исполнения выхода, нс epoch
+    ("side", np.int8),             # SIDE_LONG / SIDE_SHORT
+    ("entry_price", np.float64),   # цена исполнения (с проскальзыванием)
+    ("exit_price", np.float64),
+    ("size", np.float64),
+    ("pnl", np.float64),
+    ("pnl_comm", np.float64),
+    ("fees", np.float64),          # комиссия входа + выхода
+    ("slippage", np.float64),      # потери на проскальзывании относительно open бара исполнения
+    ("entry_rsi", np.float64),     # снимки индикаторов на сигнальных барах
+    ("exit_rsi", np.float64),
+    ("entry_atr", np.float64),
+    ("exit_atr", np.float64),
+    ("entry_reason", np.int16),    # коды причин, строки — в TradeLedger.reasons
+    ("exit_reason", np.int16),
+])
+
+# Колонки trades_full.csv: прежний набор + side / fees / slippage
+TRADE_FRAME_COLUMNS = [
+    "entry_datetime", "entry_price", "exit_datetime", "exit_price", "size",
+    "pnl", "pnl_comm", "entry_reason", "exit_reason", "entry_rsi", "exit_rsi",
+    "entry_atr", "exit_atr", "strategy_id", "symbol", "timeframe", "duration_sec",
+    "side", "fees", "slippage",
+]
+
+
+class TradeLedger:
+    """
+    Журнал закрытых сделок прогона — структурированный массив TRADE_LEDGER_DTYPE.
+    Стратегия пишет строку на сделку (из notify_trade), ёмкость удваивается при заполнении.
+    Причины входа / выхода хранятся кодами, таблица строк — self.reasons.
+    """
+
+    def __init__(self, capacity=64):
+        self.rows = np.zeros(max(int(capacity), 1), dtype=TRADE_LEDGER_DTYPE)
+        self.size = 0
+        self.reasons = []
+        self._reason_codes = {}
+
+    def reason_code(self, reason):
+        reason = reason or ""
+        code = self._reason_codes.get(reason)
+        if code is None:
+            code = self._reason_codes[reason] = len(self.reasons)
+            self.reasons.append(reason)
+        return code
+
+    def append(self, entry_reason="", exit_reason="", **fields):
+        """Одна закрытая сделка: поля TRADE_LEDGER_DTYPE, причины — строками."""
+        if self.size == len(self.rows):
+            grown = np.zeros(2 * len(self.rows), dtype=TRADE_LEDGER_DTYPE)
+            grown[:self.size] = self.rows
+            self.rows = grown
+
+        row = self.rows[self.size]
+        for name, value in fields.items():
+            row[name] = value
+        row["entry_reason"] = self.reason_code(entry_reason)
+        row["exit_reason"] = self.reason_code(exit_reason)
+        self.size += 1
+
+    def to_array(self):
+        return self.rows[:self.size]
+
+    def to_frame(self, strategy_id="", symbol="", timeframe=""):
+        return trades_frame(self.to_array(), self.reasons, strategy_id, symbol, timeframe)
+
+
+def trades_frame(trades, reasons, strategy_id="", symbol="", timeframe=""):
+    """Журнал сделок в формате trades_full.csv (колонки TRADE_FRAME_COLUMNS)."""
+    reasons = np.asarray(reasons if len(reasons) else [""], dtype=object)
+    frame = pd.DataFrame({
+        "entry_datetime": pd.to_datetime(trades["entry_ts"]),
+        "entry_price": trades["entry_price"],
+        "exit_datetime": pd.to_datetime(trades["exit_ts"]),
+        "exit_price": trades["exit_price"],
+        "size": trades["size"],
+        "pnl": trades["pnl"],
+        "pnl_comm": trades["pnl_comm"],
+        "entry_reason": reasons[trades["entry_reason"]],
+        "exit_reason": reasons[trades["exit_reason"]],
+        "entry_rsi": trades["entry_rsi"],
+        "exit_rsi": trades["exit_rsi"],
+        "entry_atr": trades["entry_atr"],
+        "exit_atr": trades["exit_atr"],
+        "strategy_id": strategy_id,
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "duration_sec": (trades["exit_ts"] - trades["entry_ts"]) / 1e9,
+        "side": trades["side"],
+        "fees": trades["fees"],
+        "slippage": trades["slippage"],
+    }, columns=TRADE_FRAME_COLUMNS)
+    return frame
+
+
+def trade_stats(trades):
+    """
+    Агрегаты по журналу сделок одним проходом NumPy по колонкам
+    (вместо фильтрации DataFrame на каждый показатель).
+    Пустой журнал — None.
+    """
+    n = len(trades)
+    if n == 0:
+        return None
+
+    pnl = trades["pnl"]
+    duration = (trades["exit_ts"] - trades["entry_ts"]) / 1e9
+    profit_sum = pnl[pnl > 0].sum()
+    loss_sum = -pnl[pnl < 0].sum()
+
+    return {
+        "total_closed": n,
+        "avg_pnl": pnl.mean(),
+        "avg_pnl_comm": trades["pnl_comm"].mean(),
+        "avg_size": trades["size"].mean(),
+        "win_rate": np.count_nonzero(pnl > 0) / n,
+        "loss_rate": np.count_nonzero(pnl < 0) / n,
+        "profit_factor": profit_sum / loss_sum if loss_sum > 0 else float("inf"),
+        "duration_avg_sec": duration.mean(),
+        "duration_max_sec": duration.max(),
+        "duration_min_sec": duration.min(),
+        "total_fees": trades["fees"].sum(),
+        "total_slippage": trades["slippage"].sum(),
+    }
+
+
+def closed_trade_metrics(trades):
+    """
+    Total / Winning / Losing / Net_PnL / средние выигрыша и проигрыша для metrics.csv —
+    по журналу закрытых сделок, с правилами TradeAnalyzer (выигрыш — pnl_comm >= 0).
+    Пустой журнал (нет сделок, прогон остановлен pruning с открытой позицией) — нули.
+    """
+    pnl_comm = trades["pnl_comm"]
+    won = pnl_comm >= 0
+    n_won = int(np.count_nonzero(won))
+    n_lost = len(trades) - n_won
+    return {
+        "Total_trades": len(trades),
+        "Winning_trades": n_won,
+        "Losing_trades": n_lost,
+        "Net_PnL": round(float(pnl_comm.sum()), 2),
+        "Average_Win_pnl": round(float(pnl_comm[won].sum()) / n_won, 2) if n_won else 0,
+        "Average_Loss_pnl": round(float(pnl_comm[~won].sum()) / n_lost, 2) if n_lost else 0,
+    }
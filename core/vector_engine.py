@@ -0,0 +1,478 @@
+import numpy as np
+import pandas as pd
+
+from .exit_engine import (
+    EXIT_REASON_SIGNAL,
+    EXIT_REASON_TRAIL,
+    ExitLedger,
+    LevelCheck,
+    compile_exit_levels,
+    level_mask,
+    compute_exit_indicator,
+    exit_indicator_keys,
+    stack_compiled_exits,
+)
+from .indicator_engine import rsi_wilder, atr_wilder
+from .param_grid import params_hash
+from .pruning import PRUNE_REASONS, STATUS_COMPLETED, STATUS_PRUNED, PruningRules
+
+def build_indicator_cache(df, param_grid, cache=None):
+    """
+    Считает индикаторы один раз на каждый уникальный период из сетки.
+    Возвращает (и дополняет) словарь:
+    {
+        ("rsi", 14): ndarray,
+        ("atr", 14): ndarray,
+        ("ema", 21): ndarray,   # если нужна уровням take_profit
+        ...
+    }
+    """
+    cache = {} if cache is None else cache
+
+    for params in param_grid:
+        rsi_key = ("rsi", params.get("rsi_period", 14))
+        if rsi_key not in cache:
+            cache[rsi_key] = rsi_wilder(df["close"].to_numpy(), rsi_key[1])
+
+        atr_key = ("atr", params.get("atr_period", 14))
+        if atr_key not in cache:
+            cache[atr_key] = atr_wilder(
+                df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), atr_key[1]
+            )
+
+        # EMA / KAMA для уровней take_profit
+        for key in exit_indicator_keys(params.get("take_profit")):
+            if key not in cache:
+                cache[key] = compute_exit_indicator(key, df["close"].to_numpy())
+
+    return cache
+
+
+def _stack_indicator(cache, name, periods):
+    """
+    Собирает матрицу (бары × уникальные периоды) и индекс периода для каждой комбинации,
+    чтобы не держать в памяти матрицу (комбинации × бары) для каждого индикатора.
+    """
+    unique = sorted(set(periods))
+    matrix = np.column_stack([cache[(name, p)] for p in unique])
+    index = np.searchsorted(unique, periods)
+    return matrix, index
+
+
+def _compile_grid_exits(param_grid, close, indicators, rsi_exit=70):
+    """
+    Компилирует take_profit один раз на уникальную пару (take_profit, atr_period)
+    и возвращает склеенные массивы плюс индекс конфига для каждой комбинации.
+    """
+    configs = {}
+    compiled = []
+    config_idx = np.empty(len(param_grid), dtype=np.int64)
+
+    for c, params in enumerate(param_grid):
+        take_profit = params.get("take_profit") or {}
+        atr_key = ("atr", params.get("atr_period", 14))
+        key = (params_hash(take_profit), atr_key[1])
+        if key not in configs:
+            configs[key] = len(compiled)
+            compiled.append(compile_exit_levels(take_profit, close, indicators[atr_key], indicators, rsi_exit))
+        config_idx[c] = configs[key]
+
+    kinds, thresholds, percents = stack_compiled_exits(compiled)
+    return kinds, thresholds, percents, config_idx, compiled
+
+
+def run_vectorized(
+    df,
+    param_grid,
+    initial_cash=100000,
+    commission=0.00055,
+    slippage=0.0005,
+    indicators=None,
+    strategy_ids=None,
+    symbol="",
+    timeframe="",
+    run_id="",
+    rsi_entry=30,
+    rsi_exit=70,
+    keep_curves=True,
+    pruning=None,
+):
+    """
+    Прогоняет логику SuperStrategy для всех комбинаций сетки за один проход по барам.
+    Состояние (кэш, позиция, цена входа) хранится векторами длины N комбинаций,
+    поэтому 1000 комбинаций — это одна программа над массивами, а не 1000 Cerebro.
+
+    Выходы take_profit (atr / chandelier / ema_cross / kama_cross) компилируются
+    заранее (core.exit_engine.compile_exit_levels) — на баре остаются только сравнения.
+    В режиме "partial" каждый уровень срабатывает один раз за позицию и продаёт
+    percent от размера входа; после первого частичного выхода остаток ведётся
+    трейлинг-стопом (take_profit["trail"]). Состояние автомата и проверки уровней
+    (core.exit_engine.LevelCheck), а также выборки RSI / ATR бара пишутся в заранее
+    выделенные массивы (комбинации × уровни) через out=; на баре аллоцируются только
+    маски сигналов длины N и выборки тех комбинаций, у которых есть исполнение.
+
+    pruning (core.pruning.PruningRules или словарь его аргументов) — досрочная
+    остановка безнадёжных комбинаций: сработавшая комбинация замораживается
+    с текущей equity, а её строки выбрасываются из всех векторов состояния,
+    так что дальше бары считаются только по живым комбинациям. В метрики
+    добавляются Status / Prune_reason / Bars_run.
+
+    Семантика исполнения повторяет backtrader:
+    - сигнал на закрытии бара, рыночный ордер исполняется по open следующего бара;
+    - проскальзывание в процентах, не выходит за high / low бара;
+    - комиссия в долях от объёма сделки, размер позиции — 1 единица.
+
+    Возвращает словарь:
+    {
+        "metrics": DataFrame (строка на комбинацию, колонки как в metrics.csv),
+        "equity": ndarray (комбинации × бары) или None,
+        "position": ndarray (комбинации × бары) или None,
+        "exits": DataFrame (строка на каждое исполнение выхода, включая частичные),
+    }
+    """
+    n_combos = len(param_grid)
+    index = df.index
+    open_ = df["open"].to_numpy(dtype=float)
+    high = df["high"].to_numpy(dtype=float)
+    low = df["low"].to_numpy(dtype=float)
+    close = df["close"].to_numpy(dtype=float)
+    ts_sec = index.asi8 // 10**9 if isinstance(index, pd.DatetimeIndex) else np.arange(len(df))
+    n_bars = len(close)
+
+    indicators = build_indicator_cache(df, param_grid, indicators)
+    rsi_periods = [p.get("rsi_period", 14) for p in param_grid]
+    atr_periods = [p.get("atr_period", 14) for p in param_grid]
+    rsi_matrix, rsi_idx = _stack_indicator(indicators, "rsi", rsi_periods)
+    atr_matrix, atr_idx = _stack_indicator(indicators, "atr", atr_periods)
+    exit_kinds, exit_thresholds, exit_percents, exit_idx, compiled = _compile_grid_exits(
+        param_grid, close, indicators, rsi_exit
+    )
+    combo_exit_kinds = exit_kinds[exit_idx]
+    combo_percents = exit_percents[exit_idx]
+    n_levels = combo_exit_kinds.shape[1]
+    partial = np.array([compiled[k].partial for k in exit_idx], dtype=bool)
+    full = ~partial
+    trail_mult = np.array([compiled[k].trail_mult for k in exit_idx])
+    any_partial = bool(partial.any())
+    combo_exit_idx = exit_idx
+    rules = PruningRules.from_config(pruning)
+
+    # === Состояние (векторы по живым комбинациям; slots — их номера в сетке)
+    slots = np.arange(n_combos)
+    cash = np.full(n_combos, float(initial_cash))
+    position = np.zeros(n_combos)
+    entry_price = np.zeros(n_combos)
+    entry_comm = np.zeros(n_combos)
+    entry_size = np.ones(n_combos)
+    entry_bar = np.zeros(n_combos, dtype=np.int64)
+    highest_close = np.full(n_combos, -np.inf)
+    pending = np.zeros(n_combos, dtype=np.int8)  # 1 — buy, -1 — sell
+    sell_size = np.zeros(n_combos)
+    sell_level = np.zeros(n_combos, dtype=np.int8)
+    sell_mask = np.zeros(n_combos, dtype=np.int64)   # уровни take_profit ордера (биты)
+    trade_pnl = np.zeros(n_combos)       # PnL позиции, накопленный по частичным выходам
+    trade_pnl_comm = np.zeros(n_combos)
+    n_entries = np.zeros(n_combos, dtype=np.int64)
+    peak = np.full(n_combos, float(initial_cash))
+
+    # === Автомат частичных выходов
+    fired = np.zeros(combo_exit_kinds.shape, dtype=bool)
+    levels = LevelCheck(combo_exit_kinds)
+    rsi = np.empty(n_combos)
+    atr = np.empty(n_combos)
+    trailing = np.zeros(n_combos, dtype=bool)
+    ledger = ExitLedger(capacity=n_combos * 16)
+
+    # === Агрегаты сделок и итог (по всей сетке, индексируются через slots)
+    final_value = np.zeros(n_combos)
+    prune_reason = np.zeros(n_combos, dtype=np.int8)
+    bars_run = np.full(n_combos, n_bars, dtype=np.int64)
+    n_trades = np.zeros(n_combos, dtype=np.int64)
+    n_won = np.zeros(n_combos, dtype=np.int64)
+    sum_won = np.zeros(n_combos)
+    sum_lost = np.zeros(n_combos)
+    gross_profit = np.zeros(n_combos)
+    gross_loss = np.zeros(n_combos)
+    n_gross_win = np.zeros(n_combos, dtype=np.int64)
+    n_gross_loss = np.zeros(n_combos, dtype=np.int64)
+    sum_size = np.zeros(n_combos)
+    sum_pnl_comm = np.zeros(n_combos)
+    dur_sum = np.zeros(n_combos)
+    dur_max = np.full(n_combos, -np.inf)
+    dur_min = np.full(n_combos, np.inf)
+
+    equity = np.full((n_combos, n_bars), float(initial_cash)) if keep_curves else None
+    positions = np.zeros((n_combos, n_bars)) if keep_curves else None
+
+    for i in range(n_bars):
+        # === 1. Исполнение ордеров прошлого бара по open
+        buys = pending == 1
+        if buys.any():
+            fill = min(open_[i] * (1 + slippage), high[i])
+            comm = fill * commission
+            cash[buys] -= fill + comm
+            position[buys] = 1.0
+            entry_price[buys] = fill
+            entry_comm[buys] = comm
+            entry_bar[buys] = i
+            highest_close[buys] = -np.inf
+            n_entries[buys] += 1
+
+        sells = pending == -1
+        if sells.any():
+            fill = max(open_[i] * (1 - slippage), low[i])
+            # Частичные уровни, сработавшие на одном баре, — по исполнению (строке журнала) на уровень
+            batches = []
+            whole = sells
+            if any_partial:
+                scaling = sells & partial & (sell_level >= 0)
+                if scaling.any():
+                    whole = sells & ~scaling
+                    for j in range(n_levels):
+                        part = scaling & ((sell_mask >> j) & 1).astype(bool)
+                        if part.any():
+                            batches.append((part, entry_size[part] * combo_percents[part, j], j, 1 << j))
+            if whole.any():
+                batches.append((whole, sell_size[whole], sell_level[whole], sell_mask[whole]))
+
+            for rows, size, level, mask in batches:
+                size = np.minimum(size, position[rows])
+                comm = fill * size * commission
+                cash[rows] += fill * size - comm
+
+                # Комиссия входа делится между частями пропорционально проданному размеру
+                pnl = (fill - entry_price[rows]) * size
+                pnl_comm = pnl - entry_comm[rows] * (size / entry_size[rows]) - comm
+                trade_pnl[rows] += pnl
+                trade_pnl_comm[rows] += pnl_comm
+                position[rows] -= size
+                ledger.append(
+                    slots[rows], entry_bar[rows], i, entry_price[rows], fill,
+                    size, pnl, pnl_comm, level, mask,
+                )
+            trailing[sells] = True
+
+            # Сделка (как Trade в backtrader) закрывается, когда позиция вернулась в ноль
+            closed = sells & (position <= 1e-12)
+            if closed.any():
+                pnl = trade_pnl[closed]
+                pnl_comm = trade_pnl_comm[closed]
+                duration = (ts_sec[i] - ts_sec[entry_bar[closed]]).astype(float)
+                done = slots[closed]
+
+                n_trades[done] += 1
+                n_won[done] += pnl_comm >= 0
+                sum_won[done] += np.where(pnl_comm >= 0, pnl_comm, 0.0)
+                sum_lost[done] += np.where(pnl_comm < 0, pnl_comm, 0.0)
+                gross_profit[done] += np.where(pnl > 0, pnl, 0.0)
+                gross_loss[done] += np.where(pnl < 0, -pnl, 0.0)
+                n_gross_win[done] += pnl > 0
+                n_gross_loss[done] += pnl < 0
+                sum_size[done] += entry_size[closed]
+                sum_pnl_comm[done] += pnl_comm
+                dur_sum[done] += duration
+                dur_max[done] = np.maximum(dur_max[done], duration)
+                dur_min[done] = np.minimum(dur_min[done], duration)
+
+                position[closed] = 0.0
+                trade_pnl[closed] = 0.0
+                trade_pnl_comm[closed] = 0.0
+                fired[closed] = False
+                trailing[closed] = False
+        pending[:] = 0
+
+        # === 2. Оценка портфеля на закрытии
+        np.maximum(highest_close, close[i], out=highest_close, where=position > 0)
+        if keep_curves or rules is not None:
+            value = cash + position * close[i]
+        if keep_curves:
+            equity[slots, i] = value
+            positions[slots, i] = position
+
+        # === 2a. Досрочная остановка: замораживаем и выкидываем из состояния
+        if rules is not None:
+            np.maximum(peak, value, out=peak)
+            reason = rules.check(i + 1, value, peak, initial_cash, n_entries)
+            dead = reason > 0
+            if dead.any():
+                gone = slots[dead]
+                final_value[gone] = value[dead]
+                prune_reason[gone] = reason[dead]
+                bars_run[gone] = i + 1
+                if keep_curves:
+                    equity[gone, i + 1:] = value[dead][:, None]
+                    positions[gone, i + 1:] = position[dead][:, None]
+
+                keep = ~dead
+                (
+                    slots, cash, position, entry_price, entry_comm, entry_size, entry_bar,
+                    highest_close, pending, sell_size, sell_level, sell_mask, trade_pnl, trade_pnl_comm,
+                    n_entries, peak, fired, trailing, rsi_idx, atr_idx,
+                    combo_exit_idx, combo_exit_kinds, combo_percents, partial, full, trail_mult,
+                ) = (
+                    a[keep] for a in (
+                        slots, cash, position, entry_price, entry_comm, entry_size, entry_bar,
+                        highest_close, pending, sell_size, sell_level, sell_mask, trade_pnl, trade_pnl_comm,
+                        n_entries, peak, fired, trailing, rsi_idx, atr_idx,
+                        combo_exit_idx, combo_exit_kinds, combo_percents, partial, full, trail_mult,
+                    )
+                )
+                if not len(slots):
+                    break
+                # буферы бара — под новое число живых комбинаций
+                levels = LevelCheck(combo_exit_kinds)
+                rsi = np.empty(len(slots))
+                atr = np.empty(len(slots))
+
+        # === 3. Сигналы на закрытии бара
+        np.take(rsi_matrix[i], rsi_idx, out=rsi)
+        np.take(atr_matrix[i], atr_idx, out=atr)
+        # Как next() в backtrader: торгуем только когда оба индикатора прогреты.
+        # Для окна, вырезанного из полной истории, прогрев уже пройден.
+        active = ~np.isnan(rsi) & ~np.isnan(atr)
+        flat = position == 0
+
+        enter = active & flat & (rsi < rsi_entry)
+        in_position = active & ~flat
+        signal_exit = rsi > rsi_exit
+        thresholds = levels.gather(exit_thresholds[i], combo_exit_idx)
+        hits = levels.level_hits(thresholds, entry_price, highest_close)
+        take_profit = levels.any_level(hits)
+        take_profit &= full
+        leave = in_position & (signal_exit | take_profit)
+        take_profit_exit = leave & take_profit
+        if take_profit_exit.any():
+            # Полный выход по нескольким уровням сразу — все они в маске (причины через "; ")
+            sell_level[take_profit_exit] = np.argmax(hits[take_profit_exit], axis=1)
+            sell_mask[take_profit_exit] = level_mask(hits[take_profit_exit])
+
+        pending[enter] = 1
+
+        if any_partial:
+            # Уровни, ещё не сработавшие в этой позиции; после первого выхода — трейлинг остатка
+            hits &= partial[:, None]
+            new_hits, scale = levels.partial_step(hits, fired, combo_percents)
+            trail = levels.trail_hits(close[i], entry_price, highest_close, atr, trail_mult)
+            trail &= trailing
+            leave |= in_position & trail
+            scale_out = in_position & ~leave & (scale > 0)
+
+            if scale_out.any():
+                # Размер каждой части — entry_size × percent уровня, считается при исполнении
+                sell_level[scale_out] = np.argmax(new_hits[scale_out], axis=1)
+                sell_mask[scale_out] = level_mask(new_hits[scale_out])
+            pending[scale_out] = -1
+            levels.mark_fired(fired, scale_out)
+            sell_level[leave & trail] = EXIT_REASON_TRAIL
+            sell_mask[leave & trail] = 0
+
+        sell_level[leave & signal_exit] = EXIT_REASON_SIGNAL
+        sell_mask[leave & signal_exit] = 0
+        sell_size[leave] = position[leave]
+        pending[leave] = -1
+
+    final_value[slots] = cash + position * close[-1] if n_bars else cash
+    metrics = _collect_metrics(
+        initial_cash, final_value, n_trades, n_won, sum_won, sum_lost,
+        gross_profit, gross_loss, n_gross_win, n_gross_loss,
+        sum_size, sum_pnl_comm, dur_sum, dur_max, dur_min,
+    )
+    metrics.insert(0, "strategy_id", strategy_ids if strategy_ids is not None else [""] * n_combos)
+    metrics.insert(1, "run_id", run_id)
+    metrics.insert(2, "symbol", symbol)
+    metrics.insert(3, "timeframe", timeframe)
+    if rules is not None:
+        metrics["Status"] = np.where(prune_reason > 0, STATUS_PRUNED, STATUS_COMPLETED)
+        metrics["Prune_reason"] = [PRUNE_REASONS[r] for r in prune_reason.tolist()]
+        metrics["Bars_run"] = bars_run
+
+    return {
+        "metrics": metrics,
+        "equity": equity,
+        "position": positions,
+        "exits": _exits_frame(ledger.to_array(), index, exit_idx, compiled, strategy_ids),
+    }
+
+
+def iter_vectorized(df, param_grid, chunk_size=1000, strategy_ids=None, indicators=None, **kwargs):
+    """
+    run_vectorized по блокам из chunk_size комбинаций: матрицы кривых (комбинации × бары)
+    при keep_curves живут только внутри блока, память не растёт с размером сетки.
+    Индикаторы общие для всех блоков (считаются один раз на уникальный период).
+
+    Отдаёт (start, result): start — номер первой комбинации блока в param_grid;
+    в result["exits"]["combo"] и индексе метрик — номера комбинаций во всей сетке.
+    """
+    indicators = {} if indicators is None else indicators
+    for start in range(0, len(param_grid), chunk_size):
+        stop = start + chunk_size
+        result = run_vectorized(
+            df, param_grid[start:stop],
+            indicators=indicators,
+            strategy_ids=None if strategy_ids is None else strategy_ids[start:stop],
+            **kwargs,
+        )
+        result["metrics"].index += start
+        result["exits"]["combo"] += start
+        yield start, result
+
+
+def _exits_frame(rows, index, exit_idx, compiled, strategy_ids):
+    """Журнал выходов → DataFrame с датами и текстом причины."""
+    exits = pd.DataFrame(rows)
+    exits.insert(0, "strategy_id", np.asarray(strategy_ids, dtype=object)[rows["slot"]] if strategy_ids is not None else "")
+    exits.insert(3, "entry_datetime", index[rows["entry_bar"]])
+    exits.insert(5, "exit_datetime", index[rows["exit_bar"]])
+    config = exit_idx[rows["slot"]]
+    keys = list(zip(config.tolist(), rows["level"].tolist(), rows["level_mask"].tolist()))
+    reasons = {(k, level, mask): compiled[k].reason(level, mask) for k, level, mask in set(keys)}
+    exits["reason"] = [reasons[key] for key in keys]
+    return exits.rename(columns={"slot": "combo"})
+
+
+def _collect_metrics(
+    initial_cash, final_value, n_trades, n_won, sum_won, sum_lost,
+    gross_profit, gross_loss, n_gross_win, n_gross_loss,
+    sum_size, sum_pnl_comm, dur_sum, dur_max, dur_min,
+):
+    """Метрики в формате metrics.csv из backtest_runner, посчитанные по всем комбинациям сразу."""
+    n_lost = n_trades - n_won
+    has_trades = n_trades > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_win = np.where(n_won > 0, sum_won / n_won, 0.0)
+        avg_loss = np.where(n_lost > 0, sum_lost / n_lost, 0.0)
+        win_rate = n_gross_win / n_trades
+        loss_rate = n_gross_loss / n_trades
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.inf)
+        avg_size = sum_size / n_trades
+        avg_pnl_comm = sum_pnl_comm / n_trades
+        dur_avg = dur_sum / n_trades
+
+    metrics = pd.DataFrame({
+        "Initial_portfolio_value": initial_cash,
+        "Final_portfolio_value": np.round(final_value, 2),
+        "Final_portfolio_growth_percent": np.round((final_value - initial_cash) / initial_cash * 100, 2),
+        "Total_trades": n_trades,
+        "Winning_trades": n_won,
+        "Losing_trades": n_lost,
+        "Net_PnL": np.round(sum_won + sum_lost, 2),
+        "Average_Win_pnl": np.round(avg_win, 2),
+        "Average_Loss_pnl": np.round(avg_loss, 2),
+        "Win_rate": np.round(win_rate, 4),
+        "Loss_rate": np.round(loss_rate, 4),
+        "Profit_factor": np.round(profit_factor, 4),
+        "Avg_trade_size": np.round(avg_size, 2),
+        "Avg_pnl_comm": np.round(avg_pnl_comm, 2),
+        "Duration_avg_sec": np.round(dur_avg, 2),
+        "Duration_max_sec": np.round(dur_max, 2),
+        "Duration_min_sec": np.round(dur_min, 2),
+    })
+
+    # Как и в backtest_runner: метрики по сделкам только если сделки были
+    trade_cols = [
+        "Win_rate", "Loss_rate", "Profit_factor", "Avg_trade_size",
+        "Avg_pnl_comm", "Duration_avg_sec", "Duration_max_sec", "Duration_min_sec",
+    ]
+    metrics.loc[~has_trades, trade_cols] = np.nan
+    return metrics
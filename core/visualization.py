@@ -1,7 +1,28 @@
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def plot_strategy_chart(df, entry_log, exit_log, indicators, save_path):
+from .downsample import aggregate_ohlc, downsample_series, marker_positions
+
+def plot_strategy_chart(df, entry_log, exit_log, indicators, save_path, max_points=None):
+    """
+    max_points — бюджет точек на ряд: свечи склеиваются в max_points корзин,
+    линии индикаторов прореживаются LTTB и рисуются через WebGL (Scattergl).
+    Маркеры входов / выходов не прореживаются, а бары сделок остаются в линиях,
+    так что размер HTML и время отрисовки не растут с длиной истории.
+    None — как раньше, все точки.
+    save_path=None — HTML не пишется (фигуру забирает core.report_bundle); фигура возвращается всегда.
+    """
+    downsample = max_points is not None and len(df) > max_points
+    line_trace = go.Scattergl if downsample else go.Scatter
+    if downsample:
+        keep = np.union1d(
+            marker_positions(df.index, [e["timestamp"] for e in entry_log or []]),
+            marker_positions(df.index, [e["timestamp"] for e in exit_log or []])
+        )
+        indicators = {name: downsample_series(df.index, series, max_points, keep=keep) for name, series in indicators.items()}
+        df = aggregate_ohlc(df, max_points)
+
     num_indicators = len(indicators)
     total_rows = 1 + num_indicators  # 1 row for candles + N for indicators
 
@@ -46,8 +67,8 @@ def plot_strategy_chart(df, entry_log, exit_log, indicators, save_path):
 
     # === Индикаторы ===
     for i, (name, series) in enumerate(indicators.items()):
-        fig.add_trace(go.Scatter(
-            x=df.index,
+        fig.add_trace(line_trace(
+            x=series.index if downsample else df.index,
             y=series,
             mode="lines",
             name=name,
@@ -66,4 +87,6 @@ def plot_strategy_chart(df, entry_log, exit_log, indicators, save_path):
         paper_bgcolor="white"
     )
 
-    fig.write_html(str(save_path))
+    if save_path is not None:
+        fig.write_html(str(save_path))
+    return fig
@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .vector_engine import build_indicator_cache, run_vectorized
+
+
+def make_folds(n_bars, n_folds, train_bars=None, test_bars=None, anchored=False):
+    """
+    Делит историю из n_bars баров на n_folds пар (train, test), идущих друг за другом:
+    test-окна не пересекаются и покрывают конец истории.
+
+    anchored=False — скользящее окно фиксированной длины train_bars;
+    anchored=True  — train всегда начинается с первого бара и растёт.
+    По умолчанию test_bars = n_bars // (n_folds + 3), train_bars = 3 × test_bars.
+
+    Возвращает список словарей с границами срезов [start, end):
+    [{"fold": 0, "train_start": 0, "train_end": 300, "test_start": 300, "test_end": 400}, ...]
+    """
+    if test_bars is None:
+        test_bars = n_bars // (n_folds + 3)
+    if train_bars is None:
+        train_bars = 3 * test_bars
+    if test_bars <= 0 or train_bars + n_folds * test_bars > n_bars:
+        raise ValueError(
+            f"Недостаточно баров ({n_bars}) для {n_folds} фолдов: train={train_bars}, test={test_bars}"
+        )
+
+    first_test = n_bars - n_folds * test_bars
+    folds = []
+    for k in range(n_folds):
+        test_start = first_test + k * test_bars
+        folds.append({
+            "fold": k,
+            "train_start": 0 if anchored else test_start - train_bars,
+            "train_end": test_start,
+            "test_start": test_start,
+            "test_end": test_start + test_bars,
+        })
+    return folds
+
+
+def _slice_cache(indicators, start, end):
+    return {key: values[start:end] for key, values in indicators.items()}
+
+
+def _run_fold(df, indicators, param_grid, fold, metric, engine_kwargs):
+    """
+    Один фолд: оптимизация на train по всей сетке (один векторный прогон),
+    затем лучшая комбинация на test. Индикаторы приходят уже посчитанными
+    на полной истории — здесь только срезы.
+    """
+    train = slice(fold["train_start"], fold["train_end"])
+    test = slice(fold["test_start"], fold["test_end"])
+
+    in_sample = run_vectorized(
+        df.iloc[train], param_grid,
+        indicators=_slice_cache(indicators, train.start, train.stop),
+        keep_curves=False, **engine_kwargs
+    )["metrics"]
+    scores = in_sample[metric].astype(float).fillna(-np.inf).to_numpy()
+    best = int(np.argmax(scores))
+
+    out_of_sample = run_vectorized(
+        df.iloc[test], [param_grid[best]],
+        indicators=_slice_cache(indicators, test.start, test.stop),
+        keep_curves=True, **engine_kwargs
+    )
+
+    return {
+        **fold,
+        "best_index": best,
+        "best_params": param_grid[best],
+        "is_score": float(scores[best]),
+        "oos_metrics": out_of_sample["metrics"].iloc[0].to_dict(),
+        "oos_equity": out_of_sample["equity"][0],
+    }
+
+
+def walk_forward(
+    df,
+    param_grid,
+    n_folds=5,
+    train_bars=None,
+    test_bars=None,
+    anchored=False,
+    metric="Final_portfolio_growth_percent",
+    max_workers=None,
+    initial_cash=100000,
+    **engine_kwargs,
+):
+    """
+    Walk-forward оптимизация поверх векторного движка.
+
+    Индикаторы для всех периодов сетки считаются один раз на всей истории
+    (они причинные), фолды получают только срезы — пересекающиеся окна
+    ничего не пересчитывают. Фолды выполняются параллельно в пуле процессов
+    (max_workers=1 — последовательно, без пула).
+
+    OOS-кривые сшиваются по PnL: каждый следующий test-отрезок продолжает
+    equity с уровня, на котором закончился предыдущий (размер позиции фиксирован,
+    поэтому PnL аддитивен).
+
+    Возвращает словарь:
+    {
+        "folds": DataFrame (границы, лучшие параметры, IS-оценка, OOS-метрики по фолдам),
+        "equity": Series (сшитая OOS equity),
+        "summary": dict (итог по OOS),
+    }
+    """
+    indicators = build_indicator_cache(df, param_grid)
+    folds = make_folds(len(df), n_folds, train_bars, test_bars, anchored)
+    engine_kwargs = {"initial_cash": initial_cash, **engine_kwargs}
+
+    if max_workers == 1:
+        results = [_run_fold(df, indicators, param_grid, fold, metric, engine_kwargs) for fold in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_run_fold, df, indicators, param_grid, fold, metric, engine_kwargs)
+                for fold in folds
+            ]
+            results = [f.result() for f in futures]
+
+    # === Сшивка OOS equity
+    pieces = []
+    level = float(initial_cash)
+    for res in results:
+        pnl_curve = res["oos_equity"] - initial_cash
+        index = df.index[res["test_start"]:res["test_end"]]
+        pieces.append(pd.Series(level + pnl_curve, index=index))
+        level += pnl_curve[-1]
+    equity = pd.concat(pieces) if pieces else pd.Series(dtype=float)
+
+    rows = []
+    for res in results:
+        oos = res["oos_metrics"]
+        rows.append({
+            "fold": res["fold"],
+            "train_from": df.index[res["train_start"]],
+            "train_to": df.index[res["train_end"] - 1],
+            "test_from": df.index[res["test_start"]],
+            "test_to": df.index[res["test_end"] - 1],
+            "best_params": res["best_params"],
+            f"IS_{metric}": res["is_score"],
+            f"OOS_{metric}": oos.get(metric),
+            "OOS_Total_trades": oos.get("Total_trades"),
+            "OOS_Net_PnL": oos.get("Net_PnL"),
+        })
+
+    summary = {
+        "folds": len(results),
+        "Initial_portfolio_value": initial_cash,
+        "Final_portfolio_value": round(float(equity.iloc[-1]), 2) if len(equity) else initial_cash,
+        "OOS_growth_percent": round((float(equity.iloc[-1]) - initial_cash) / initial_cash * 100, 2) if len(equity) else 0.0,
+        "OOS_Total_trades": int(sum(res["oos_metrics"].get("Total_trades", 0) for res in results)),
+    }
+
+    return {"folds": pd.DataFrame(rows), "equity": equity.rename("equity"), "summary": summary}
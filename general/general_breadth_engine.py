@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Единый market-breadth: панель top-N монет читается один раз на ТФ, все
+зарегистрированные меры считаются векторно по всем монетам сразу:
+  rsi        — распределение RSI по корзинам 0-30 / 30-50 / 50-70 / 70-100 + средний RSI;
+  kama       — % монет выше KAMA;
+  kama_speed — % монет с быстрой / медленной адаптацией KAMA (SC выше / не выше медианы);
+  sma / ema  — % монет выше SMA / EMA;
+  highs_lows — % монет на новом N-барном максимуме / минимуме;
+  corr       — средняя скользящая корреляция / бета к BTC (из general_rolling_correlation).
+Новая мера — функция panel → DataFrame с декоратором @measure.
+
+Результат — market_breadth.json ({"meta", "data": {tf: [{"date", поля всех мер}]}});
+--legacy дополнительно пишет market_breadth_rsi.json / _kama.json / _kama_speed.json
+в прежнем формате отдельных скриптов. Окно RSI, как в general_rsi_market_breadth.py,
+отсчитывается от текущего момента UTC на 365.25 · years дней (без округления до полуночи),
+поэтому в RSI-ряду бывает на пару баров больше, чем у остальных мер; в общем файле
+он обрезается по окну.
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+from general_panel import DATA_FOLDER, load_panel, load_columns
+
+CORR_FILE        = "correlations_multi_tf.json"
+OUT_FILE         = "market_breadth.json"
+DEFAULT_TOP_N    = 30
+DEFAULT_DAYS     = 730
+
+OPTIMAL_RSI_PERIODS = {"4h": 14, "8h": 14, "12h": 16, "1d": 21}
+RSI_RANGES       = ["0-30", "30-50", "50-70", "70-100"]
+KAMA_CONFIG      = dict(period=10, fast=2, slow=30)
+MA_PERIOD        = 50
+HIGHS_LOWS_PERIOD = 55
+ROLLING_CORR     = dict(folder="rolling_correlation", base="BTCUSDT", window=30)
+
+MEASURES = {}
+
+
+def measure(name, legacy_file=None, legacy_meta=None, record=None):
+    """
+    Регистрация меры: fn(panel) → DataFrame (бары ≥ panel.start × поля меры).
+    legacy_file / legacy_meta / record — прежний отдельный JSON (формат строки record).
+    """
+    def register(fn):
+        MEASURES[name] = dict(fn=fn, legacy_file=legacy_file, legacy_meta=legacy_meta, record=record)
+        return fn
+    return register
+
+
+class Panel:
+    """
+    Панель одного ТФ: close / high / low (бары × монеты) на всей истории + граница окна start
+    (полночь) и legacy_start — граница прежнего RSI-скрипта (см. legacy_window_start).
+    """
+
+    def __init__(self, tf, frames, start, legacy_start=None, use_ema=False):
+        self.tf = tf
+        self.close = frames["close"]
+        self.high = frames.get("high")
+        self.low = frames.get("low")
+        self.start = start
+        self.legacy_start = start if legacy_start is None else legacy_start
+        self.use_ema = use_ema
+        self.has_bar = self.close.notna()
+        self.cache = {}
+
+    def memo(self, key, fn):
+        """Общие для нескольких мер промежуточные ряды (KAMA / SC) — считаются один раз."""
+        if key not in self.cache:
+            self.cache[key] = fn()
+        return self.cache[key]
+
+    def window(self, frame, start=None):
+        return frame.loc[frame.index >= (self.start if start is None else start)]
+
+
+# ---------- общие вычисления ----------
+def per_coin(frame: pd.DataFrame, fn):
+    """
+    fn по собственным барам каждой монеты: значения колонок сдвигаются вверх без NaN
+    (как отдельный ряд монеты), fn считается по всей сжатой панели сразу, результат
+    возвращается на исходные бары. Окна rolling / diff не перескакивают через пропуски
+    общей шкалы, а результат совпадает с расчётом по CSV монеты.
+    fn: DataFrame → DataFrame или кортеж DataFrame той же формы.
+    """
+    values = frame.to_numpy()
+    order = np.argsort(~np.isfinite(values), axis=0, kind="stable")
+    compact = pd.DataFrame(np.take_along_axis(values, order, axis=0), columns=frame.columns)
+    result = fn(compact)
+
+    def scatter(out):
+        restored = np.full(values.shape, np.nan)
+        np.put_along_axis(restored, order, out.to_numpy(dtype=np.float64), axis=0)
+        return pd.DataFrame(restored, index=frame.index, columns=frame.columns).where(frame.notna())
+
+    return tuple(scatter(out) for out in result) if isinstance(result, tuple) else scatter(result)
+
+
+def pct_true(flags: pd.DataFrame, valid: pd.DataFrame):
+    """% монет с флагом среди монет, у которых на баре есть значение."""
+    n_valid = valid.sum(axis=1)
+    return (flags.where(valid, False).sum(axis=1) / n_valid * 100).where(n_valid > 0, 0.0)
+
+
+def rsi_panel(close: pd.DataFrame, period: int, use_ema: bool):
+    delta = close.diff()
+    gain, loss = delta.clip(lower=0), -delta.clip(upper=0)
+    if use_ema:
+        gain, loss = gain.ewm(span=period, adjust=False).mean(), loss.ewm(span=period, adjust=False).mean()
+    else:
+        gain, loss = gain.rolling(period).mean(), loss.rolling(period).mean()
+    return 100 - 100 / (1 + gain / loss)
+
+
+def kama_sc_panel(close: pd.DataFrame, period: int, fast: int, slow: int):
+    """
+    KAMA и SC для всех монет: рекурсия идёт по барам, но каждый шаг — вектор по монетам.
+    Старт KAMA у каждой монеты — её period-й бар (как в general_kama_market_breadth).
+    Ждёт панель без пропусков внутри рядов монет — вызывать через per_coin.
+    """
+    direction = close.diff(period).abs()
+    volatility = close.diff().abs().rolling(period).sum()
+    er = (direction / volatility).fillna(0)
+    fast_sc, slow_sc = 2 / (fast + 1), 2 / (slow + 1)
+    sc = ((er * (fast_sc - slow_sc) + slow_sc) ** 2).where(close.notna())
+
+    price = close.to_numpy()
+    sc_values = sc.to_numpy()
+    seen = np.cumsum(np.isfinite(price), axis=0)
+    kama = np.full_like(price, np.nan)
+    current = np.full(price.shape[1], np.nan)
+    for i in range(len(price)):
+        p, s = price[i], sc_values[i]
+        step = np.isfinite(current) & np.isfinite(p)
+        current = np.where(step, current + s * (p - current), current)
+        current = np.where((seen[i] == period) & np.isfinite(p), p, current)
+        kama[i] = np.where(np.isfinite(p), current, np.nan)
+    return pd.DataFrame(kama, index=close.index, columns=close.columns), sc
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+# ---------- меры ----------
+def rsi_record(date, row):
+    return {
+        "date": date.tz_localize("UTC").isoformat() if date.tzinfo is None else date.isoformat(),
+        "distribution": {r: _round(row[r]) for r in RSI_RANGES},
+        "avg_rsi": _round(row["avg_rsi"]),
+    }
+
+
+@measure("rsi", legacy_file="market_breadth_rsi.json", record=rsi_record,
+         legacy_meta=lambda args: {
+             "source_correlation_file": args.corr_file,
+             "top_n_coins_per_tf": args.top_n,
+             "optimal_rsi_periods": OPTIMAL_RSI_PERIODS,
+             "rsi_method": "EMA" if args.use_ema else "SMA",
+             "rsi_ranges": RSI_RANGES,
+             "history_years": history_years(args.days),
+         })
+def rsi_breadth(panel: Panel):
+    period = OPTIMAL_RSI_PERIODS.get(panel.tf)
+    if not period:
+        return None
+    # RSI — по всей истории, в окно — только монеты, у которых история начинается до начала окна;
+    # граница — как в прежнем скрипте (legacy_start), чтобы market_breadth_rsi.json совпадал с ним
+    full_history = panel.close.apply(lambda s: s.first_valid_index()) <= panel.legacy_start
+    rsi = per_coin(panel.close, lambda c: rsi_panel(c, period, panel.use_ema))
+    rsi = panel.window(rsi, panel.legacy_start).loc[:, full_history]
+    valid = rsi.notna()
+    n_valid = valid.sum(axis=1)
+    out = pd.DataFrame({
+        "0-30": ((rsi > 0) & (rsi <= 30)).sum(axis=1),
+        "30-50": ((rsi > 30) & (rsi <= 50)).sum(axis=1),
+        "50-70": ((rsi > 50) & (rsi <= 70)).sum(axis=1),
+        "70-100": ((rsi > 70) & (rsi <= 100)).sum(axis=1),
+    })
+    out = (out.div(n_valid, axis=0) * 100).where(n_valid > 0, 0)
+    out["avg_rsi"] = rsi.mean(axis=1)
+    return out.dropna()
+
+
+@measure("kama", legacy_file="market_breadth_kama.json",
+         legacy_meta=lambda args: {"indicator": "KAMA-breadth", "kama_config": KAMA_CONFIG})
+def kama_breadth(panel: Panel):
+    # KAMA прогревается внутри окна, как в отдельном скрипте
+    close = panel.window(panel.close)
+    kama, _ = panel.memo("kama", lambda: per_coin(close, lambda c: kama_sc_panel(c, **KAMA_CONFIG)))
+    return pd.DataFrame({"pct_above_kama": pct_true(close > kama, close.notna())})
+
+
+@measure("kama_speed", legacy_file="market_breadth_kama_speed.json",
+         legacy_meta=lambda args: {"indicator": "KAMA-speed-breadth", "kama_config": KAMA_CONFIG})
+def kama_speed_breadth(panel: Panel):
+    close = panel.window(panel.close)
+    _, sc = panel.memo("kama", lambda: per_coin(close, lambda c: kama_sc_panel(c, **KAMA_CONFIG)))
+    valid = sc.notna()
+    median = sc.median()
+    return pd.DataFrame({
+        "pct_speed_fast": pct_true(sc > median, valid),
+        "pct_speed_slow": pct_true(sc <= median, valid),
+    })
+
+
+@measure("sma")
+def sma_breadth(panel: Panel):
+    sma = per_coin(panel.close, lambda c: c.rolling(MA_PERIOD).mean())
+    valid = panel.has_bar & sma.notna()
+    return panel.window(pd.DataFrame({"pct_above_sma": pct_true(panel.close > sma, valid)}))
+
+
+@measure("ema")
+def ema_breadth(panel: Panel):
+    ema = per_coin(panel.close, lambda c: c.ewm(span=MA_PERIOD, adjust=False, min_periods=MA_PERIOD).mean())
+    valid = panel.has_bar & ema.notna()
+    return panel.window(pd.DataFrame({"pct_above_ema": pct_true(panel.close > ema, valid)}))
+
+
+@measure("highs_lows")
+def highs_lows_breadth(panel: Panel):
+    high = panel.high if panel.high is not None else panel.close
+    low = panel.low if panel.low is not None else panel.close
+    top = per_coin(high, lambda c: c.rolling(HIGHS_LOWS_PERIOD).max())
+    bottom = per_coin(low, lambda c: c.rolling(HIGHS_LOWS_PERIOD).min())
+    valid = panel.has_bar & top.notna()
+    return panel.window(pd.DataFrame({
+        "pct_new_highs": pct_true(high >= top, valid),
+        "pct_new_lows": pct_true(low <= bottom, valid),
+    }))
+
+
+@measure("corr")
+def corr_breadth(panel: Panel):
+    cfg = ROLLING_CORR
+    path = os.path.join(cfg["folder"], f"{panel.tf}_{cfg['base']}_w{cfg['window']}.npz")
+    if not os.path.exists(path):
+        return None
+    data = load_columns(path)
+    symbols = [s for s in panel.close.columns if s in data["corr"].columns and s != cfg["base"]]
+    corr = data["corr"][symbols].reindex(panel.close.index)
+    beta = data["beta"][symbols].reindex(panel.close.index)
+    suffix = cfg["base"].replace("USDT", "").lower()
+    return panel.window(pd.DataFrame({
+        f"avg_corr_{suffix}": corr.mean(axis=1),
+        f"avg_beta_{suffix}": beta.mean(axis=1),
+    })).dropna(how="all")
+
+
+# ---------- движок ----------
+def window_start(days):
+    """Граница окна мер: сегодняшняя полночь минус days (как в корреляциях)."""
+    return pd.Timestamp.now().normalize() - timedelta(days=days)
+
+
+def history_years(days):
+    return round(days / 365.25, 2)
+
+
+def legacy_window_start(days):
+    """
+    Граница окна прежнего RSI-скрипта: текущий момент UTC минус 365.25 · years, без округления
+    до полуночи (--years 2 там — это 730.5 дня); years — то же, что пишется в meta.history_years.
+    """
+    return pd.Timestamp.now(tz="UTC").tz_localize(None) - timedelta(days=365.25 * history_years(days))
+
+
+def top_symbols(corr: dict, tf: str, top_n: int):
+    tf_corr = corr.get(tf, {})
+    return sorted(tf_corr, key=lambda s: tf_corr[s]["correlation"], reverse=True)[:top_n]
+
+
+def breadth_for_tf(tf, symbols, names, days, data_folder=DATA_FOLDER, use_ema=False):
+    """Один ТФ: панель один раз, затем все меры names. Возвращает {мера: DataFrame}."""
+    frames = load_panel(tf, symbols=symbols, columns=("close", "high", "low"), data_folder=data_folder)
+    if frames["close"].empty:
+        return {}
+    frames = {col: frame.sort_index() for col, frame in frames.items()}
+    panel = Panel(tf, frames, window_start(days), legacy_window_start(days), use_ema=use_ema)
+
+    results = {}
+    for name in names:
+        frame = MEASURES[name]["fn"](panel)
+        if frame is not None and not frame.empty:
+            results[name] = frame
+    return results
+
+
+def default_record(date, row):
+    return {"date": date.isoformat(), **{k: _round(v) for k, v in row.items() if pd.notna(v)}}
+
+
+def frame_records(frame, record=None):
+    record = record or default_record
+    return [record(idx, row) for idx, row in zip(frame.index, frame.to_dict("records"))]
+
+
+def dump(path, payload, compress):
+    kwargs = {"indent": None, "separators": (",", ":")} if compress else {"indent": 2}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, **kwargs)
+    print(f"✅  готово: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market breadth: все меры за один проход по панели ТФ")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="монет на ТФ")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="глубина (дней)")
+    parser.add_argument("--corr-file", default=CORR_FILE)
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--measures", nargs="+", default=list(MEASURES), choices=list(MEASURES))
+    parser.add_argument("--out-file", default=OUT_FILE)
+    parser.add_argument("--legacy", action="store_true", help="ещё и прежние JSON отдельных скриптов")
+    parser.add_argument("--use-ema", action="store_true", help="RSI по EMA вместо SMA")
+    parser.add_argument("--compress-json", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        with open(args.corr_file, encoding="utf-8") as f:
+            corr = json.load(f)
+    except Exception as e:
+        exit(f"Не удалось загрузить {args.corr_file}: {e}")
+    tfs = corr.get("meta", {}).get("timeframes", [])
+
+    per_tf = {}
+    for tf in tfs:
+        symbols = top_symbols(corr, tf, args.top_n)
+        if symbols:
+            per_tf[tf] = breadth_for_tf(tf, symbols, args.measures, args.days, args.data_folder, args.use_ema)
+
+    computed_at = datetime.now(timezone.utc).isoformat()
+    meta = {
+        "measures": args.measures,
+        "top_n": args.top_n,
+        "history_days": args.days,
+        "source": args.corr_file,
+        "optimal_rsi_periods": OPTIMAL_RSI_PERIODS,
+        "rsi_method": "EMA" if args.use_ema else "SMA",
+        "kama_config": KAMA_CONFIG,
+        "ma_period": MA_PERIOD,
+        "highs_lows_period": HIGHS_LOWS_PERIOD,
+        "computed_at": computed_at,
+    }
+    start = window_start(args.days)
+    data = {}
+    for tf, results in per_tf.items():
+        if not results:
+            continue
+        # все меры ТФ — в одну строку на дату; корзины RSI — полями rsi_0-30, rsi_30-50, ...
+        combined = pd.concat(
+            [frame.rename(columns={r: f"rsi_{r}" for r in RSI_RANGES}) for frame in results.values()], axis=1
+        ).sort_index()
+        combined = combined.loc[combined.index >= start]
+        data[tf] = frame_records(combined)
+    dump(args.out_file, {"meta": meta, "data": data}, args.compress_json)
+
+    if args.legacy:
+        for name in args.measures:
+            spec = MEASURES[name]
+            if not spec["legacy_file"]:
+                continue
+            legacy = {
+                "meta": {**spec["legacy_meta"](args), "history_days": args.days, "top_n": args.top_n,
+                         "source": args.corr_file, "computed_at": computed_at},
+                "data": {tf: frame_records(results[name], spec["record"])
+                         for tf, results in per_tf.items() if name in results},
+            }
+            dump(spec["legacy_file"], legacy, args.compress_json)
+
+
+if __name__ == "__main__":
+    main()
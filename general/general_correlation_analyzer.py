@@ -1,99 +1,129 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Мульти-ТФ корреляция с BTC.
+Мульти-ТФ корреляция монет (по умолчанию — с BTC).
 История = ровно `days` календарных дней.
+Корреляция — по лог-доходностям, а не по уровням цен: полная матрица всех монет
+за один проход (pairwise-complete: каждая пара — по барам, где есть обе монеты).
 В файле сохраняем:
   - correlation
-  - matching_bars  ← количество баров (6/3/2/1 в день)
+  - matching_bars  ← количество общих баров доходностей пары
+Первая пара (база, days) пишется в OUTPUT_FILE в прежнем формате,
+остальные базы / глубины — рядом: correlations_<base>_<days>d.json.
 """
 import os
 import json
 import argparse
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from general_panel import DATA_FOLDER, load_panel, log_returns
 
-DATA_FOLDER      = "kline_data"
 BASE_COIN        = "BTCUSDT"
 OUTPUT_FILE      = "correlations_multi_tf.json"
 TIMEFRAMES       = ["4h", "8h", "12h", "1d"]
 
 DEFAULT_TOP_N    = 30
 DEFAULT_DAYS     = 730
-MIN_MATCHING_BARS = 50          # минимум баров после merge
-
-# ---------- утилиты ----------
-def load_series(path: str, symbol: str):
-    try:
-        df = pd.read_csv(path, usecols=["datetime", "close"],
-                         parse_dates=["datetime"], index_col="datetime")
-        df = df[~df.index.duplicated(keep="first")]
-        return df["close"].rename(symbol)
-    except Exception:
-        return None
-
-def corr_for_tf(tf: str, top_n: int, days: int):
-    """TOP-N корреляций для одного ТФ (ровно `days` календарных дней)"""
-    start_cut = pd.Timestamp.now().normalize() - timedelta(days=days)   # tz-naive
-    folder    = os.path.join(DATA_FOLDER, tf)
-    if not os.path.isdir(folder):
-        return {}
-
-    base = load_series(os.path.join(folder, f"{BASE_COIN}.csv"), BASE_COIN)
-    if base is None:
-        return {}
-    base = base.loc[base.index >= start_cut]
-    if len(base) < MIN_MATCHING_BARS:
+MIN_MATCHING_BARS = 50          # минимум общих баров пары
+
+
+# ---------- матрица ----------
+def corr_matrix(returns: np.ndarray, min_periods: int = MIN_MATCHING_BARS):
+    """
+    Pairwise-complete Пирсон для всех колонок (бары × монеты) сразу.
+    NaN маскируются: суммы по общим барам каждой пары — матричные произведения
+    маски и обнулённых доходностей, без цикла по парам.
+    Возвращает (corr, n): матрицы монеты × монеты; пары с n < min_periods — NaN.
+    """
+    mask = np.isfinite(returns)
+    x = np.where(mask, returns, 0.0)
+    m = mask.astype(np.float64)
+
+    n = m.T @ m                       # общие бары пары
+    sx = x.T @ m                      # Σx_i по барам, где есть и j
+    sxx = (x * x).T @ m               # Σx_i² там же
+    sxy = x.T @ x                     # Σx_i·x_j (нули вне общих баров)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        corr = cov / np.sqrt(var_i * var_i.T)
+    corr[n < min_periods] = np.nan
+    return np.clip(corr, -1.0, 1.0), n.astype(np.int64)
+
+
+def top_for_base(corr: pd.DataFrame, bars: pd.DataFrame, base: str, top_n: int):
+    """TOP-N корреляций к base в формате correlations_multi_tf.json."""
+    if base not in corr.columns:
         return {}
+    col = corr[base].drop(base).dropna().sort_values(ascending=False).head(top_n)
+    return {s: {"correlation": float(v), "matching_bars": int(bars.at[s, base])} for s, v in col.items()}
+
+
+def corr_for_tf(tf: str, bases, top_n: int, days_list, data_folder: str = DATA_FOLDER, matrix_dir=None):
+    """
+    Один ТФ: панель читается один раз на максимальную глубину, для каждой глубины —
+    одна матрица, из неё — TOP-N для каждой базы.
+    Возвращает {(base, days): {symbol: {...}}}.
+    """
+    close = load_panel(tf, days=max(days_list), data_folder=data_folder)["close"]
+    out = {(base, days): {} for base in bases for days in days_list}
+    if close.empty:
+        return out
+
+    returns = log_returns(close)
+    for days in days_list:
+        start = pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
+        window = returns.loc[returns.index >= start]
+        corr, n = corr_matrix(window.to_numpy())
+        corr = pd.DataFrame(corr, index=window.columns, columns=window.columns)
+        bars = pd.DataFrame(n, index=window.columns, columns=window.columns)
+        if matrix_dir:
+            os.makedirs(matrix_dir, exist_ok=True)
+            corr.to_csv(os.path.join(matrix_dir, f"corr_{tf}_{days}d.csv"), float_format="%.4f")
+        for base in bases:
+            out[(base, days)] = top_for_base(corr, bars, base, top_n)
+    return out
+
+
+def output_path(base: str, days: int, primary: bool):
+    return OUTPUT_FILE if primary else f"correlations_{base}_{days}d.json"
 
-    files = [f for f in os.listdir(folder) if f.endswith(".csv") and f != f"{BASE_COIN}.csv"]
-    res   = {}
-
-    for fname in tqdm(files, desc=f"CORR {tf}", ncols=80,
-                      bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}"):
-        symbol = fname.replace(".csv", "")
-        ser    = load_series(os.path.join(folder, fname), symbol)
-        if ser is None:
-            continue
-        ser = ser.loc[ser.index >= start_cut]
-        if len(ser) < MIN_MATCHING_BARS:
-            continue
-
-        merged = pd.concat([base, ser], axis=1, join="inner").dropna()
-        if len(merged) < MIN_MATCHING_BARS:
-            continue
-
-        corr = merged.iloc[:, 0].corr(merged.iloc[:, 1])
-        if pd.notna(corr):
-            res[symbol] = {"correlation": float(corr),
-                           "matching_bars": int(len(merged))}
-
-    top_syms = sorted(res, key=lambda s: res[s]["correlation"], reverse=True)[:top_n]
-    return {s: res[s] for s in top_syms}
 
 # ---------- CLI ----------
 def main():
-    parser = argparse.ArgumentParser(description="Корреляция с BTC по 4-м ТФ (730 дней)")
+    parser = argparse.ArgumentParser(description="Корреляция лог-доходностей с базовой монетой по ТФ")
     parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="сколько монет оставить")
-    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="глубина истории (дней)")
+    parser.add_argument("--days", type=int, nargs="+", default=[DEFAULT_DAYS],
+                        help="глубина истории (дней), можно несколько")
+    parser.add_argument("--base", nargs="+", default=[BASE_COIN], help="базовые монеты")
+    parser.add_argument("--timeframes", nargs="+", default=TIMEFRAMES)
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--matrix-dir", default=None, help="сохранить полные матрицы (CSV) в папку")
     args = parser.parse_args()
 
-    out = {"meta": {
-        "base_coin": BASE_COIN,
-        "top_n": args.top,
-        "history_days": args.days,
-        "timeframes": TIMEFRAMES,
-        "computed_at": datetime.now().isoformat()
-    }}
+    results = {}
+    for tf in args.timeframes:
+        for key, top in corr_for_tf(tf, args.base, args.top, args.days, args.data_folder, args.matrix_dir).items():
+            results.setdefault(key, {})[tf] = top
 
-    for tf in TIMEFRAMES:
-        out[tf] = corr_for_tf(tf, args.top, args.days)
+    for i, (base, days) in enumerate((b, d) for b in args.base for d in args.days):
+        out = {"meta": {
+            "base_coin": base,
+            "top_n": args.top,
+            "history_days": days,
+            "timeframes": args.timeframes,
+            "method": "log_returns_pairwise",
+            "computed_at": datetime.now().isoformat()
+        }}
+        out.update(results.get((base, days), {}))
 
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(out, f, indent=2, ensure_ascii=False)
+        path = output_path(base, days, primary=i == 0)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2, ensure_ascii=False)
+        print(f"✅  готово: {path}")
 
-    print(f"✅  готово: {OUTPUT_FILE}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
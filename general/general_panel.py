@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Панель монет одного ТФ: CSV из kline_data/<tf> читаются один раз и выравниваются
+на общей шкале времени (бары × монеты, NaN там, где у монеты бара нет).
+Общая загрузка для корреляций и breadth-скриптов вместо merge по парам.
+"""
+import os
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from datetime import timedelta
+
+DATA_FOLDER = "kline_data"
+
+
+# ---------- загрузка ----------
+def read_coin(path: str, columns=("close",)):
+    try:
+        df = pd.read_csv(path, usecols=["datetime", *columns],
+                         parse_dates=["datetime"], index_col="datetime")
+    except Exception:
+        return None
+    return df[~df.index.duplicated(keep="first")].sort_index()
+
+
+def list_symbols(tf: str, data_folder: str = DATA_FOLDER):
+    folder = os.path.join(data_folder, tf)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(f[:-4] for f in os.listdir(folder) if f.endswith(".csv"))
+
+
+def load_panel(tf: str, symbols=None, days=None, columns=("close",), data_folder: str = DATA_FOLDER,
+               min_bars: int = 1):
+    """
+    {колонка: DataFrame (datetime × symbol)} по ТФ.
+    symbols=None — все CSV папки; days — только последние `days` календарных дней
+    (от сегодняшней полуночи, как в корреляциях); монеты короче min_bars отбрасываются.
+    """
+    folder = os.path.join(data_folder, tf)
+    symbols = list_symbols(tf, data_folder) if symbols is None else list(symbols)
+    start = pd.Timestamp.now().normalize() - timedelta(days=days) if days else None
+
+    frames = {}
+    for sym in tqdm(symbols, desc=f"panel {tf}", ncols=80,
+                    bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}"):
+        path = os.path.join(folder, f"{sym}.csv")
+        if not os.path.exists(path):
+            continue
+        df = read_coin(path, columns)
+        if df is None:
+            continue
+        if df.index.tz is not None:
+            df.index = df.index.tz_convert(None)
+        if start is not None:
+            df = df.loc[df.index >= start]
+        if len(df) < min_bars:
+            continue
+        frames[sym] = df
+
+    if not frames:
+        return {col: pd.DataFrame(dtype=float) for col in columns}
+    # одно выравнивание на всех вместо inner-merge по парам
+    wide = pd.concat(frames, axis=1)
+    return {col: wide.xs(col, axis=1, level=1).astype(np.float64) for col in columns}
+
+
+def log_returns(close: pd.DataFrame) -> pd.DataFrame:
+    """Лог-доходности баров; NaN, где нет одного из двух соседних баров монеты."""
+    values = close.to_numpy(dtype=np.float64)
+    out = np.full_like(values, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[1:] = np.log(values[1:] / values[:-1])
+    out[~np.isfinite(out)] = np.nan
+    return pd.DataFrame(out, index=close.index, columns=close.columns)
+
+
+
+# ---------- колоночное хранилище ----------
+def save_columns(path: str, index, symbols, **arrays):
+    """
+    Ряды панели в один .npz: timestamps (int64 нс), symbols и по массиву (бары × монеты)
+    на каждую величину — float32, без парсинга дат и JSON при чтении.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path,
+             timestamps=pd.DatetimeIndex(index).asi8,
+             symbols=np.asarray(list(symbols), dtype=str),
+             **{name: np.asarray(a, dtype=np.float32) for name, a in arrays.items()})
+    return path
+
+
+def load_columns(path: str):
+    """.npz из save_columns → {величина: DataFrame (datetime × symbol)}."""
+    with np.load(path) as data:
+        index = pd.DatetimeIndex(data["timestamps"].view("datetime64[ns]"), name="datetime")
+        symbols = [str(s) for s in data["symbols"]]
+        return {name: pd.DataFrame(data[name], index=index, columns=symbols)
+                for name in data.files if name not in ("timestamps", "symbols")}
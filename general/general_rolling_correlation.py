@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Скользящая корреляция и бета каждой монеты к базе (BTC или любой другой) — временные ряды.
+Окно считается по накопленным суммам x, y, x², y², xy: сумма окна = разность двух
+кумулятивных сумм, так что цена окна O(1) на бар и не зависит от его длины.
+NaN-aware: бар входит в окно пары, только если доходность есть и у монеты, и у базы.
+
+Результат — колоночное хранилище для breadth-скриптов:
+  rolling_correlation/<tf>_<base>_w<window>.npz  (corr, beta: бары × монеты, см. general_panel.load_columns)
+"""
+import os
+import argparse
+import numpy as np
+
+from general_panel import DATA_FOLDER, load_panel, log_returns, save_columns
+
+BASE_COIN        = "BTCUSDT"
+TIMEFRAMES       = ["4h", "8h", "12h", "1d"]
+WINDOWS          = [30]
+DEFAULT_DAYS     = 730
+OUT_FOLDER       = "rolling_correlation"
+
+
+# ---------- окна ----------
+def window_sums(values: np.ndarray, window: int):
+    """Суммы скользящего окна по оси баров через кумулятивную сумму (первые window-1 баров — частичные окна)."""
+    c = np.cumsum(values, axis=0)
+    out = c.copy()
+    out[window:] -= c[:-window]
+    return out
+
+
+def rolling_corr_beta(returns: np.ndarray, base: np.ndarray, window: int, min_periods=None):
+    """
+    returns: бары × монеты, base: бары (доходности базы).
+    Возвращает (corr, beta, n) той же формы; окна с n < min_periods (по умолчанию window) — NaN.
+    """
+    min_periods = window if min_periods is None else min_periods
+    base = np.broadcast_to(base[:, None], returns.shape)
+    mask = np.isfinite(returns) & np.isfinite(base)
+    x = np.where(mask, returns, 0.0)
+    y = np.where(mask, base, 0.0)
+
+    n = window_sums(mask.astype(np.float64), window)
+    sx, sy = window_sums(x, window), window_sums(y, window)
+    sxx, syy, sxy = window_sums(x * x, window), window_sums(y * y, window), window_sums(x * y, window)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+        beta = cov / var_y
+    # разность кумулятивных сумм оставляет шум ~1e-16 там, где дисперсия должна быть нулём
+    flat = (var_x <= 1e-14 * sxx) | (var_y <= 1e-14 * syy)
+    corr[flat] = np.nan
+    beta[var_y <= 1e-14 * syy] = np.nan
+    short = n < min_periods
+    corr[short] = np.nan
+    beta[short] = np.nan
+    return corr, beta, n
+
+
+def rolling_for_tf(tf: str, bases, windows, days: int, data_folder: str = DATA_FOLDER, out_folder: str = OUT_FOLDER):
+    """Один ТФ: панель читается один раз, ряды — для каждой базы и окна; возвращает пути .npz."""
+    close = load_panel(tf, days=days, data_folder=data_folder)["close"]
+    if close.empty:
+        return []
+    returns = log_returns(close)
+    values = returns.to_numpy()
+
+    paths = []
+    for base in bases:
+        if base not in returns.columns:
+            print(f"⚠️  {base} нет в {tf}, пропуск")
+            continue
+        base_values = values[:, returns.columns.get_loc(base)]
+        for window in windows:
+            corr, beta, _ = rolling_corr_beta(values, base_values, window)
+            path = os.path.join(out_folder, f"{tf}_{base}_w{window}.npz")
+            paths.append(save_columns(path, returns.index, returns.columns, corr=corr, beta=beta))
+    return paths
+
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Скользящая корреляция / бета монет к базе по ТФ")
+    parser.add_argument("--base", nargs="+", default=[BASE_COIN], help="базовые монеты")
+    parser.add_argument("--window", type=int, nargs="+", default=WINDOWS, help="окна (баров)")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="глубина истории (дней)")
+    parser.add_argument("--timeframes", nargs="+", default=TIMEFRAMES)
+    parser.add_argument("--data-folder", default=DATA_FOLDER)
+    parser.add_argument("--out-folder", default=OUT_FOLDER)
+    args = parser.parse_args()
+
+    for tf in args.timeframes:
+        for path in rolling_for_tf(tf, args.base, args.window, args.days, args.data_folder, args.out_folder):
+            print(f"✅  {path}")
+
+
+if __name__ == "__main__":
+    main()
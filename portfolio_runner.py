@@ -0,0 +1,98 @@
+import matplotlib
+matplotlib.use("Agg")
+
+from datetime import datetime
+from rich.console import Console
+
+from core import (
+    load_market_data,
+    generate_result_path,
+    save_params,
+    save_metrics,
+    save_equity_curve,
+    save_equity_plot_png,
+    params_hash,
+    run_portfolio
+)
+from backtest_runner import (
+    START_DATE,
+    END_DATE,
+    INITIAL_CASH,
+    COMMISSION_MODEL,
+    SLIPPAGE
+)
+
+console = Console()
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "XRPUSDT"]
+TIMEFRAMES = ["1D", "12H"]
+
+PORTFOLIO_PARAMS = {
+    "rsi_period": 14,
+    "atr_period": 14,
+    "take_profit": {
+        "mode": "full",
+        "levels": [{"percent": 1.0, "exit_type": "atr", "params": {"mult": 4.0}}]
+    }
+}
+SIZING = "equal"          # "equal" | "fixed_fraction" | "atr_risk"
+MAX_POSITIONS = None      # None — по числу символов
+FRACTION = 0.2            # для "fixed_fraction"
+RISK_PER_TRADE = 0.01     # для "atr_risk"
+
+def run():
+    market_data = load_market_data(SYMBOLS, TIMEFRAMES, start_date=START_DATE, end_date=END_DATE)
+    strategy_id = params_hash(PORTFOLIO_PARAMS)
+
+    for tf in TIMEFRAMES:
+        frames = {s: market_data.get(s, {}).get(tf) for s in SYMBOLS}
+        frames = {s: df for s, df in frames.items() if df is not None and not df.empty}
+        if not frames:
+            console.print(f"[red]❌ Нет данных для {tf}[/red]")
+            continue
+
+        result = run_portfolio(
+            frames,
+            PORTFOLIO_PARAMS,
+            initial_cash=INITIAL_CASH,
+            commission=COMMISSION_MODEL,
+            slippage=SLIPPAGE,
+            sizing=SIZING,
+            max_positions=MAX_POSITIONS,
+            fraction=FRACTION,
+            risk_per_trade=RISK_PER_TRADE
+        )
+
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_path = generate_result_path("PORTFOLIO", tf, {"run_id": run_id, "strategy_id": strategy_id})
+        save_params(result_path, {
+            **PORTFOLIO_PARAMS,
+            "symbols": list(frames),
+            "sizing": SIZING,
+            "max_positions": MAX_POSITIONS,
+            "fraction": FRACTION,
+            "risk_per_trade": RISK_PER_TRADE,
+            "strategy_id": strategy_id,
+            "run_id": run_id,
+            "timeframe": tf,
+            "start_date": START_DATE,
+            "end_date": END_DATE
+        })
+        save_metrics(result_path, {"strategy_id": strategy_id, "run_id": run_id, "timeframe": tf, **result["metrics"]})
+
+        equity_df = result["equity"]
+        equity_df.index.name = "date"
+        save_equity_curve(result_path, equity_df)
+        save_equity_plot_png(result_path, equity_df)
+        result["attribution"].to_csv(result_path / "attribution.csv")
+        result["assets"].to_csv(result_path / "assets.csv", index=False)
+        result["exits"].to_csv(result_path / "exits.csv", index=False)
+
+        console.print(
+            f"[green]✅ Портфель {tf}: {result['metrics']['Final_portfolio_growth_percent']}% "
+            f"({len(frames)} символов, {SIZING}) → {result_path}[/green]"
+        )
+
+if __name__ == "__main__":
+    run()
+    console.print("\n[bold green]✅ Портфельный прогон завершён.[/bold green]")
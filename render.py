@@ -0,0 +1,83 @@
+import matplotlib
+matplotlib.use("Agg")
+
+import argparse
+
+from rich.console import Console
+
+from core import (
+    render_artifacts,
+    load_run_metrics,
+    select_runs_db,
+    select_runs_folders,
+    ReportBundle,
+    bundle_run_id
+)
+from backtest_runner import RESULTS_MODE, RESULTS_DB, RUN_CACHE_INDEX, REPORT_BUNDLE, RUN_CONFIG
+
+console = Console()
+
+# Отрисовка тяжёлых артефактов (PNG, quantstats HTML, plotly-график) для выбранных прогонов
+# после свипа с ARTIFACTS = "deferred":
+#   python render.py --top 20 --metric Final_portfolio_growth_percent
+#   python render.py --strategy-id 1a2b3c4d --symbol BTCUSDT
+#   python render.py --top 20 --robustness 10000   # + Монте-Карло по сделкам → robustness.csv
+# Векторные прогоны без кривой пересчитываются по одной комбинации с RUN_CONFIG из backtest_runner
+# (брокер и pruning должны совпадать со свипом — итог сверяется с сохранёнными метриками).
+RENDER_WORKERS = 4
+
+def main():
+    parser = argparse.ArgumentParser(description="Артефакты по запросу для выбранных прогонов")
+    parser.add_argument("--top", type=int, default=20, help="сколько лучших прогонов по метрике")
+    parser.add_argument("--metric", default="Final_portfolio_growth_percent", help="метрика для отбора")
+    parser.add_argument("--ascending", action="store_true", help="меньше — лучше (например, просадка)")
+    parser.add_argument("--strategy-id", default=None, help="только этот strategy_id")
+    parser.add_argument("--symbol", default=None)
+    parser.add_argument("--timeframe", default=None)
+    parser.add_argument("--source", choices=["db", "folders"], default=RESULTS_MODE,
+                        help="откуда брать прогоны: база результатов или папки из индекса кэша")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="процессов в пуле")
+    parser.add_argument("--robustness", type=int, default=0,
+                        help="симуляций Монте-Карло по сделкам каждого прогона (0 — без robustness.csv)")
+    parser.add_argument("--bundle", default=REPORT_BUNDLE,
+                        help="папка общего отчёта (index.html); пустая строка — отдельные HTML графиков")
+    args = parser.parse_args()
+
+    selection = dict(
+        metric=args.metric, top=args.top, strategy_id=args.strategy_id,
+        symbol=args.symbol, timeframe=args.timeframe, ascending=args.ascending,
+    )
+    if args.source == "db":
+        specs = select_runs_db(RESULTS_DB, **selection)
+    else:
+        specs = select_runs_folders(RUN_CACHE_INDEX, **selection)
+
+    if not specs:
+        console.print("[yellow]⚠️ Подходящих прогонов не найдено[/yellow]")
+        return
+
+    console.print(f"[cyan]🎨 Отрисовка {len(specs)} прогонов в {args.workers} процессах...[/cyan]")
+    bundle = ReportBundle(args.bundle) if args.bundle else None
+    bundle_rows = []
+    results = render_artifacts(specs, max_workers=args.workers, bundle_root=args.bundle or None,
+                               robustness_sims=args.robustness, run_config=RUN_CONFIG)
+    for spec, path, error in results:
+        label = f"{spec['symbol']} {spec['timeframe']} {spec['strategy_id']} ({args.metric} = {spec[args.metric]})"
+        if error is not None:
+            console.print(f"[red]❌ {label}: {error}[/red]")
+            continue
+        console.print(f"[green]✅ {label} → {path}[/green]")
+        if bundle is not None:
+            bundle_rows.append({
+                "id": bundle_run_id(path),
+                "symbol": spec["symbol"], "timeframe": spec["timeframe"], "strategy_id": spec["strategy_id"],
+                **load_run_metrics(spec),
+                "chart": True, "quantstats": bundle.quantstats_link(path)
+            })
+
+    if bundle_rows:
+        bundle.add_runs(bundle_rows)
+        console.print(f"[cyan]📑 Отчёт: {bundle.root / 'index.html'}[/cyan]")
+
+if __name__ == "__main__":
+    main()
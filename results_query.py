@@ -0,0 +1,199 @@
+import argparse
+
+import pandas as pd
+from rich.console import Console
+
+from core import (
+    ResultsQuery,
+    ResultsDB,
+    DEFAULT_RESULTS_DB,
+    surface_from_db,
+    robust_plateaus,
+    plot_sensitivity_heatmap,
+    selection_bias_report,
+    validate_against_quantstats
+)
+
+console = Console()
+
+# Запросы к базе результатов без чтения папок прогонов:
+#   python results_query.py top --metric Sharpe --n 50 --min-trades 30 --max-drawdown 25
+#   python results_query.py group --by symbol timeframe --family full:atr
+#   python results_query.py leaderboard --agg min --min-markets 4
+#   python results_query.py pivot --rows rsi_period --columns take_profit.levels.0.params.mult --symbol BTCUSDT
+#   python results_query.py heatmap --x rsi_period --y atr_period --symbol BTCUSDT --out results/sensitivity.html
+#   python results_query.py overfit --timeframe 1D --family full:atr   # DSR, PBO, White's Reality Check
+#   python results_query.py perf-check --n 20   # метрики core.perf_metrics против quantstats на кривых из базы
+#   python results_query.py names
+#   python results_query.py reindex        # база, записанная до появления params / family
+DEFAULT_METRIC = "Final_portfolio_growth_percent"
+
+
+def add_filters(parser):
+    parser.add_argument("--metric", default=DEFAULT_METRIC)
+    parser.add_argument("--symbol", nargs="+", default=None)
+    parser.add_argument("--timeframe", nargs="+", default=None)
+    parser.add_argument("--family", nargs="+", default=None, help='семейство стратегии: "signal", "full:atr", ...')
+    parser.add_argument("--engine", nargs="+", default=None, help="vector / backtrader")
+    parser.add_argument("--strategy-id", nargs="+", default=None)
+    parser.add_argument("--min-trades", type=int, default=None, help="Total_trades >= N")
+    parser.add_argument("--max-drawdown", type=float, default=None, help="просадка не глубже N %%")
+    parser.add_argument("--param", nargs=2, action="append", default=[], metavar=("NAME", "VALUE"),
+                        help="фильтр по параметру, можно несколько раз")
+
+
+def parse_value(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def filters_from(args):
+    return dict(
+        symbol=args.symbol, timeframe=args.timeframe, family=args.family, engine=args.engine,
+        strategy_id=args.strategy_id, min_trades=args.min_trades, max_drawdown=args.max_drawdown,
+        params={name: parse_value(value) for name, value in args.param} or None,
+    )
+
+
+def perf_check(db_path, runs, n, rtol):
+    """
+    validate_against_quantstats на первых n прогонах с сохранённой equity.
+    Возвращает сводку по метрикам: сколько кривых сверено, сколько расходится, худшее отклонение.
+    """
+    checks = []
+    with ResultsDB(db_path) as db:
+        for run_pk, timeframe in zip(runs["run_pk"], runs["timeframe"]):
+            equity = db.equity(run_pk)
+            if len(equity) < 3:
+                continue
+            checks.append(validate_against_quantstats(equity, timeframe, rtol=rtol).assign(run_pk=run_pk))
+            if len(checks) == n:
+                break
+    if not checks:
+        return pd.DataFrame()
+
+    checks = pd.concat(checks, ignore_index=True)
+    scale = checks["quantstats"].abs().where(checks["quantstats"] != 0, 1.0)
+    checks["rel_error"] = (checks["batch"] - checks["quantstats"]).abs() / scale
+    summary = checks.groupby("metric", sort=False).agg(
+        runs=("run_pk", "count"),
+        mismatches=("match", lambda m: int((~m).sum())),
+        max_rel_error=("rel_error", "max"),
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Топы, группировки и срезы по базе результатов")
+    parser.add_argument("--db", default=DEFAULT_RESULTS_DB, help="путь к базе результатов")
+    parser.add_argument("--csv", default=None, help="сохранить результат в CSV")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    top = sub.add_parser("top", help="топ-N прогонов по метрике")
+    add_filters(top)
+    top.add_argument("--n", type=int, default=20)
+    top.add_argument("--ascending", action="store_true", help="меньше — лучше")
+    top.add_argument("--columns", nargs="+", default=None, help="какие метрики показать рядом")
+
+    group = sub.add_parser("group", help="агрегаты метрики по группам")
+    add_filters(group)
+    group.add_argument("--by", nargs="+", default=["symbol", "timeframe"], help="поля runs или параметры")
+
+    leaderboard = sub.add_parser("leaderboard", help="strategy_id по агрегату на всех рынках")
+    add_filters(leaderboard)
+    leaderboard.add_argument("--n", type=int, default=20)
+    leaderboard.add_argument("--agg", default="mean", choices=["mean", "min", "max", "sum", "count"])
+    leaderboard.add_argument("--min-markets", type=int, default=1)
+
+    pivot = sub.add_parser("pivot", help="сводная таблица метрики по параметрам")
+    add_filters(pivot)
+    pivot.add_argument("--rows", required=True)
+    pivot.add_argument("--columns", default=None)
+    pivot.add_argument("--agg", default="mean", choices=["mean", "min", "max", "sum", "count"])
+
+    heatmap = sub.add_parser("heatmap", help="тепловая карта и устойчивые плато по двум параметрам")
+    add_filters(heatmap)
+    heatmap.add_argument("--x", required=True)
+    heatmap.add_argument("--y", required=True)
+    heatmap.add_argument("--extra", nargs="+", default=[], help="ещё оси поверхности (сворачиваются на карте)")
+    heatmap.add_argument("--how", default="mean", choices=["mean", "min", "max"], help="свёртка прочих осей")
+    heatmap.add_argument("--radius", type=int, default=1, help="окрестность, шагов сетки")
+    heatmap.add_argument("--penalty", type=float, default=1.0, help="score = среднее − penalty · std")
+    heatmap.add_argument("--n", type=int, default=20, help="сколько плато показать")
+    heatmap.add_argument("--out", default="results/sensitivity.html")
+
+    overfit = sub.add_parser("overfit", help="поправка на множественные испытания: DSR, PBO, Reality Check")
+    add_filters(overfit)
+    overfit.add_argument("--n", type=int, default=20, help="сколько прогонов показать (по DSR)")
+    overfit.add_argument("--splits", type=int, default=16, help="блоков CSCV (чётное)")
+    overfit.add_argument("--boot", type=int, default=1000, help="бутстреп-выборок Reality Check")
+    overfit.add_argument("--trials", type=int, default=None, help="эффективное число проб для DSR")
+    overfit.add_argument("--workers", type=int, default=None, help="процессов для разбиений CSCV")
+    overfit.add_argument("--seed", type=int, default=None)
+
+    check = sub.add_parser("perf-check", help="сверка core.perf_metrics с quantstats на кривых из базы")
+    add_filters(check)
+    check.add_argument("--n", type=int, default=20, help="сколько прогонов с equity сверить")
+    check.add_argument("--rtol", type=float, default=1e-9)
+
+    sub.add_parser("names", help="метрики и параметры в базе")
+    sub.add_parser("reindex", help="пересобрать family и params из runs.params")
+    args = parser.parse_args()
+
+    if args.command == "reindex":
+        with ResultsDB(args.db) as db:
+            db.reindex()
+        console.print(f"[green]✅ Индексы пересобраны: {args.db}[/green]")
+        return
+
+    with ResultsQuery(args.db) as query:
+        if args.command == "names":
+            console.print(f"[cyan]Метрики:[/cyan] {', '.join(query.metric_names())}")
+            console.print(f"[cyan]Параметры:[/cyan] {', '.join(query.param_names())}")
+            return
+        filters = filters_from(args)
+        if args.command == "heatmap":
+            surface = surface_from_db(query, args.metric, [args.x, args.y, *args.extra], **filters)
+            plot_sensitivity_heatmap(surface, args.x, args.y, how=args.how, radius=args.radius,
+                                     penalty=args.penalty, save_path=args.out)
+            console.print(f"[cyan]🗺️ {surface} → {args.out}[/cyan]")
+            result = robust_plateaus(surface, n=args.n, radius=args.radius, penalty=args.penalty)
+        elif args.command == "overfit":
+            runs, summary = selection_bias_report(
+                query, n_splits=args.splits, n_boot=args.boot, n_trials=args.trials,
+                max_workers=args.workers, seed=args.seed, **filters,
+            )
+            for key, value in summary.items():
+                console.print(f"[cyan]{key}:[/cyan] {value}")
+            result = runs.head(args.n)
+        elif args.command == "perf-check":
+            result = perf_check(args.db, query.select(**filters), args.n, args.rtol)
+            if not result.empty:
+                mismatches = int(result["mismatches"].sum())
+                color = "green" if mismatches == 0 else "red"
+                console.print(f"[{color}]Расхождений с quantstats: {mismatches}[/{color}]")
+        elif args.command == "top":
+            result = query.top(args.metric, args.n, ascending=args.ascending, columns=args.columns, **filters)
+        elif args.command == "group":
+            result = query.group(args.metric, by=args.by, **filters)
+        elif args.command == "leaderboard":
+            result = query.leaderboard(args.metric, args.n, agg=args.agg, min_markets=args.min_markets, **filters)
+        else:
+            result = query.pivot(args.metric, args.rows, args.columns, agg=args.agg, **filters)
+
+    if result.empty:
+        console.print("[yellow]⚠️ Подходящих прогонов не найдено[/yellow]")
+        return
+    with pd.option_context("display.max_rows", 500, "display.width", 250):
+        console.print(result.to_string())
+    if args.csv:
+        result.to_csv(args.csv)
+        console.print(f"[cyan]💾 {args.csv}[/cyan]")
+
+
+if __name__ == "__main__":
+    main()
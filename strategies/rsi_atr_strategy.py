@@ -1,10 +1,18 @@
 import backtrader as bt
+import numpy as np
 
-class SuperStrategy(bt.Strategy):
+from core.pruning import PRUNE_REASONS
+from core.recorders import RecorderMixin
+from core.trade_ledger import TradeLedger, SIDE_LONG
+
+class SuperStrategy(RecorderMixin, bt.Strategy):
     params = (
         ("rsi_period", 14),
         ("atr_period", 14),
         ("take_profit", None),
+        ("compiled_exits", None),  # core.exit_engine.CompiledExits, скомпилированный по тому же DataFrame
+        ("pruning", None),         # core.pruning.PruningRules — досрочная остановка безнадёжного прогона
+        ("stream_dir", None),      # папка потоков core.stream_sink: equity и логи пишутся на диск по ходу прогона
         ("strategy_id", ""),
         ("symbol", ""),
         ("timeframe", ""),
@@ -16,14 +24,33 @@ class SuperStrategy(bt.Strategy):
         self.atr = bt.indicators.ATR(self.data, period=self.params.atr_period)
         self.entry_log = []
         self.exit_log = []
-        self.equity_curve = []
+        self.highest_close = float("-inf")
+        self.peak_value = float("-inf")
+        self.n_entries = 0
+        self.pruned = None
+        # Журнал закрытых сделок (core.trade_ledger): исполнения из notify_order,
+        # снимки индикаторов — с сигнальных баров
+        self.trade_ledger = TradeLedger()
+        self.signals = {}
+        self.fills = {}
+
+    def start(self):
+        super().start()
+        if self.stream_dir is not None:
+            # Логи с тем же интерфейсом append(dict), но в памяти — только пачка
+            self.entry_log = self.open_sink("entry_log")
+            self.exit_log = self.open_sink("exit_log")
 
     def next(self):
-        self.equity_curve.append((self.data.datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()  # equity / позиция — в массивы core.recorders, без datetime на баре
+        if self.params.pruning is not None and self.check_pruning():
+            return
 
         if not self.position:
+            self.highest_close = float("-inf")
             if self.rsi < 30:
                 self.buy()
+                self.signals["entry"] = (self.rsi[0], self.atr[0], "rsi < 30")
                 self.entry_log.append({
                     "timestamp": self.data.datetime.datetime(0),
                     "price": self.data.close[0],
@@ -35,15 +62,86 @@ class SuperStrategy(bt.Strategy):
                     "timeframe": self.params.timeframe
                 })
         else:
-            if self.rsi > 70:
+            self.highest_close = max(self.highest_close, self.data.close[0])
+            reason = "rsi > 70" if self.rsi > 70 else self.take_profit_reason()
+            if reason:
                 self.sell()
+                self.signals["exit"] = (self.rsi[0], self.atr[0], reason)
                 self.exit_log.append({
                     "timestamp": self.data.datetime.datetime(0),
                     "price": self.data.close[0],
                     "rsi": self.rsi[0],
                     "atr": self.atr[0],
-                    "reason": "rsi > 70",
+                    "reason": reason,
                     "strategy_id": self.params.strategy_id,
                     "symbol": self.params.symbol,
                     "timeframe": self.params.timeframe
                 })
+
+    def notify_order(self, order):
+        if order.status != order.Completed:
+            return
+        executed = order.executed
+        if order.isbuy():
+            # Вход считается по исполнению, как в векторном движке (правило min_trades в core.pruning)
+            self.n_entries += 1
+        # Исполнение по open текущего бара; проскальзывание — потеря относительно open
+        slippage = (executed.price - self.data.open[0]) * executed.size
+        self.fills["entry" if order.isbuy() else "exit"] = {
+            "ts": np.datetime64(bt.num2date(executed.dt), "ns").astype(np.int64),
+            "price": executed.price,
+            "size": abs(executed.size),
+            "slippage": slippage,
+        }
+
+    def notify_trade(self, trade):
+        if not trade.isclosed:
+            return
+        entry, exit_ = self.fills.pop("entry"), self.fills.pop("exit")
+        entry_rsi, entry_atr, entry_reason = self.signals.pop("entry", (np.nan, np.nan, ""))
+        exit_rsi, exit_atr, exit_reason = self.signals.pop("exit", (np.nan, np.nan, ""))
+        self.trade_ledger.append(
+            entry_ts=entry["ts"],
+            exit_ts=exit_["ts"],
+            side=SIDE_LONG,
+            entry_price=entry["price"],
+            exit_price=exit_["price"],
+            size=entry["size"],
+            pnl=trade.pnl,
+            pnl_comm=trade.pnlcomm,
+            fees=trade.commission,
+            slippage=entry["slippage"] + exit_["slippage"],
+            entry_rsi=entry_rsi,
+            exit_rsi=exit_rsi,
+            entry_atr=entry_atr,
+            exit_atr=exit_atr,
+            entry_reason=entry_reason,
+            exit_reason=exit_reason,
+        )
+
+    def take_profit_reason(self):
+        """Причина выхода по скомпилированным уровням take_profit (режим "full") или None."""
+        compiled = self.params.compiled_exits
+        if compiled is None or compiled.mode != "full" or not compiled.n_levels:
+            return None
+        hits = compiled.hits(len(self.data) - 1, self.position.price, self.highest_close)
+        if not hits.any():
+            return None
+        return "; ".join(r for r, hit in zip(compiled.reasons, hits) if hit)
+
+    def check_pruning(self):
+        """Правила core.pruning: при срабатывании запоминает причину и останавливает Cerebro."""
+        value = self.broker.getvalue()
+        self.peak_value = max(self.peak_value, value)
+        reason = self.params.pruning.check(
+            len(self), value, self.peak_value, self.broker.startingcash, self.n_entries
+        )
+        if not reason:
+            return False
+        self.pruned = {
+            "reason": PRUNE_REASONS[reason],
+            "bars": len(self),
+            "datetime": self.data.datetime.datetime(0),
+        }
+        self.env.runstop()
+        return True
@@ -0,0 +1,191 @@
+import argparse
+import multiprocessing
+import threading
+import time
+from itertools import product
+
+from rich.console import Console
+
+from core import (
+    load_market_data,
+    run_vectorized,
+    params_hash,
+    save_sweep_metrics,
+    JobQueue,
+    default_worker_id
+)
+from backtest_runner import (
+    SYMBOLS,
+    TIMEFRAMES,
+    START_DATE,
+    END_DATE,
+    INITIAL_CASH,
+    COMMISSION_MODEL,
+    SLIPPAGE,
+    PRUNING,
+    param_grid,
+    extract_strategy_params
+)
+from strategies.rsi_atr_strategy import SuperStrategy
+
+console = Console()
+
+# Файл очереди должен лежать в директории, общей для всех машин / контейнеров
+QUEUE_PATH = "results/sweep_queue.sqlite"
+LEASE_SECONDS = 600       # аренда задания; heartbeat продлевает её каждые LEASE_SECONDS / 3
+MAX_ATTEMPTS = 3          # после стольких неудачных / брошенных попыток задание — failed
+CLAIM_BATCH = 256         # заданий одного (symbol, tf) за раз — один векторный прогон
+POLL_SECONDS = 5
+LOCAL_WORKERS = 4
+
+def open_queue(queue_path=QUEUE_PATH):
+    return JobQueue(queue_path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS)
+
+def enqueue(queue_path=QUEUE_PATH):
+    """Координатор: кладёт в очередь все (symbol, tf, params) текущей сетки backtest_runner."""
+    jobs = (
+        {"symbol": symbol, "timeframe": tf, "params": params}
+        for symbol, tf in product(SYMBOLS, TIMEFRAMES)
+        for params in param_grid
+    )
+    added = open_queue(queue_path).enqueue(jobs, start_date=START_DATE, end_date=END_DATE)
+    console.print(f"[green]📥 Добавлено заданий: {added}[/green]")
+    return added
+
+class _Heartbeat:
+    """Фоновый поток, продлевающий аренду заданий, пока идёт прогон."""
+
+    def __init__(self, queue, worker_id, job_ids):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.job_ids = job_ids
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self.stop.wait(self.queue.lease_seconds / 3):
+            self.queue.heartbeat(self.worker_id, self.job_ids)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+
+def _load_frame(frames, symbol, tf, start_date, end_date):
+    # Держим в памяти только последний рынок: задания забираются пачками одного (symbol, tf)
+    key = (symbol, tf, start_date, end_date)
+    if key not in frames:
+        frames.clear()
+        data = load_market_data([symbol], [tf], start_date=start_date, end_date=end_date)
+        frames[key] = data.get(symbol, {}).get(tf)
+    return frames[key]
+
+def work(queue_path=QUEUE_PATH, worker_id=None, exit_when_idle=True):
+    """
+    Воркер: забирает пачки заданий, прогоняет векторным движком и пишет метрики обратно.
+    exit_when_idle=True — выходит, когда в очереди не осталось ни свободных, ни чужих
+    незавершённых заданий (брошенные аренды успевают вернуться в очередь).
+    """
+    queue = open_queue(queue_path)
+    worker_id = worker_id or default_worker_id()
+    strategy_param_keys = SuperStrategy.params._getkeys()
+    frames = {}
+    done = 0
+
+    while True:
+        jobs = queue.claim(worker_id, batch_size=CLAIM_BATCH)
+        if not jobs:
+            if exit_when_idle and queue.status()["running"] == 0:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+
+        job_ids = [job["id"] for job in jobs]
+        symbol, tf = jobs[0]["symbol"], jobs[0]["timeframe"]
+        try:
+            with _Heartbeat(queue, worker_id, job_ids):
+                df = _load_frame(frames, symbol, tf, jobs[0]["start_date"], jobs[0]["end_date"])
+                if df is None or df.empty:
+                    raise ValueError(f"Нет данных для {symbol} {tf}")
+
+                batch = [job["params"] for job in jobs]
+                result = run_vectorized(
+                    df,
+                    batch,
+                    initial_cash=INITIAL_CASH,
+                    commission=COMMISSION_MODEL,
+                    slippage=SLIPPAGE,
+                    strategy_ids=[params_hash(extract_strategy_params(p, strategy_param_keys)) for p in batch],
+                    symbol=symbol,
+                    timeframe=tf,
+                    run_id=worker_id,
+                    keep_curves=False,
+                    pruning=PRUNING
+                )
+        except Exception as e:
+            queue.fail(worker_id, job_ids, repr(e))
+            console.print(f"[red]❌ {worker_id} {symbol} {tf}: {e}[/red]")
+            continue
+
+        written = queue.complete(worker_id, dict(zip(job_ids, result["metrics"].to_dict("records"))))
+        done += written
+        console.print(f"[green]✅ {worker_id} {symbol} {tf}: {written}/{len(jobs)} заданий[/green]")
+
+    return done
+
+def status(queue_path=QUEUE_PATH):
+    summary = open_queue(queue_path).status()
+    console.print(
+        f"[cyan]pending {summary['pending']} | running {summary['running']} | "
+        f"done {summary['done']} | failed {summary['failed']} | всего {summary['total']}[/cyan]"
+    )
+    for worker in summary["workers"]:
+        console.print(f"  ⚙️ {worker}")
+    return summary
+
+def export(queue_path=QUEUE_PATH, path="results/sweep_metrics.csv"):
+    results = open_queue(queue_path).results()
+    if results.empty:
+        console.print("[yellow]⚠️ Готовых результатов нет[/yellow]")
+        return None
+    path = save_sweep_metrics(results.to_dict("records"), path)
+    console.print(f"[green]💾 {len(results)} результатов → {path}[/green]")
+    return path
+
+def run_local(queue_path=QUEUE_PATH, n_workers=LOCAL_WORKERS):
+    """Полный цикл на одной машине: постановка, N процессов-воркеров, выгрузка метрик."""
+    enqueue(queue_path)
+    workers = [
+        multiprocessing.Process(target=work, args=(queue_path, f"{default_worker_id()}-w{k}"))
+        for k in range(n_workers)
+    ]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    status(queue_path)
+    return export(queue_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Распределённый свип через очередь заданий в SQLite")
+    parser.add_argument("command", choices=["enqueue", "work", "status", "export", "local"])
+    parser.add_argument("--queue", default=QUEUE_PATH, help="путь к файлу очереди (общая директория)")
+    parser.add_argument("--workers", type=int, default=LOCAL_WORKERS, help="число процессов для local")
+    parser.add_argument("--worker-id", default=None, help="имя воркера (по умолчанию host:pid)")
+    parser.add_argument("--wait", action="store_true", help="work: не выходить, ждать новых заданий")
+    parser.add_argument("--output", default="results/sweep_metrics.csv", help="куда выгрузить метрики (export)")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        enqueue(args.queue)
+    elif args.command == "work":
+        work(args.queue, args.worker_id, exit_when_idle=not args.wait)
+    elif args.command == "status":
+        status(args.queue)
+    elif args.command == "export":
+        export(args.queue, args.output)
+    else:
+        run_local(args.queue, args.workers)
@@ -0,0 +1,67 @@
+import backtrader as bt
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.exit_engine import compile_exit_levels
+from core.indicator_engine import atr_wilder
+from core.pruning import PruningRules
+from strategies.rsi_atr_strategy import SuperStrategy
+
+INITIAL_CASH = 100000
+COMMISSION = 0.00055
+SLIPPAGE = 0.0005
+
+
+def make_ohlcv(n=1500, seed=0, freq="4h", start="2022-01-01"):
+    """Синтетические свечи: геометрическое блуждание close, open / high / low вокруг него."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n)))
+    index = pd.date_range(start, periods=n, freq=freq)
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": rng.uniform(1, 10, n)},
+        index=index,
+    )
+
+
+def make_returns(seed=0, n=600, k=6):
+    """Доходности с общим фактором и дырами: поздний листинг, пропуски баров, монета почти без истории."""
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0, 0.02, n)
+    returns = factor[:, None] * rng.uniform(0, 1.5, k) + rng.normal(0, 0.02, (n, k))
+    returns[:200, 1] = np.nan
+    returns[rng.random((n, k)) < 0.05] = np.nan
+    returns[20:, k - 1] = np.nan
+    return returns
+
+
+def run_backtrader(df, params, pruning=None):
+    """SuperStrategy в Cerebro так же, как в backtest_runner.run; возвращает (стратегию, итоговую стоимость)."""
+    strategy_params = {k: params[k] for k in ("rsi_period", "atr_period", "take_profit") if k in params}
+    strategy_params["compiled_exits"] = compile_exit_levels(
+        params.get("take_profit"),
+        df["close"].to_numpy(),
+        atr_wilder(df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), params.get("atr_period", 14))
+    )
+    strategy_params["pruning"] = PruningRules.from_config(pruning)
+
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.addstrategy(SuperStrategy, **strategy_params)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.broker.setcash(INITIAL_CASH)
+    cerebro.broker.set_slippage_perc(perc=SLIPPAGE)
+    cerebro.broker.setcommission(commission=COMMISSION, leverage=1)
+    strat = cerebro.run()[0]
+    return strat, cerebro.broker.getvalue()
+
+
+def full_exit(mult):
+    return {"mode": "full", "levels": [{"percent": 1.0, "exit_type": "atr", "params": {"mult": mult}}]}
+
+
+@pytest.fixture(scope="session")
+def ohlcv():
+    return make_ohlcv()
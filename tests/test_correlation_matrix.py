@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_returns
+from general_correlation_analyzer import corr_matrix, top_for_base
+
+MIN_PERIODS = 30
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_corr_matrix_matches_pandas(seed):
+    returns = make_returns(seed)
+    corr, n = corr_matrix(returns, min_periods=MIN_PERIODS)
+    expected = pd.DataFrame(returns).corr(min_periods=MIN_PERIODS).to_numpy()
+
+    np.testing.assert_allclose(corr, expected, atol=1e-12, equal_nan=True)
+    mask = np.isfinite(returns).astype(np.int64)
+    np.testing.assert_array_equal(n, mask.T @ mask)
+
+
+def test_top_for_base_orders_by_correlation():
+    returns = make_returns()
+    symbols = [f"C{k}" for k in range(returns.shape[1])]
+    corr, n = corr_matrix(returns, min_periods=MIN_PERIODS)
+    corr = pd.DataFrame(corr, index=symbols, columns=symbols)
+    bars = pd.DataFrame(n, index=symbols, columns=symbols)
+
+    top = top_for_base(corr, bars, "C0", top_n=3)
+    expected = pd.DataFrame(returns, columns=symbols).corr(min_periods=MIN_PERIODS)["C0"].drop("C0").dropna()
+    assert list(top) == expected.sort_values(ascending=False).index[:3].tolist()
+    assert all(top[s]["matching_bars"] == bars.at[s, "C0"] for s in top)
+    assert top_for_base(corr, bars, "MISSING", top_n=3) == {}
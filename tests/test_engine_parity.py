@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from core.perf_metrics import perf_metrics_frame, periods_per_year
+from core.trade_ledger import closed_trade_metrics
+from core.vector_engine import run_vectorized
+from conftest import COMMISSION, INITIAL_CASH, SLIPPAGE, full_exit, run_backtrader
+
+GRID = [
+    {"rsi_period": rsi, "atr_period": atr, "take_profit": full_exit(mult)}
+    for rsi, atr, mult in [(14, 14, 2.0), (7, 10, 1.0), (21, 14, 4.0)]
+]
+# Сделки и итог сверяются и на сигнальном выходе, и на прогонах, остановленных правилами core.pruning
+OUTCOME_GRID = GRID + [{"rsi_period": 14, "atr_period": 14, "take_profit": None}]
+PRUNING_CASES = [None, {"max_drawdown": 0.0002}, {"min_equity_percent": 99.99, "min_equity_after_bars": 300}]
+
+
+@pytest.fixture(scope="module")
+def vector(ohlcv):
+    return run_vectorized(ohlcv, GRID, initial_cash=INITIAL_CASH, commission=COMMISSION, slippage=SLIPPAGE)
+
+
+@pytest.mark.parametrize("combo", range(len(GRID)))
+def test_equity_curves_match_from_first_bar(ohlcv, vector, combo):
+    strat, _ = run_backtrader(ohlcv, GRID[combo])
+    curves = strat.recorder.to_frame()
+
+    # Бары прогрева тоже в кривой: шкала совпадает с векторным движком
+    assert len(curves) == len(ohlcv)
+    assert (curves.index == ohlcv.index).all()
+    np.testing.assert_allclose(curves["equity"].to_numpy(), vector["equity"][combo], rtol=1e-9)
+    np.testing.assert_array_equal(curves["position"].to_numpy() != 0, vector["position"][combo] != 0)
+
+
+@pytest.mark.parametrize("combo", range(len(GRID)))
+def test_perf_metrics_match(ohlcv, vector, combo):
+    strat, _ = run_backtrader(ohlcv, GRID[combo])
+    curves = strat.recorder.to_frame()
+    ppy = periods_per_year("4h")
+
+    bt_perf = perf_metrics_frame(curves["equity"].to_numpy(), ppy, position=curves["position"].to_numpy())
+    vec_perf = perf_metrics_frame(vector["equity"][combo], ppy, position=vector["position"][combo])
+    for name in ("Sharpe", "CAGR_percent", "Exposure", "Max_drawdown_percent"):
+        np.testing.assert_allclose(bt_perf[name].to_numpy(), vec_perf[name].to_numpy(), rtol=1e-7, err_msg=name)
+
+
+@pytest.mark.parametrize("pruning", PRUNING_CASES)
+def test_final_value_and_trades_match(ohlcv, pruning):
+    vector = run_vectorized(
+        ohlcv, OUTCOME_GRID, initial_cash=INITIAL_CASH, commission=COMMISSION, slippage=SLIPPAGE, pruning=pruning
+    )["metrics"]
+    for combo, params in enumerate(OUTCOME_GRID):
+        strat, final_value = run_backtrader(ohlcv, params, pruning=pruning)
+        trades = closed_trade_metrics(strat.trade_ledger.to_array())
+        row = vector.loc[combo]
+
+        assert row["Final_portfolio_value"] == pytest.approx(final_value, abs=0.01)
+        for name in ("Total_trades", "Winning_trades", "Losing_trades"):
+            assert row[name] == trades[name], name
+        assert row["Net_PnL"] == pytest.approx(trades["Net_PnL"], abs=0.01)
+        if pruning is not None:
+            assert row["Prune_reason"] == (strat.pruned["reason"] if strat.pruned else "")
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core import job_queue
+from core.job_queue import JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JobQueue
+
+LEASE = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время очереди: аренда истекает по clock.now += ..., без sleep."""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(job_queue, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = JobQueue(tmp_path / "queue.sqlite", lease_seconds=LEASE, max_attempts=2)
+    queue.enqueue(
+        [{"symbol": "BTCUSDT", "timeframe": "1D", "params": {"rsi_period": p}} for p in (7, 14, 21)]
+        + [{"symbol": "ETHUSDT", "timeframe": "4h", "params": {"rsi_period": 14}}]
+    )
+    return queue
+
+
+def test_enqueue_skips_duplicates(queue):
+    assert queue.enqueue([{"symbol": "BTCUSDT", "timeframe": "1D", "params": {"rsi_period": 14}}]) == 0
+    assert queue.status()["total"] == 4
+
+
+def test_claim_takes_one_market_and_never_twice(queue):
+    first = queue.claim("a")
+    assert [job["params"]["rsi_period"] for job in first] == [7, 14, 21]
+    assert {(job["symbol"], job["timeframe"]) for job in first} == {("BTCUSDT", "1D")}
+
+    second = queue.claim("b")
+    assert [(job["symbol"], job["timeframe"]) for job in second] == [("ETHUSDT", "4h")]
+    assert queue.claim("c") == []
+    assert queue.status()[JOB_RUNNING] == 4
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    jobs = queue.claim("a")
+    ids = [job["id"] for job in jobs]
+    queue.claim("a")   # второй рынок — чтобы в очереди не осталось свободных заданий
+
+    clock.now += LEASE - 1
+    assert queue.claim("b") == []
+
+    clock.now += 2
+    reclaimed = queue.claim("b")
+    assert [job["id"] for job in reclaimed] == ids
+    assert all(job["attempts"] == 2 for job in reclaimed)
+
+    # Старый владелец потерял аренду: продлить и записать результат уже не может
+    assert queue.heartbeat("a", ids) == 0
+    assert queue.complete("a", {job_id: {"Sharpe": 1.0} for job_id in ids}) == 0
+    assert queue.complete("b", {job_id: {"Sharpe": 2.0} for job_id in ids}) == len(ids)
+    assert queue.results()["Sharpe"].tolist() == [2.0] * len(ids)
+
+
+def test_heartbeat_extends_lease(queue, clock):
+    ids = [job["id"] for job in queue.claim("a") + queue.claim("a")]
+
+    clock.now += LEASE - 10
+    assert queue.heartbeat("a", ids) == len(ids)
+    clock.now += LEASE - 10
+    assert queue.claim("b") == []
+    assert queue.status()["workers"] == ["a"]
+
+
+def test_lease_expiry_fails_after_max_attempts(queue, clock):
+    for worker in ("a", "b"):
+        queue.claim(worker, batch_size=10)
+        queue.claim(worker, batch_size=10)
+        clock.now += LEASE + 1
+
+    assert queue.recover_expired() == {"recovered": 0, "failed": 4}
+    status = queue.status()
+    assert status[JOB_FAILED] == 4 and status[JOB_PENDING] == 0
+    assert (queue.failures()["error"] == "lease expired").all()
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    ids = [job["id"] for job in queue.claim("a")]
+    assert queue.fail("a", ids, "boom") == len(ids)
+    assert queue.status()[JOB_PENDING] == 4
+
+    ids = [job["id"] for job in queue.claim("b")]
+    queue.fail("b", ids, "boom")
+    assert queue.status()[JOB_FAILED] == len(ids)
+    assert queue.status()[JOB_DONE] == 0
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.perf_metrics import PERF_COLUMNS, batch_metrics, periods_per_year, validate_against_quantstats
+from core.results_db import ResultsDB
+from core.results_query import ResultsQuery
+
+pytest.importorskip("quantstats")
+
+
+def random_equity(seed, n=800, freq="1D", flat=0.3):
+    """Кривая с долей баров без позиции (нулевые доходности) — как у стратегии с выходами в кэш."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0005, 0.02, n)
+    returns[rng.random(n) < flat] = 0.0
+    returns[0] = 0.0
+    index = pd.date_range("2021-01-01", periods=n, freq=freq)
+    return pd.Series(100000 * np.cumprod(1 + returns), index=index)
+
+
+@pytest.mark.parametrize("seed, timeframe", [(0, "1D"), (1, "4h"), (2, "1h"), (3, "1D")])
+def test_batch_metrics_match_quantstats(seed, timeframe):
+    equity = random_equity(seed, freq=timeframe)
+    check = validate_against_quantstats(equity, timeframe, rtol=1e-9)
+    assert check["match"].all(), check[~check["match"]].to_string()
+
+
+def test_batch_rows_equal_single_runs():
+    curves = np.stack([random_equity(seed).to_numpy() for seed in range(5)])
+    ppy = periods_per_year("1D")
+    batch = batch_metrics(curves, ppy, chunk_size=2)
+    for k, curve in enumerate(curves):
+        single = batch_metrics(curve, ppy)
+        for name in PERF_COLUMNS:
+            np.testing.assert_allclose(batch[name][k], single[name][0], rtol=1e-12, equal_nan=True)
+
+
+def test_leaderboard_keeps_engines_apart(tmp_path):
+    db_path = tmp_path / "results.sqlite"
+    with ResultsDB(db_path) as db:
+        for symbol in ("BTCUSDT", "ETHUSDT"):
+            for engine, sharpe in (("vector", 1.0), ("backtrader", 0.5)):
+                db.add_run(
+                    {"run_key": f"{engine}-{symbol}", "strategy_id": "s1", "symbol": symbol,
+                     "timeframe": "1D", "engine": engine, "status": "completed"},
+                    {"Sharpe": sharpe},
+                )
+
+    with ResultsQuery(db_path) as query:
+        board = query.leaderboard("Sharpe").set_index("engine")
+        assert sorted(board.index) == ["backtrader", "vector"]
+        assert board.loc["vector", "Sharpe_mean"] == 1.0
+        assert board.loc["backtrader", "Sharpe_mean"] == 0.5
+        assert (board["markets"] == 2).all()
+        assert len(query.leaderboard("Sharpe", engine="vector")) == 1
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_returns
+from general_rolling_correlation import rolling_corr_beta, window_sums
+
+
+def test_window_sums_match_rolling_sum():
+    values = np.random.default_rng(0).normal(size=(200, 3))
+    expected = pd.DataFrame(values).rolling(25, min_periods=1).sum().to_numpy()
+    np.testing.assert_allclose(window_sums(values, 25), expected, atol=1e-12)
+
+
+@pytest.mark.parametrize("window, min_periods", [(30, None), (50, 20), (10, 10)])
+def test_rolling_corr_beta_match_pandas(window, min_periods):
+    returns = make_returns(n=800)
+    base = returns[:, 0]
+    corr, beta, n = rolling_corr_beta(returns, base, window, min_periods)
+
+    frame = pd.DataFrame(returns)
+    periods = window if min_periods is None else min_periods
+    rolling = frame.rolling(window, min_periods=periods)
+    expected_corr = rolling.corr(frame[0]).to_numpy()
+    # Бета — cov / var базы по тем же барам, где есть и монета
+    base_var = pd.DataFrame(np.broadcast_to(base[:, None], returns.shape)).where(frame.notna())
+    expected_beta = (rolling.cov(frame[0]) / base_var.rolling(window, min_periods=periods).var()).to_numpy()
+
+    np.testing.assert_allclose(corr, expected_corr, atol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(beta, expected_beta, atol=1e-10, equal_nan=True)
+    both = (frame.notna() & frame[0].notna().to_numpy()[:, None]).astype(float)
+    np.testing.assert_array_equal(n, both.rolling(window, min_periods=1).sum().to_numpy())
@@ -0,0 +1,96 @@
+import matplotlib
+matplotlib.use("Agg")
+
+from datetime import datetime
+from itertools import product
+from rich.console import Console
+
+from core import (
+    load_market_data,
+    generate_result_path,
+    save_params,
+    save_metrics,
+    save_equity_curve,
+    save_equity_plot_png,
+    walk_forward
+)
+from backtest_runner import (
+    SYMBOLS,
+    TIMEFRAMES,
+    START_DATE,
+    END_DATE,
+    INITIAL_CASH,
+    COMMISSION_MODEL,
+    SLIPPAGE,
+    param_grid
+)
+
+console = Console()
+
+N_FOLDS = 10
+ANCHORED = False          # True — train растёт от начала истории, False — скользящее окно
+TRAIN_BARS = None         # None — 3 × TEST_BARS
+TEST_BARS = None          # None — история / (N_FOLDS + 3)
+WFO_METRIC = "Final_portfolio_growth_percent"
+WFO_WORKERS = None        # None — по числу ядер
+
+def run():
+    market_data = load_market_data(SYMBOLS, TIMEFRAMES, start_date=START_DATE, end_date=END_DATE)
+
+    for symbol, tf in product(SYMBOLS, TIMEFRAMES):
+        df = market_data.get(symbol, {}).get(tf)
+        if df is None or df.empty:
+            console.print(f"[red]❌ Нет данных для {symbol} {tf}[/red]")
+            continue
+
+        try:
+            result = walk_forward(
+                df,
+                param_grid,
+                n_folds=N_FOLDS,
+                train_bars=TRAIN_BARS,
+                test_bars=TEST_BARS,
+                anchored=ANCHORED,
+                metric=WFO_METRIC,
+                max_workers=WFO_WORKERS,
+                initial_cash=INITIAL_CASH,
+                commission=COMMISSION_MODEL,
+                slippage=SLIPPAGE,
+                symbol=symbol,
+                timeframe=tf
+            )
+        except ValueError as e:
+            console.print(f"[red]❌ {symbol} {tf}: {e}[/red]")
+            continue
+
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_path = generate_result_path(symbol, tf, {"run_id": run_id, "strategy_id": "wfo"})
+        save_params(result_path, {
+            "mode": "walk_forward",
+            "n_folds": N_FOLDS,
+            "anchored": ANCHORED,
+            "train_bars": TRAIN_BARS,
+            "test_bars": TEST_BARS,
+            "metric": WFO_METRIC,
+            "param_grid": param_grid,
+            "symbol": symbol,
+            "timeframe": tf,
+            "start_date": START_DATE,
+            "end_date": END_DATE
+        })
+        save_metrics(result_path, {"symbol": symbol, "timeframe": tf, **result["summary"]})
+        result["folds"].to_csv(result_path / "folds.csv", index=False)
+
+        equity_df = result["equity"].to_frame()
+        equity_df.index.name = "date"
+        save_equity_curve(result_path, equity_df)
+        save_equity_plot_png(result_path, equity_df)
+
+        console.print(
+            f"[green]✅ {symbol} {tf}: OOS {result['summary']['OOS_growth_percent']}% "
+            f"за {result['summary']['folds']} фолдов → {result_path}[/green]"
+        )
+
+if __name__ == "__main__":
+    run()
+    console.print("\n[bold green]✅ Walk-forward завершён.[/bold green]")
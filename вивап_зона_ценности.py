@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -66,7 +67,7 @@ class RollingVWAP(bt.Indicator):
 
 # --- Новая Стратегия: Гибрид Price Action и VWAP ---
 
-class VWAPPAStrategy(bt.Strategy):
+class VWAPPAStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('vwap_period', 100), ('atr_period', 20), ('atr_mult', 1.5),
         ('volume_period', 10)
@@ -84,7 +85,6 @@ class VWAPPAStrategy(bt.Strategy):
         self.hammer = bt.talib.CDLHAMMER(self.data.open, self.data.high, self.data.low, self.data.close)
         self.shooting_star = bt.talib.CDLSHOOTINGSTAR(self.data.open, self.data.high, self.data.low, self.data.close)
 
-        self.equity_curve = []
         self.order_bracket = [] # Для хранения стопа и тейка
 
     def notify_order(self, order):
@@ -92,7 +92,7 @@ class VWAPPAStrategy(bt.Strategy):
             self.order_bracket = [] # Очищаем при закрытии/отмене
 
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
         if self.position or self.order_bracket: return
 
         is_uptrend = self.data.close[0] > self.vwap[0]
@@ -171,9 +171,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
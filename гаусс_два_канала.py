@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -72,7 +73,7 @@ class GaussianFilter(bt.Indicator):
 
 # --- НОВАЯ СТРАТЕГИЯ: "Канал в канале" ---
 
-class DualGaussianStrategy(bt.Strategy):
+class DualGaussianStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('slow_period', 100), ('fast_period', 30),
         ('atr_period', 20), ('atr_mult', 1.5)
@@ -88,10 +89,8 @@ class DualGaussianStrategy(bt.Strategy):
         self.fast_upper = self.fast_gauss + self.atr * self.p.atr_mult
         self.fast_lower = self.fast_gauss - self.atr * self.p.atr_mult
 
-        self.equity_curve = []
-
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
 
         # --- Логика выхода ---
         if self.position:
@@ -168,9 +167,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -103,7 +104,7 @@ class VZODivergence(bt.Indicator):
 
 # --- Финальная Стратегия с VZO ---
 
-class DualGaussianVZOStrategy(bt.Strategy):
+class DualGaussianVZOStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('slow_period', 100), ('fast_period', 30),
         ('atr_period', 20), ('atr_mult_exit', 1.5),
@@ -123,10 +124,8 @@ class DualGaussianVZOStrategy(bt.Strategy):
         self.vzo = VZOIndicator(self.data, period=self.p.vzo_period)
         self.divergence = VZODivergence(self.data, vzo=self.vzo, period=self.p.div_lookback)
 
-        self.equity_curve = []
-
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
 
         if self.position:
             is_long = self.position.size > 0
@@ -201,9 +200,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -70,7 +71,7 @@ class GaussianFilter(bt.Indicator):
 
 # --- Новая Стратегия: Гибрид Price Action и Гаусса ---
 
-class GaussianPAStrategy(bt.Strategy):
+class GaussianPAStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('slow_period', 100), ('atr_period_slow', 20), ('atr_mult_slow', 1.5),
         ('volume_period', 10),
@@ -91,7 +92,6 @@ class GaussianPAStrategy(bt.Strategy):
         self.hammer = bt.talib.CDLHAMMER(self.data.open, self.data.high, self.data.low, self.data.close)
         self.shooting_star = bt.talib.CDLSHOOTINGSTAR(self.data.open, self.data.high, self.data.low, self.data.close)
 
-        self.equity_curve = []
         self.order = None
 
     def notify_order(self, order):
@@ -99,7 +99,7 @@ class GaussianPAStrategy(bt.Strategy):
         self.order = None
 
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
         if self.order or self.position: return
 
         is_uptrend = self.data.close[0] > self.slow_gauss[0]
@@ -183,9 +183,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
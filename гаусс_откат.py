@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -100,7 +101,7 @@ class GaussianFilter(bt.Indicator):
 
 # --- НОВАЯ СТРАТЕГИЯ: Возврат к среднему с тройным фильтром ---
 
-class GaussianMeanReversionStrategy(bt.Strategy):
+class GaussianMeanReversionStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('gauss_period', 30), ('atr_period', 20), ('z_threshold', 2.0),
         ('volume_period', 10), ('volume_mult', 1.5)
@@ -118,10 +119,8 @@ class GaussianMeanReversionStrategy(bt.Strategy):
         # Фильтр тренда (уже в данных)
         self.is_uptrend = self.data.is_uptrend
 
-        self.equity_curve = []
-
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
 
         # --- Логика выхода ---
         if self.position:
@@ -193,9 +192,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -70,7 +71,7 @@ class GaussianFilter(bt.Indicator):
 
 # --- Новая Стратегия: Пересечение Гаусса с фильтрами ---
 
-class GaussianCrossoverStrategy(bt.Strategy):
+class GaussianCrossoverStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('slow_period', 100), ('fast_period', 30),
         ('atr_period', 20), ('volume_period', 20),
@@ -96,7 +97,6 @@ class GaussianCrossoverStrategy(bt.Strategy):
         safe_atr_std = bt.If(atr_std > 0, atr_std, 0.000001)
         self.atr_zscore = (self.atr - atr_sma) / safe_atr_std
 
-        self.equity_curve = []
         self.order = None
 
     def notify_order(self, order):
@@ -109,7 +109,7 @@ class GaussianCrossoverStrategy(bt.Strategy):
         self.order = None
 
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
 
         # Если уже есть открытый ордер или позиция, ничего не делаем
         if self.order or self.position:
@@ -193,9 +193,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(
@@ -14,6 +14,7 @@ import ccxt
 import time
 import shutil
 import math
+from core.recorders import RecorderMixin
 
 # --- Вспомогательные функции ---
 
@@ -70,7 +71,7 @@ class GaussianFilter(bt.Indicator):
 
 # --- Новая Стратегия: "Угол Атаки" ---
 
-class GaussianSlopeStrategy(bt.Strategy):
+class GaussianSlopeStrategy(RecorderMixin, bt.Strategy):
     params = (
         ('slow_period', 100), ('fast_period', 30),
         ('atr_period', 20), ('volume_period', 20),
@@ -98,7 +99,6 @@ class GaussianSlopeStrategy(bt.Strategy):
         raw_slope = self.slow_gauss - self.slow_gauss(-self.p.slope_period)
         self.normalized_slope = raw_slope / self.data.close
 
-        self.equity_curve = []
         self.order = None
 
     def notify_order(self, order):
@@ -106,7 +106,7 @@ class GaussianSlopeStrategy(bt.Strategy):
         self.order = None
 
     def next(self):
-        self.equity_curve.append((self.datas[0].datetime.datetime(0), self.broker.getvalue()))
+        self.record_bar()
         if self.order or self.position: return
 
         # Фильтр 1: Режим рынка (должен быть трендовым)
@@ -184,9 +184,8 @@ def run():
             "Win_Rate_percent": round(win_rate, 2)
         })
         
-        if strat.equity_curve:
-            equity_df = pd.DataFrame(strat.equity_curve, columns=["date", "equity"])
-            equity_df.set_index(pd.to_datetime(equity_df["date"]), inplace=True)
+        equity_df = strat.equity_frame()
+        if not equity_df.empty:
             returns = equity_df["equity"].pct_change().dropna()
             if not returns.empty:
                  qs.reports.html(